@@ -20,5 +20,6 @@ if __name__ == "__main__":
         "ocr_app.api:app",
         host="0.0.0.0",
         port=port,
-        reload=True
+        # Auto-reload is for development only (RELOAD=1)
+        reload=os.environ.get("RELOAD", "0") == "1"
     ) 
\ No newline at end of file
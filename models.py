@@ -25,4 +25,12 @@ class Conversion(db.Model):
     characters_extracted = db.Column(db.Integer, default=0)
     
     def __repr__(self):
-        return f'<Conversion {self.id}>'
\ No newline at end of file
+        return f'<Conversion {self.id}>'
+
+class UsageCounter(db.Model):
+    """Model for incrementally maintained usage totals (visitors, conversions, ...)."""
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<UsageCounter {self.name}={self.value}>'
@@ -0,0 +1,140 @@
+import os
+import asyncio
+import logging
+
+from .preprocessing import Pipeline, parse_pipeline
+from .workers import run_ocr_data_pipeline
+from .orientation import estimate_orientation, ORIENTATION_ENABLED
+from .batch import submit_when_ready
+
+logger = logging.getLogger(__name__)
+
+# Adaptive ("auto") preprocessing configuration
+# OCR_AUTO_MIN_CONFIDENCE: mean word confidence (0-100) a pass needs to be accepted
+# OCR_AUTO_PARALLEL: escalation passes run at the same time
+AUTO_MIN_CONFIDENCE = float(os.environ.get("OCR_AUTO_MIN_CONFIDENCE", 80))
+AUTO_PARALLEL = max(1, int(os.environ.get("OCR_AUTO_PARALLEL", 2)))
+
+# Preprocessing type that selects adaptive preprocessing
+AUTO = "auto"
+
+# Cheap first pass: (preset, page segmentation mode or None for the language default)
+AUTO_FIRST_PASS = ("grayscale-normalized", None)
+
+# Passes tried when the first one is not confident enough, cheapest first
+AUTO_ESCALATIONS = [
+    ("threshold-normalized", None),
+    ("adaptive-normalized", None),
+    ("grayscale-normalized", 3),
+    ("denoise-normalized", None),
+]
+
+
+def _candidate(preset, native, orientation):
+    pipeline = parse_pipeline(preset)
+    if native:
+        # Tiles are already upright and at native resolution and must not be
+        # shrunk to a fixed size
+        return pipeline.without("resize")
+    if orientation is None:
+        return pipeline
+    # Presets leave the page as it is; auto turns it upright with the
+    # estimate shared by every pass
+    return Pipeline([("orient", {}), *pipeline.stages], pipeline.name).oriented(orientation)
+
+
+async def ocr_auto(pool, image, language="eng", wait=False, native=False,
+                   min_confidence=AUTO_MIN_CONFIDENCE, parallel=AUTO_PARALLEL, orientation=None,
+                   reserved=False):
+    """
+    OCR with the cheapest preprocessing that reaches ``min_confidence``.
+
+    A cheap grayscale pass runs first. Only when its mean word confidence
+    is below the bar are more expensive passes (thresholding, denoising, an
+    alternate page segmentation mode) tried, ``parallel`` at a time in cost
+    order. As soon as one clears the bar the others are cancelled; if none
+    does, the most confident result is returned. The page orientation is
+    estimated once and every pass turns the page upright with it.
+
+    Args:
+        pool: OCRWorkerPool to run on
+        image: Encoded image bytes or a numpy array
+        language: Language code for OCR
+        wait: Wait for pool capacity instead of failing with PoolSaturatedError
+        native: Skip the resize stage (for tiles already at native resolution)
+        min_confidence: Mean word confidence (0-100) that stops escalation
+        parallel: Escalation passes run at the same time
+        orientation: Cached estimate from ``estimate_orientation``, made
+            before the first pass when not given
+        reserved: The image's pixels are held with ``pool.reserve``
+
+    Returns:
+        Tuple of (OCRData, info dict with the chosen ``preprocessing_type``,
+        ``psm``, ``confidence`` and the number of ``passes`` run)
+    """
+    if orientation is None and not native and ORIENTATION_ENABLED:
+        if wait:
+            orientation = await submit_when_ready(pool, estimate_orientation, image, reserved=reserved)
+        else:
+            orientation = await pool.submit(estimate_orientation, image, reserved=reserved)
+
+    preset, psm = AUTO_FIRST_PASS
+    args = (image, _candidate(preset, native, orientation), language, None, psm)
+    if wait:
+        data = await submit_when_ready(pool, run_ocr_data_pipeline, *args, reserved=reserved)
+    else:
+        data = await pool.submit(run_ocr_data_pipeline, *args, reserved=reserved)
+    best = (data.mean_confidence(), data, preset, psm)
+    passes = 1
+
+    if best[0] < min_confidence:
+        async def run(preset, psm):
+            data = await submit_when_ready(
+                pool, run_ocr_data_pipeline, image, _candidate(preset, native, orientation), language, None, psm,
+                reserved=reserved
+            )
+            return data.mean_confidence(), data, preset, psm
+
+        candidates = iter(AUTO_ESCALATIONS)
+        pending = set()
+
+        def launch(count):
+            for preset, psm in candidates:
+                pending.add(asyncio.create_task(run(preset, psm)))
+                count -= 1
+                if count == 0:
+                    break
+
+        launch(parallel)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    passes += 1
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        logger.warning(f"Adaptive preprocessing pass failed: {str(e)}")
+                        continue
+                    if result[0] > best[0]:
+                        best = result
+                if best[0] >= min_confidence:
+                    break
+                launch(len(done))
+        finally:
+            # Passes that have not started on a worker yet are dropped
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    confidence, data, preset, psm = best
+    logger.debug(
+        "Adaptive preprocessing chose %s (psm %s) with confidence %.1f after %d passes",
+        preset, psm, confidence, passes
+    )
+    return data, {
+        "preprocessing_type": preset,
+        "psm": psm,
+        "confidence": round(confidence, 2),
+        "passes": passes,
+    }
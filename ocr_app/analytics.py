@@ -0,0 +1,261 @@
+import os
+import asyncio
+import logging
+from collections import deque, Counter
+from sqlalchemy import create_engine, select, func, exc
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Visitor, Conversion, UsageCounter
+
+logger = logging.getLogger(__name__)
+
+# Analytics writer configuration
+# OCR_ANALYTICS_BUFFER_SIZE: events kept in memory, the oldest are dropped when full
+# OCR_ANALYTICS_BATCH_SIZE: events inserted per database round trip
+# OCR_ANALYTICS_FLUSH_MS: maximum time an event waits in the buffer
+ANALYTICS_BUFFER_SIZE = int(os.environ.get("OCR_ANALYTICS_BUFFER_SIZE", 10000))
+ANALYTICS_BATCH_SIZE = int(os.environ.get("OCR_ANALYTICS_BATCH_SIZE", 500))
+ANALYTICS_FLUSH_MS = int(os.environ.get("OCR_ANALYTICS_FLUSH_MS", 1000))
+
+# Event kinds and the tables they are written to
+VISITOR = "visitor"
+CONVERSION = "conversion"
+TABLES = {
+    VISITOR: Visitor.__table__,
+    CONVERSION: Conversion.__table__,
+}
+
+# Usage counter names
+VISITORS_COUNTER = "visitors"
+CONVERSIONS_COUNTER = "conversions"
+LANGUAGE_COUNTER_PREFIX = "language:"
+PREPROCESSING_COUNTER_PREFIX = "preprocessing:"
+
+
+def counter_deltas(batch):
+    """
+    Compute the usage counter increments for a batch of events.
+
+    Args:
+        batch: Dict of event kind -> list of rows
+
+    Returns:
+        Counter of counter name -> increment
+    """
+    deltas = Counter()
+    deltas[VISITORS_COUNTER] += len(batch.get(VISITOR, ()))
+    for row in batch.get(CONVERSION, ()):
+        deltas[CONVERSIONS_COUNTER] += 1
+        deltas[LANGUAGE_COUNTER_PREFIX + str(row.get("language"))] += 1
+        deltas[PREPROCESSING_COUNTER_PREFIX + str(row.get("preprocessing_type"))] += 1
+    return +deltas
+
+
+# Dialects with INSERT ... ON CONFLICT support (the databases this app runs on)
+UPSERT_DIALECTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def apply_counter_deltas(conn, deltas):
+    """
+    Add ``deltas`` to the usage counters, creating missing counters.
+
+    A single INSERT ... ON CONFLICT DO UPDATE, so writers in several
+    processes creating the same counter cannot fail each other's batch.
+    """
+    if not deltas:
+        return
+    counters = UsageCounter.__table__
+    # Rows in a fixed order, so concurrent writers lock counters in the same order
+    rows = [{"name": name, "value": amount} for name, amount in sorted(deltas.items())]
+    insert = UPSERT_DIALECTS.get(conn.dialect.name)
+    if insert is None:
+        raise ValueError(f"Usage counters are not supported on {conn.dialect.name} databases")
+    statement = insert(counters).values(rows)
+    conn.execute(statement.on_conflict_do_update(
+        index_elements=[counters.c.name],
+        set_={"value": counters.c.value + statement.excluded.value}
+    ))
+
+
+def seed_counters(engine):
+    """
+    Initialize the usage counters from existing history.
+
+    Runs the full COUNT/GROUP BY scans once, only when the counter table is
+    empty (first start after upgrading); afterwards counters are maintained
+    incrementally by the analytics writer.
+    """
+    visitors = Visitor.__table__
+    conversions = Conversion.__table__
+    counters = UsageCounter.__table__
+    with engine.begin() as conn:
+        if conn.execute(select(func.count()).select_from(counters)).scalar():
+            return
+        rows = [
+            {"name": VISITORS_COUNTER, "value": conn.execute(select(func.count()).select_from(visitors)).scalar()},
+            {"name": CONVERSIONS_COUNTER, "value": conn.execute(select(func.count()).select_from(conversions)).scalar()},
+        ]
+        for language, count in conn.execute(
+            select(conversions.c.language, func.count()).group_by(conversions.c.language)
+        ):
+            rows.append({"name": LANGUAGE_COUNTER_PREFIX + str(language), "value": count})
+        for preprocessing_type, count in conn.execute(
+            select(conversions.c.preprocessing_type, func.count()).group_by(conversions.c.preprocessing_type)
+        ):
+            rows.append({"name": PREPROCESSING_COUNTER_PREFIX + str(preprocessing_type), "value": count})
+        conn.execute(counters.insert(), rows)
+        logger.info(f"Initialized {len(rows)} usage counters from existing history")
+
+
+def get_database_url():
+    """Get the database URL, using the same default as database.init_db."""
+    return os.environ.get("DATABASE_URL") or "sqlite:///ocr_app.db"
+
+
+class AnalyticsWriter:
+    """
+    Buffers tracking events in memory and bulk-inserts them in the background.
+
+    Request handlers only append to a bounded ring buffer. A background task
+    drains it every ``flush_ms`` milliseconds, or as soon as ``batch_size``
+    events are waiting, with one executemany INSERT per table. When the
+    buffer is full the oldest events are dropped rather than slowing down
+    requests. A batch the database rejects is written again one event at a
+    time, so one bad row does not lose the rest.
+    """
+
+    def __init__(self, database_url=None, buffer_size=ANALYTICS_BUFFER_SIZE,
+                 batch_size=ANALYTICS_BATCH_SIZE, flush_ms=ANALYTICS_FLUSH_MS):
+        self.database_url = database_url or get_database_url()
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_ms / 1000
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._buffer = deque(maxlen=buffer_size)
+        self._engine = None
+        self._wakeup = None
+        self._stopping = False
+        self._task = None
+
+    @property
+    def engine(self):
+        """SQLAlchemy engine for the analytics tables, created on first use."""
+        if self._engine is None:
+            engine = create_engine(
+                self.database_url,
+                pool_recycle=300,
+                pool_pre_ping=True,
+            )
+            db.metadata.create_all(engine, tables=[*TABLES.values(), UsageCounter.__table__])
+            seed_counters(engine)
+            self._engine = engine
+        return self._engine
+
+    def record(self, kind, row):
+        """
+        Queue an event for insertion. Never blocks.
+
+        Args:
+            kind: VISITOR or CONVERSION
+            row: Column values for the event
+        """
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append((kind, row))
+        if self._wakeup is not None and len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def _drain(self):
+        batch = {}
+        for _ in range(min(self.batch_size, len(self._buffer))):
+            kind, row = self._buffer.popleft()
+            batch.setdefault(kind, []).append(row)
+        return batch
+
+    def _insert(self, batch):
+        # One transaction: one executemany per table plus the usage counter
+        # increments, so counters always match the stored events
+        with self.engine.begin() as conn:
+            for kind, rows in batch.items():
+                conn.execute(TABLES[kind].insert(), rows)
+            apply_counter_deltas(conn, counter_deltas(batch))
+
+    def _insert_each(self, batch):
+        written = 0
+        error = None
+        for kind, rows in batch.items():
+            for row in rows:
+                try:
+                    self._insert({kind: [row]})
+                    written += 1
+                except Exception as e:
+                    error = e
+        if error is not None:
+            logger.error(f"Error writing analytics events one at a time: {str(error)}")
+        return written
+
+    async def flush(self):
+        """Write every buffered event to the database."""
+        while self._buffer:
+            batch = self._drain()
+            count = sum(len(rows) for rows in batch.values())
+            try:
+                await asyncio.to_thread(self._insert, batch)
+                self.written += count
+            except (exc.OperationalError, exc.InterfaceError) as e:
+                # The database is unreachable: one event at a time would fail the same way
+                self.failed += count
+                logger.error(f"Error writing {count} analytics events: {str(e)}")
+            except Exception as e:
+                logger.warning(f"Error writing {count} analytics events, retrying one at a time: {str(e)}")
+                written = await asyncio.to_thread(self._insert_each, batch)
+                self.written += written
+                self.failed += count - written
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def start(self):
+        """Start the background flush task."""
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        try:
+            await asyncio.to_thread(lambda: self.engine)
+        except Exception as e:
+            logger.error(f"Error connecting to analytics database: {str(e)}")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and flush buffered events."""
+        if self._task is not None:
+            # Let an in-progress insert finish instead of cancelling it
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def stats(self):
+        """Return buffer and write counters."""
+        return {
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+# Shared writer used by the tracking functions
+analytics = AnalyticsWriter()
@@ -1,13 +1,13 @@
 import os
+import asyncio
 import logging
 import time
 from typing import List
 from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, Response, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import uuid
-import shutil
 from pathlib import Path
 import sys
 import os
@@ -15,12 +15,29 @@ import os
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from .image_processor import preprocess_image
-from .ocr import extract_text, clean_text
+from .ocr import clean_text, layout_text, language_registry, OCR_ERROR_PREFIX
 from .tracking import track_visitor, track_conversion, get_statistics
+from .analytics import analytics
+from .workers import ocr_pool as local_pool, run_ocr_pipeline, run_ocr_data_pipeline, PoolSaturatedError, PoolTimeoutError
+from .cache import result_cache, hash_image, make_key, get_cache_key
+from .batch import iter_batch_items, stream_batch, submit_when_ready, format_ndjson, format_sse
+from .jobs import JobQueue, create_store, public_job, QueueFullError, JOB_CONCURRENCY
+from .documents import is_multipage, iter_document_pages, DOCUMENT_WINDOW, DOCUMENT_MAX_PAGES
+from .preprocessing import parse_pipeline, PRESETS, STAGES, STAGE_PARAMS
+from .tiling import ocr_tiled, iter_tiled, join_blocks, should_tile
+from .layout import OCRData
+from .adaptive import ocr_auto, AUTO
+from .language import detect_language
+from .orientation import estimate_orientation, ORIENTATION_ENABLED
+from .memory import rss_bytes
+from .image_processor import ImageError
+from . import metrics
+from .dispatch import RemotePool, WORKER_NODES
+from .uploads import read_upload, UploadRejectedError, BodySizeLimitMiddleware, MAX_UPLOAD_BYTES, MAX_BATCH_BYTES
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# LOG_LEVEL: root log level (default INFO); per-request details are logged at DEBUG
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
 logger = logging.getLogger(__name__)
 
 # Create FastAPI app
@@ -30,6 +47,13 @@ app = FastAPI(
     version="1.0.0",
 )
 
+# OCR runs on the in-process worker pool, or on stateless worker nodes
+# (python -m ocr_app.worker_node) when OCR_WORKER_NODES is set
+ocr_pool = RemotePool(WORKER_NODES) if WORKER_NODES else local_pool
+
+# Refuse oversized bodies before they are spooled; the batch endpoint takes many files
+app.add_middleware(BodySizeLimitMiddleware, path_limits={"/api/extract-text/batch": MAX_BATCH_BYTES})
+
 # Mount static files directory
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -40,8 +64,177 @@ templates = Jinja2Templates(directory="templates")
 TEMP_DIR = Path("temp")
 TEMP_DIR.mkdir(exist_ok=True)
 
-# Define valid image extensions
-VALID_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff"}
+# Define valid image and document extensions
+VALID_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".tif", ".pdf"}
+
+# Extensions accepted by the batch endpoint in addition to single images
+BATCH_EXTENSIONS = VALID_EXTENSIONS | {".zip"}
+
+# Result formats of /upload/: plain text, text plus columnar layout data as
+# JSON, or the layout data as a compressed NumPy archive
+OUTPUT_FORMATS = ("text", "json", "npz")
+
+async def read_file(file, extensions=VALID_EXTENSIONS, **limits):
+    """
+    Read an upload, turning early rejections into HTTP errors.
+    
+    Args:
+        file: The uploaded file
+        extensions: Accepted file extensions
+        **limits: Optional ``max_bytes`` / ``max_pixels`` overrides
+        
+    Returns:
+        The file contents as bytes
+    """
+    try:
+        return await read_upload(file, extensions, **limits)
+    except UploadRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+def validate_preprocess_type(preprocess_type):
+    """
+    Validate a preset name or custom stage chain.
+    
+    Args:
+        preprocess_type: Value of the ``preprocess_type`` form field
+        
+    Returns:
+        The preset name, or the normalized stage chain for custom pipelines
+    """
+    if preprocess_type == AUTO:
+        return AUTO
+    try:
+        return parse_pipeline(preprocess_type).name
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def tracked_preprocess_type(preprocess_type):
+    """Name recorded in usage statistics: the preset, or 'custom' for stage chains."""
+    return preprocess_type if preprocess_type in PRESETS or preprocess_type == AUTO else "custom"
+
+async def resolve_orientation(image_hash, payload, preprocess_type, wait=False):
+    """
+    Get the orientation estimate of an image, from the cache when possible.
+    
+    Only ``auto`` makes the estimate as a job of its own, once per image,
+    and pins it on every adaptive pass. Stage chains with an ``orient``
+    stage reuse a cached estimate and otherwise estimate inside their own
+    OCR job, so they never cost an extra round trip to the pool.
+    
+    Args:
+        image_hash: Digest from ``hash_image``
+        payload: Encoded image bytes
+        preprocess_type: Preset name, custom stage chain, or 'auto'
+        wait: Wait for pool capacity instead of failing with PoolSaturatedError
+        
+    Returns:
+        Estimate dict, or None when there is none to pin
+    """
+    if not ORIENTATION_ENABLED:
+        return None
+    if preprocess_type != AUTO and not parse_pipeline(preprocess_type).needs_orientation:
+        return None
+    
+    cache_key = make_key(image_hash, "orientation")
+    orientation = await result_cache.aget(cache_key)
+    if orientation is None and preprocess_type == AUTO:
+        try:
+            if wait:
+                orientation = await submit_when_ready(ocr_pool, estimate_orientation, payload)
+            else:
+                orientation = await ocr_pool.submit(estimate_orientation, payload)
+        except (PoolSaturatedError, PoolTimeoutError):
+            raise
+        except Exception as e:
+            # The OCR pass reports unreadable images itself
+            logger.warning(f"Could not estimate image orientation: {str(e)}")
+            return None
+        await result_cache.aset(cache_key, orientation)
+    return orientation
+
+async def run_single(payload, preprocess_type, language, structured=False, wait=False, request_id=None,
+                     orientation=None):
+    """
+    OCR a single image on the worker pool.
+    
+    Args:
+        payload: Encoded image bytes or a numpy array
+        preprocess_type: Preset name, custom stage chain, or 'auto'
+        language: Language for OCR
+        structured: Return OCRData instead of text
+        wait: Wait for pool capacity instead of failing with PoolSaturatedError
+        request_id: Optional identifier used to namespace debug artifacts
+        orientation: Cached orientation estimate from ``resolve_orientation``
+        
+    Returns:
+        Tuple of (text or OCRData, adaptive preprocessing info or None)
+    """
+    if preprocess_type == AUTO:
+        data, info = await ocr_auto(ocr_pool, payload, language, wait=wait, orientation=orientation)
+        return (data if structured else layout_text(data, language)), info
+    
+    pipeline = parse_pipeline(preprocess_type).oriented(orientation)
+    fn = run_ocr_data_pipeline if structured else run_ocr_pipeline
+    if wait:
+        return await submit_when_ready(ocr_pool, fn, payload, pipeline, language, request_id), None
+    return await ocr_pool.submit(fn, payload, pipeline, language, request_id), None
+
+def page_text(result):
+    """Text of a page or block result, or the OCR error it failed with."""
+    return result.get("text") or result.get("result") or f"{OCR_ERROR_PREFIX}: {result.get('error')}"
+
+def document_results(filename, data, preprocess_type, language, structured=False):
+    """
+    OCR the pages of a multi-page PDF or TIFF in parallel, yielding pages as they complete.
+    
+    Pages are decoded lazily and only a small window of them is held in
+    memory at once.
+    
+    Args:
+        filename: Name of the uploaded file
+        data: Uploaded bytes
+        preprocess_type: Type of preprocessing to apply to every page
+        language: Language for OCR
+        structured: Produce OCRData for every page instead of text
+        
+    Returns:
+        Async iterator of ``stream_batch`` results; each page result has its
+        ``index`` and either ``text`` (or ``data``) or ``error``
+    """
+    async def process(name, payload):
+        result, _ = await run_single(payload, preprocess_type, language, structured, wait=True)
+        return {"data": result} if structured else {"text": result}
+    
+    window = DOCUMENT_WINDOW or ocr_pool.max_workers
+    items = iter_document_pages(filename, data)
+    return stream_batch(items, process, window, DOCUMENT_MAX_PAGES)
+
+async def process_document(filename, data, preprocess_type, language, structured=False):
+    """
+    OCR the pages of a multi-page PDF or TIFF in parallel.
+    
+    Args:
+        filename: Name of the uploaded file
+        data: Uploaded bytes
+        preprocess_type: Type of preprocessing to apply to every page
+        language: Language for OCR
+        structured: Return OCRData for every page instead of text
+        
+    Returns:
+        List of page texts (or OCRData) in page order
+    """
+    pages = {}
+    async for result in document_results(filename, data, preprocess_type, language, structured):
+        if "filename" in result and structured:
+            if "error" in result:
+                raise ValueError(f"{result['filename']}: {result['error']}")
+            pages[result["index"]] = result["data"]
+        elif "filename" in result:
+            pages[result["index"]] = page_text(result)
+        elif "error" in result:
+            # The document itself could not be read (as opposed to a single page failing)
+            raise ValueError(result["error"])
+    return [pages[index] for index in sorted(pages)]
 
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
@@ -53,7 +246,7 @@ async def index(request: Request):
         logger.error(f"Error tracking visitor: {str(e)}")
     
     # Get statistics for the footer
-    stats = get_statistics()
+    stats = await asyncio.to_thread(get_statistics)
     
     return templates.TemplateResponse("index.html", {
         "request": request,
@@ -65,7 +258,9 @@ async def upload_image(
     request: Request,
     file: UploadFile = File(...),
     preprocess_type: str = Form("default"),
-    language: str = Form("eng")
+    language: str = Form("eng"),
+    tiled: bool = Form(False),
+    output: str = Form("text")
 ):
     """
     Upload an image and extract text using OCR.
@@ -73,8 +268,15 @@ async def upload_image(
     Args:
         request: The HTTP request
         file: The image file to extract text from
-        preprocess_type: Type of preprocessing to apply (default, grayscale, threshold, adaptive)
-        language: Language for OCR (eng, chi_sim)
+        preprocess_type: Preprocessing preset (default, grayscale, threshold, adaptive, denoise)
+            or a custom stage chain such as "grayscale,blur:ksize=3,otsu", or "auto" to
+            escalate to more expensive preprocessing only while confidence is low
+        language: Installed language pack, or packs joined with '+' (e.g. eng+chi_sim)
+        tiled: OCR text blocks in parallel at native resolution instead of
+            downscaling the whole image (for large scans and posters)
+        output: 'text' (default), 'json' to add word/line/block boxes and
+            confidences as parallel arrays, or 'npz' to download them as a
+            compressed NumPy archive
     
     Returns:
         JSON response with extracted text and processed image path
@@ -82,45 +284,87 @@ async def upload_image(
     start_time = time.time()
     
     try:
-        # Validate file extension
-        if not file.filename:
-            raise HTTPException(
-                status_code=400,
-                detail="No filename provided"
-            )
-            
-        # We already checked that filename is not None
-        filename: str = file.filename  # Type hint to help LSP
-        file_extension = os.path.splitext(filename)[1].lower()
+        # Read the upload into memory in chunks, rejecting unsupported
+        # content and oversized files or images from their first bytes
+        # before they are decoded; it is decoded once by the worker
+        read_start = time.perf_counter()
+        image_data = await read_file(file)
+        metrics.upload_read_seconds.observe(time.perf_counter() - read_start)
+        filename: str = file.filename
         
-        if file_extension not in VALID_EXTENSIONS:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Unsupported file format. Supported formats: {', '.join(VALID_EXTENSIONS)}"
-            )
+        # Validate language
+        language = language_registry.resolve(language)  # Default to English if not installed
         
-        # Generate a unique filename for the upload
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        temp_path = TEMP_DIR / unique_filename
+        preprocess_type = validate_preprocess_type(preprocess_type)
         
-        # Save the uploaded file
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        if output not in OUTPUT_FORMATS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"output must be one of: {', '.join(OUTPUT_FORMATS)}"
+            )
+        structured = output != "text"
         
-        # Validate language
-        if language not in ["eng", "chi_sim"]:
-            language = "eng"  # Default to English if invalid language
+        request_id = uuid.uuid4().hex
+        logger.debug("Processing image %s with language: %s, preprocessing: %s", request_id, language, preprocess_type)
         
-        logger.info(f"Processing image with language: {language}, preprocessing: {preprocess_type}")
+        pages = None
+        data = None
+        auto = None
+        orientation = None
+        cached = False
+        if is_multipage(filename, image_data):
+            # Multi-page PDF/TIFF: OCR the pages in parallel, keep page order
+            pages = await process_document(filename, image_data, preprocess_type, language, structured)
+            if structured:
+                data = OCRData.merge((page, 0, 0, number) for number, page in enumerate(pages, start=1))
+                pages = [layout_text(page, language) for page in pages]
+            text = "\n\n".join(pages)
+        else:
+            # Repeated uploads are answered from the result cache without
+            # decoding, preprocessing or running Tesseract
+            tiled = should_tile(image_data, tiled)
+            image_hash = hash_image(image_data)
+            cache_key = get_cache_key(
+                image_hash, preprocess_type, language, tiled, "data" if structured else "text"
+            )
+            text = await result_cache.aget(cache_key)
+            cached = text is not None
+            if cached and structured:
+                data = OCRData.from_dict(text)
+                text = layout_text(data, language)
+            if not cached:
+                # Estimated once per image, so retrying with another
+                # preprocessing type does not repeat it
+                orientation = await resolve_orientation(image_hash, image_data, preprocess_type)
         
-        # Preprocess the image
-        processed_image = preprocess_image(str(temp_path), preprocess_type)
+        if pages is None and not cached and structured:
+            # Text, boxes and confidences come from the same engine pass
+            if tiled:
+                data = await ocr_tiled(
+                    ocr_pool, image_data, preprocess_type, language, structured=True, orientation=orientation
+                )
+            else:
+                data, auto = await run_single(
+                    image_data, preprocess_type, language, True, request_id=request_id, orientation=orientation
+                )
+            text = layout_text(data, language)
+            await result_cache.aset(cache_key, data.to_dict())
         
-        # Extract text using OCR with the specified language
-        text = extract_text(processed_image, language)
+        elif pages is None and not cached:
+            # Preprocess the image and extract text on the OCR worker pool so the
+            # event loop stays free for other requests
+            if tiled:
+                text = await ocr_tiled(ocr_pool, image_data, preprocess_type, language, orientation=orientation)
+            else:
+                text, auto = await run_single(
+                    image_data, preprocess_type, language, request_id=request_id, orientation=orientation
+                )
+            if not text.startswith(OCR_ERROR_PREFIX):
+                await result_cache.aset(cache_key, text)
         
         # Calculate processing time
         processing_time = time.time() - start_time
+        metrics.request_seconds.labels("upload").observe(processing_time)
         
         # Track this successful conversion
         try:
@@ -129,37 +373,63 @@ async def upload_image(
                 request, 
                 file.size, 
                 language, 
-                preprocess_type,
+                tracked_preprocess_type(preprocess_type),
                 char_count
             )
         except Exception as e:
             logger.error(f"Error tracking conversion: {str(e)}")
         
-        # Clean up temporary file
-        try:
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
-        except Exception as e:
-            logger.warning(f"Error cleaning up temp file: {e}")
+        if output == "npz":
+            return Response(
+                content=data.to_npz(full_text=text),
+                media_type="application/octet-stream",
+                headers={
+                    "Content-Disposition": f'attachment; filename="{os.path.splitext(filename)[0]}.npz"',
+                    "X-Processing-Time": str(round(processing_time, 2)),
+                    "X-Cached": str(cached).lower()
+                }
+            )
         
         # Return the extracted text and processing information
-        return {
+        response = {
             "filename": file.filename,
             "size": file.size,
             "text": text,
             "processing_time": round(processing_time, 2),
             "preprocessing_type": preprocess_type,
-            "language": language
+            "language": language,
+            "cached": cached
         }
+        if pages is None and tiled:
+            response["tiled"] = True
+        if auto is not None:
+            response["auto"] = auto
+        if orientation is not None and (orientation["rotation"] or orientation["skew"]):
+            response["orientation"] = orientation
+        if data is not None:
+            response["data"] = data.to_dict()
+        if pages is not None:
+            response["page_count"] = len(pages)
+            response["pages"] = [{"page": number, "text": page_text} for number, page_text in enumerate(pages, start=1)]
+        return response
+    
+    except HTTPException:
+        raise
+    
+    except PoolSaturatedError as e:
+        logger.warning(f"Rejecting OCR request: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    
+    except PoolTimeoutError as e:
+        logger.warning(f"OCR request timed out: {str(e)}")
+        raise HTTPException(status_code=504, detail=str(e))
+    
+    except ImageError as e:
+        logger.warning(f"Rejecting unreadable image: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
     
     except Exception as e:
         logger.error(f"Error processing image: {str(e)}")
-        # Clean up temporary file in case of error
-        try:
-            if 'temp_path' in locals() and os.path.exists(temp_path):
-                os.unlink(temp_path)
-        except Exception as cleanup_error:
-            logger.warning(f"Error cleaning up temp file after error: {cleanup_error}")
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
 @app.post("/api/extract-text/")
@@ -167,7 +437,9 @@ async def extract_text_api(
     request: Request,
     file: UploadFile = File(...),
     preprocess_type: str = Form("default"),
-    language: str = Form("eng")
+    language: str = Form("eng"),
+    tiled: bool = Form(False),
+    output: str = Form("text")
 ):
     """
     API endpoint to extract text from an image.
@@ -176,7 +448,9 @@ async def extract_text_api(
         request: The HTTP request
         file: The image file to extract text from
         preprocess_type: Type of preprocessing to apply (default, grayscale, threshold, adaptive)
-        language: Language for OCR (eng, chi_sim)
+        language: Installed language pack, or packs joined with '+' (e.g. eng+chi_sim)
+        tiled: OCR text blocks in parallel at native resolution
+        output: 'text' (default), 'json' or 'npz' (see /upload/)
     
     Returns:
         JSON response with extracted text
@@ -185,9 +459,363 @@ async def extract_text_api(
         request=request, 
         file=file, 
         preprocess_type=preprocess_type, 
-        language=language
+        language=language,
+        tiled=tiled,
+        output=output
     )
     
+@app.post("/api/extract-text/stream")
+async def extract_text_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    preprocess_type: str = Form("default"),
+    language: str = Form("eng"),
+    tiled: bool = Form(False)
+):
+    """
+    Extract text from an image or document and stream it as it is recognized.
+    
+    Pages of multi-page PDFs and TIFFs, and text blocks of tiled images, are
+    sent as soon as each one is OCRed, so the first text of a long document
+    arrives long before the last page is done. Work waits for free OCR
+    workers instead of being rejected, since the client sees the progress.
+    
+    Events (Server-Sent Events, in this order):
+        start: filename, size, mode ('document', 'tiled' or 'image'),
+            preprocessing_type and language
+        progress: stage ('orientation' for auto, 'layout' or 'ocr') with completed
+            and total counts, sent when a stage starts and as it advances;
+            the page total of a document is not known up front (null)
+        page / block: index, page number or block box, and text, in
+            completion order
+        done: the full text in reading order, processing_time and cached,
+            plus auto and orientation details as returned by /upload/
+        error: detail and status code; no done event follows
+    
+    Args:
+        request: The HTTP request
+        file: The image or document to extract text from
+        preprocess_type: Preprocessing preset, custom stage chain, or 'auto' (see /upload/)
+        language: Installed language pack, or packs joined with '+' (e.g. eng+chi_sim)
+        tiled: OCR text blocks in parallel at native resolution
+    
+    Returns:
+        Streaming response of Server-Sent Events
+    """
+    start_time = time.time()
+    
+    # Bad uploads are still answered with an HTTP error before the stream starts
+    image_data = await read_file(file)
+    filename: str = file.filename
+    size = file.size
+    language = language_registry.resolve(language)
+    preprocess_type = validate_preprocess_type(preprocess_type)
+    
+    multipage = is_multipage(filename, image_data)
+    if not multipage:
+        tiled = should_tile(image_data, tiled)
+    mode = "document" if multipage else "tiled" if tiled else "image"
+    
+    async def events():
+        yield {
+            "event": "start",
+            "filename": filename,
+            "size": size,
+            "mode": mode,
+            "preprocessing_type": preprocess_type,
+            "language": language
+        }
+        
+        parts = {}
+        orientation = None
+        auto = None
+        cached = False
+        if multipage:
+            yield {"event": "progress", "stage": "ocr", "completed": 0, "total": None}
+            async for result in document_results(filename, image_data, preprocess_type, language):
+                if "filename" not in result:
+                    if "error" in result:
+                        raise ValueError(result["error"])
+                    continue
+                parts[result["index"]] = page_text(result)
+                yield {"event": "page", "index": result["index"], "page": result["index"] + 1,
+                       "text": parts[result["index"]]}
+                yield {"event": "progress", "stage": "ocr", "completed": len(parts), "total": None}
+            text = "\n\n".join(parts[index] for index in sorted(parts))
+        else:
+            image_hash = hash_image(image_data)
+            cache_key = get_cache_key(image_hash, preprocess_type, language, tiled)
+            text = await result_cache.aget(cache_key)
+            cached = text is not None
+        
+        if not multipage and not cached:
+            if preprocess_type == AUTO:
+                yield {"event": "progress", "stage": "orientation", "completed": 0, "total": 1}
+            orientation = await resolve_orientation(image_hash, image_data, preprocess_type, wait=True)
+            if preprocess_type == AUTO:
+                yield {"event": "progress", "stage": "orientation", "completed": 1, "total": 1}
+            if tiled:
+                boxes = []
+                yield {"event": "progress", "stage": "layout", "completed": 0, "total": 1}
+                async for result in iter_tiled(ocr_pool, image_data, preprocess_type, language,
+                                               orientation=orientation):
+                    if result.get("event") == "layout":
+                        boxes = result["boxes"]
+                        yield {"event": "progress", "stage": "layout", "completed": 1, "total": 1}
+                        yield {"event": "progress", "stage": "ocr", "completed": 0, "total": len(boxes)}
+                    elif "filename" in result:
+                        parts[result["index"]] = page_text(result)
+                        yield {"event": "block", "index": result["index"], "box": boxes[result["index"]],
+                               "text": parts[result["index"]]}
+                        yield {"event": "progress", "stage": "ocr", "completed": len(parts), "total": len(boxes)}
+                text = join_blocks(parts[index] for index in sorted(parts))
+            else:
+                yield {"event": "progress", "stage": "ocr", "completed": 0, "total": 1}
+                text, auto = await run_single(
+                    image_data, preprocess_type, language, wait=True, orientation=orientation
+                )
+                yield {"event": "progress", "stage": "ocr", "completed": 1, "total": 1}
+            if not text.startswith(OCR_ERROR_PREFIX):
+                await result_cache.aset(cache_key, text)
+        
+        processing_time = time.time() - start_time
+        metrics.request_seconds.labels("stream").observe(processing_time)
+        
+        try:
+            track_conversion(request, size, language, tracked_preprocess_type(preprocess_type), len(text))
+        except Exception as e:
+            logger.error(f"Error tracking conversion: {str(e)}")
+        
+        done = {
+            "event": "done",
+            "text": text,
+            "processing_time": round(processing_time, 2),
+            "cached": cached
+        }
+        if multipage:
+            done["page_count"] = len(parts)
+        elif tiled and not cached:
+            done["block_count"] = len(parts)
+        if auto is not None:
+            done["auto"] = auto
+        if orientation is not None and (orientation["rotation"] or orientation["skew"]):
+            done["orientation"] = orientation
+        yield done
+    
+    async def body():
+        # The status line is already sent, so failures become an error event
+        try:
+            async for event in events():
+                yield format_sse(event)
+        except PoolTimeoutError as e:
+            logger.warning(f"OCR request timed out: {str(e)}")
+            yield format_sse({"event": "error", "status": 504, "detail": str(e)})
+        except ImageError as e:
+            logger.warning(f"Rejecting unreadable image: {str(e)}")
+            yield format_sse({"event": "error", "status": 400, "detail": str(e)})
+        except Exception as e:
+            logger.error(f"Error processing image: {str(e)}")
+            yield format_sse({"event": "error", "status": 500, "detail": f"Error processing image: {str(e)}"})
+    
+    return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+    
+@app.post("/api/extract-text/batch")
+async def extract_text_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    preprocess_type: str = Form("default"),
+    language: str = Form("eng"),
+    format: str = Form("ndjson")
+):
+    """
+    Extract text from many images and stream each result as soon as it is ready.
+    
+    Zip archives are expanded to the images they contain and multi-page TIFFs
+    are split into pages. Images are fanned out across the OCR workers.
+    
+    Args:
+        request: The HTTP request
+        files: Image files, zip archives or multi-page TIFFs
+        preprocess_type: Type of preprocessing to apply to every image
+        language: Installed language pack, or packs joined with '+' (e.g. eng+chi_sim)
+        format: Stream format, 'ndjson' (one JSON object per line) or 'sse'
+    
+    Returns:
+        Streaming response with one result per image in completion order,
+        followed by a final summary event
+    """
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
+    
+    language = language_registry.resolve(language)
+    
+    preprocess_type = validate_preprocess_type(preprocess_type)
+    
+    # Read the uploads before streaming; the multipart files are closed once
+    # the handler returns
+    uploads = []
+    total = 0
+    for file in files:
+        # Archives may take up the rest of the batch, other files are capped
+        # like single uploads
+        remaining = MAX_BATCH_BYTES - total
+        is_archive = os.path.splitext(file.filename or "")[1].lower() == ".zip"
+        limit = remaining if is_archive else min(MAX_UPLOAD_BYTES, remaining)
+        data = await read_file(file, BATCH_EXTENSIONS, max_bytes=limit)
+        total += len(data)
+        uploads.append((file.filename, data))
+    
+    def items():
+        for filename, data in uploads:
+            yield from iter_batch_items(filename, data, VALID_EXTENSIONS)
+    
+    async def process(name, payload):
+        start_time = time.time()
+        cache_key = None
+        image_hash = None
+        text = None
+        if isinstance(payload, (bytes, bytearray)):
+            image_hash = hash_image(payload)
+            cache_key = get_cache_key(image_hash, preprocess_type, language)
+            text = await result_cache.aget(cache_key)
+        cached = text is not None
+        
+        if not cached:
+            orientation = None
+            if image_hash:
+                orientation = await resolve_orientation(image_hash, payload, preprocess_type, wait=True)
+            text, _ = await run_single(payload, preprocess_type, language, wait=True, orientation=orientation)
+            if text.startswith(OCR_ERROR_PREFIX):
+                return {"error": text}
+            if cache_key:
+                await result_cache.aset(cache_key, text)
+        
+        try:
+            size = len(payload) if cache_key else payload.nbytes
+            track_conversion(request, size, language, tracked_preprocess_type(preprocess_type), len(text))
+        except Exception as e:
+            logger.error(f"Error tracking conversion: {str(e)}")
+        
+        return {
+            "text": text,
+            "processing_time": round(time.time() - start_time, 2),
+            "cached": cached
+        }
+    
+    formatter = format_ndjson if format == "ndjson" else format_sse
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/event-stream"
+    
+    async def body():
+        async for result in stream_batch(items(), process, ocr_pool.max_workers):
+            yield formatter(result)
+    
+    return StreamingResponse(body(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+async def run_ocr_job(payload, params):
+    """
+    Job handler for queued OCR requests.
+    
+    Args:
+        payload: Uploaded image bytes
+        params: Job parameters (filename, preprocess_type, language, tiled)
+        
+    Returns:
+        Dict with the extracted text
+    """
+    start_time = time.time()
+    preprocess_type = params["preprocess_type"]
+    language = params["language"]
+    
+    if is_multipage(params["filename"], payload):
+        pages = await process_document(params["filename"], payload, preprocess_type, language)
+        return {
+            "text": "\n\n".join(pages),
+            "pages": [{"page": number, "text": page_text} for number, page_text in enumerate(pages, start=1)],
+            "processing_time": round(time.time() - start_time, 2),
+            "cached": False
+        }
+    
+    tiled = should_tile(payload, params.get("tiled", False))
+    image_hash = hash_image(payload)
+    cache_key = get_cache_key(image_hash, preprocess_type, language, tiled)
+    text = await result_cache.aget(cache_key)
+    cached = text is not None
+    
+    if not cached:
+        orientation = await resolve_orientation(image_hash, payload, preprocess_type, wait=True)
+        if tiled:
+            text = await ocr_tiled(ocr_pool, payload, preprocess_type, language, orientation=orientation)
+        else:
+            text, _ = await run_single(payload, preprocess_type, language, wait=True, orientation=orientation)
+        if text.startswith(OCR_ERROR_PREFIX):
+            raise RuntimeError(text)
+        await result_cache.aset(cache_key, text)
+    
+    return {
+        "text": text,
+        "processing_time": round(time.time() - start_time, 2),
+        "cached": cached
+    }
+
+# Background OCR job queue
+job_queue = JobQueue(create_store(), run_ocr_job, JOB_CONCURRENCY or ocr_pool.max_workers)
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(
+    file: UploadFile = File(...),
+    preprocess_type: str = Form("default"),
+    language: str = Form("eng"),
+    priority: int = Form(0),
+    tiled: bool = Form(False)
+):
+    """
+    Queue an image for OCR and return a job id immediately.
+    
+    Args:
+        file: The image file to extract text from
+        preprocess_type: Type of preprocessing to apply
+        language: Installed language pack, or packs joined with '+' (e.g. eng+chi_sim)
+        priority: Higher priority jobs run first (default: 0)
+        tiled: OCR text blocks in parallel at native resolution
+        
+    Returns:
+        JSON response with the job id and status
+    """
+    image_data = await read_file(file)
+    
+    language = language_registry.resolve(language)
+    
+    preprocess_type = validate_preprocess_type(preprocess_type)
+    
+    params = {"filename": file.filename, "preprocess_type": preprocess_type, "language": language, "tiled": tiled}
+    try:
+        job = await job_queue.submit(image_data, params, priority)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    
+    return public_job(job)
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """
+    Get the status and result of a job.
+    
+    Args:
+        job_id: Id returned when the job was submitted
+        wait: Seconds to long-poll for the job to finish (max 30)
+        
+    Returns:
+        JSON response with the job status, and the result once it is done
+    """
+    if wait > 0:
+        job = await job_queue.wait(job_id, min(wait, 30))
+    else:
+        job = await job_queue.get(job_id)
+    
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return public_job(job)
+
 @app.get("/api/statistics/")
 async def get_usage_statistics():
     """
@@ -197,7 +825,7 @@ async def get_usage_statistics():
         JSON response with usage statistics
     """
     try:
-        stats = get_statistics()
+        stats = await asyncio.to_thread(get_statistics)
         return {
             "success": True,
             "statistics": stats
@@ -209,6 +837,47 @@ async def get_usage_statistics():
             "error": f"Error getting statistics: {str(e)}"
         }
 
+@app.get("/api/cache/")
+async def get_cache_statistics():
+    """Get OCR result cache hit/miss counters and sizes."""
+    return {
+        "success": True,
+        "cache": result_cache.stats()
+    }
+
+def collect_metrics():
+    """Copy pool, cache and analytics state into the metrics registry."""
+    pool = ocr_pool.stats()
+    metrics.pool_in_flight.set(pool["in_flight"])
+    metrics.pool_queued.set(pool["queued"])
+    metrics.pool_rejected.set(pool["rejected"])
+    metrics.pool_timed_out.set(pool["timed_out"])
+    # Worker nodes keep their own pixel budget
+    metrics.pool_pixels_in_flight.set(pool.get("pixels_in_flight", 0))
+    metrics.pool_memory_waiting.set(pool.get("memory_waiting", 0))
+    metrics.process_rss_bytes.set(rss_bytes())
+    
+    # Read the cache counters directly; stats() also counts the rows on disk
+    lookups = result_cache.hits + result_cache.misses
+    metrics.cache_hits.labels("memory").set(result_cache.memory_hits)
+    metrics.cache_misses.set(result_cache.misses)
+    metrics.cache_hit_ratio.set(result_cache.hits / lookups if lookups else 0)
+    metrics.cache_bytes.labels("memory").set(result_cache.memory.bytes)
+    if result_cache.disk is not None:
+        metrics.cache_hits.labels("disk").set(result_cache.disk_hits)
+        metrics.cache_bytes.labels("disk").set(result_cache.disk.bytes)
+    
+    writer = analytics.stats()
+    metrics.analytics_buffered.set(writer["buffered"])
+    metrics.analytics_dropped.set(writer["dropped"])
+
+metrics.registry.add_collector(collect_metrics)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Expose stage timings and pool, cache and engine counters in the Prometheus text format."""
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/api/preprocessing-types/")
 async def get_preprocessing_types():
     """Get available preprocessing types."""
@@ -218,25 +887,36 @@ async def get_preprocessing_types():
             {"id": "grayscale", "name": "Grayscale"},
             {"id": "threshold", "name": "Binary Threshold"},
             {"id": "adaptive", "name": "Adaptive Threshold"},
-            {"id": "denoise", "name": "Denoise"}
-        ]
+            {"id": "denoise", "name": "Denoise"},
+            {"id": "default-normalized", "name": "Default, scaled to text size"},
+            {"id": "grayscale-normalized", "name": "Grayscale, scaled to text size"},
+            {"id": "threshold-normalized", "name": "Binary Threshold, scaled to text size"},
+            {"id": "adaptive-normalized", "name": "Adaptive Threshold, scaled to text size"},
+            {"id": "denoise-normalized", "name": "Denoise, scaled to text size"},
+            {"id": "auto", "name": "Auto (best confidence)"}
+        ],
+        "presets": PRESETS,
+        "stages": list(STAGES),
+        "stage_parameters": {
+            stage: {key: param.describe() for key, param in params.items()}
+            for stage, params in STAGE_PARAMS.items()
+        }
     }
 
 @app.get("/api/languages/")
 async def get_languages():
-    """Get available OCR languages."""
-    return {
-        "languages": [
-            {"id": "eng", "name": "English"},
-            {"id": "chi_sim", "name": "Chinese (Simplified)"}
-        ]
-    }
+    """Get the installed OCR language packs, their sizes and which are preloaded."""
+    return language_registry.snapshot()
     
 @app.post("/api/detect-language/")
 async def detect_image_language(file: UploadFile = File(...)):
     """
     Detect the language in an uploaded image.
     
+    Uses Tesseract script detection on a downsampled copy, falling back to a
+    quick OCR pass over a few sampled text regions. Results are cached per
+    image.
+    
     Args:
         file: The image file to analyze
         
@@ -244,42 +924,43 @@ async def detect_image_language(file: UploadFile = File(...)):
         JSON response with detected language
     """
     try:
-        # Validate file existence
-        if not file.filename:
-            raise HTTPException(status_code=400, detail="No file provided")
-            
-        # Validate file extension
+        image_data = await read_file(file)
         filename = file.filename
-        file_extension = os.path.splitext(filename)[1].lower() if filename else ""
-        if file_extension not in VALID_EXTENSIONS:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Unsupported file format. Supported formats: {', '.join(VALID_EXTENSIONS)}"
-            )
-            
-        # Generate a unique filename for the upload
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        temp_path = TEMP_DIR / unique_filename
-        
-        # Save the uploaded file
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Detect language using our detection function
-        detected_language = detect_language(str(temp_path))
+        cache_key = make_key(hash_image(image_data), "detect-language", *language_registry.languages())
+        detection = await result_cache.aget(cache_key)
+        cached = detection is not None
         
-        # Clean up temporary file
-        try:
-            os.unlink(temp_path)
-        except Exception as e:
-            logger.warning(f"Error removing temp file: {e}")
+        if not cached:
+            if is_multipage(filename, image_data):
+                # The first page decides for the whole document
+                pages = iter_document_pages(filename, image_data, max_pages=1)
+                try:
+                    _, payload = await asyncio.to_thread(next, pages)
+                finally:
+                    pages.close()
+            else:
+                payload = image_data
+            detection = await ocr_pool.submit(detect_language, payload, language_registry.languages())
+            await result_cache.aset(cache_key, detection)
             
         return {
             "success": True,
-            "language": detected_language,
-            "filename": file.filename
+            **detection,
+            "filename": file.filename,
+            "cached": cached
         }
     
+    except HTTPException:
+        raise
+    
+    except PoolSaturatedError as e:
+        logger.warning(f"Rejecting language detection request: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    
+    except PoolTimeoutError as e:
+        logger.warning(f"Language detection timed out: {str(e)}")
+        raise HTTPException(status_code=504, detail=str(e))
+    
     except Exception as e:
         logger.error(f"Error detecting language: {str(e)}")
         return {
@@ -289,13 +970,14 @@ async def detect_image_language(file: UploadFile = File(...)):
         }
     
 @app.post("/api/clean-text/")
-async def clean_text_api(text: str = Form(...), fix_layout: bool = Form(True)):
+async def clean_text_api(text: str = Form(...), fix_layout: bool = Form(True), language: str = Form(None)):
     """
     Clean the OCR text by fixing punctuation and formatting issues.
     
     Args:
         text: The text to clean
         fix_layout: Whether to fix layout/alignment issues
+        language: Language of the text, selecting language-specific rules
         
     Returns:
         Cleaned text
@@ -305,11 +987,10 @@ async def clean_text_api(text: str = Form(...), fix_layout: bool = Form(True)):
             return {"success": False, "error": "No text provided"}
             
         # Apply text cleaning
-        cleaned_text = clean_text(text, fix_punctuation=True, fix_layout=fix_layout)
+        cleaned_text = clean_text(text, fix_punctuation=True, fix_layout=fix_layout, language=language)
         
         return {
             "success": True,
-            "original_text": text,
             "cleaned_text": cleaned_text
         }
     except Exception as e:
@@ -319,10 +1000,21 @@ async def clean_text_api(text: str = Form(...), fix_layout: bool = Form(True)):
 @app.on_event("startup")
 async def startup_event():
     logger.info("OCR Application starting up")
+    # List the language packs and read the Tesseract version once
+    await asyncio.to_thread(language_registry.refresh, True)
+    await asyncio.to_thread(language_registry.version)
+    ocr_pool.start()
+    await job_queue.start()
+    await analytics.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("OCR Application shutting down")
+    await job_queue.stop()
+    ocr_pool.shutdown(wait=False)
+    # Write buffered tracking events before exiting
+    await analytics.stop()
+    result_cache.close()
     # Clean up temporary files
     if TEMP_DIR.exists():
         for file in TEMP_DIR.glob("*"):
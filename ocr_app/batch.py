@@ -0,0 +1,179 @@
+import io
+import os
+import json
+import asyncio
+import logging
+import zipfile
+
+from .workers import PoolSaturatedError
+from .documents import is_multipage, iter_document_pages
+from .uploads import MAX_UPLOAD_BYTES, HEADER_SEARCH_BYTES, UploadRejectedError, image_size, check_pixels
+
+logger = logging.getLogger(__name__)
+
+# Batch configuration
+# OCR_BATCH_MAX_ITEMS: maximum number of images (after expanding archives/pages) per batch
+BATCH_MAX_ITEMS = int(os.environ.get("OCR_BATCH_MAX_ITEMS", 1000))
+
+# Seconds to wait before retrying when the worker pool is saturated
+SATURATED_RETRY_DELAY = 0.1
+
+
+def iter_batch_items(filename, data, valid_extensions):
+    """
+    Expand an uploaded file into the individual images it contains.
+
+    Zip archives yield their image members in name order, and PDFs and
+    multi-page TIFFs yield one decoded array per page. Everything else is
+    yielded as-is.
+
+    Args:
+        filename: Name of the uploaded file
+        data: Uploaded bytes
+        valid_extensions: Set of accepted image extensions
+
+    Yields:
+        Tuples of (name, payload) where payload is encoded bytes or a numpy array
+    """
+    extension = os.path.splitext(filename)[1].lower()
+
+    if extension == ".zip":
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            members = sorted(
+                (info for info in archive.infolist() if not info.is_dir()),
+                key=lambda info: info.filename
+            )
+            for info in members:
+                member_extension = os.path.splitext(info.filename)[1].lower()
+                if member_extension not in valid_extensions:
+                    logger.debug("Skipping unsupported archive member: %s", info.filename)
+                    continue
+                if info.file_size > MAX_UPLOAD_BYTES:
+                    logger.warning(f"Skipping archive member over {MAX_UPLOAD_BYTES} bytes: {info.filename}")
+                    continue
+                # Check the dimensions from the member's header before it is
+                # decompressed, as uploads are checked by read_upload
+                with archive.open(info) as member:
+                    size = image_size(member.read(HEADER_SEARCH_BYTES))
+                if size is not None:
+                    try:
+                        check_pixels(info.filename, size)
+                    except UploadRejectedError as e:
+                        logger.warning(f"Skipping archive member: {e}")
+                        continue
+                yield from iter_batch_items(
+                    f"{filename}/{info.filename}", archive.read(info), valid_extensions
+                )
+
+    elif is_multipage(filename, data):
+        yield from iter_document_pages(filename, data)
+
+    elif extension in valid_extensions:
+        yield filename, data
+
+    else:
+        raise ValueError(f"Unsupported file format: {filename}")
+
+
+async def submit_when_ready(pool, fn, *args, **options):
+    """
+    Submit a job to ``pool``, waiting for capacity instead of failing fast.
+
+    Batch items are produced by the server itself, so they back off while
+    the pool is saturated rather than being rejected like interactive
+    requests. ``options`` are passed on to ``pool.submit``.
+    """
+    while True:
+        try:
+            return await pool.submit(fn, *args, **options)
+        except PoolSaturatedError:
+            await asyncio.sleep(SATURATED_RETRY_DELAY)
+
+
+async def stream_batch(items, process, concurrency, max_items=BATCH_MAX_ITEMS):
+    """
+    Run ``process`` over ``items`` concurrently and yield results as they complete.
+
+    At most ``concurrency`` items are in flight, and items are pulled from
+    the iterator (on a worker thread, since expanding archives and TIFF
+    frames decodes data) only when a slot is free, so memory stays bounded
+    regardless of the batch size.
+
+    Args:
+        items: Iterator of (name, payload) tuples
+        process: Async callable taking (name, payload) and returning a dict
+        concurrency: Maximum number of items processed at once
+        max_items: Maximum number of items accepted from ``items``
+
+    Yields:
+        Result dicts with ``index`` and ``filename`` keys, in completion order,
+        followed by a final ``{"event": "done", ...}`` summary
+    """
+    results = asyncio.Queue()
+    semaphore = asyncio.Semaphore(concurrency)
+    summary = {"event": "done", "count": 0, "errors": 0}
+
+    async def run(index, name, payload):
+        try:
+            result = await process(name, payload)
+        except Exception as e:
+            logger.error(f"Error processing batch item {name}: {str(e)}")
+            result = {"error": str(e)}
+        finally:
+            semaphore.release()
+        await results.put({"index": index, "filename": name, **result})
+
+    async def produce():
+        tasks = set()
+        iterator = iter(items)
+        try:
+            index = 0
+            while True:
+                await semaphore.acquire()
+                try:
+                    item = await asyncio.to_thread(next, iterator, None)
+                except Exception as e:
+                    semaphore.release()
+                    await results.put({"index": index, "error": f"Error reading batch: {str(e)}"})
+                    break
+                if item is None:
+                    semaphore.release()
+                    break
+                if index >= max_items:
+                    semaphore.release()
+                    await results.put({"index": index, "error": f"Batch limit of {max_items} images reached"})
+                    break
+                task = asyncio.create_task(run(index, *item))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                index += 1
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await results.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            result = await results.get()
+            if result is None:
+                break
+            summary["count"] += 1
+            if "error" in result:
+                summary["errors"] += 1
+            yield result
+        yield summary
+    finally:
+        producer.cancel()
+
+
+def format_ndjson(result):
+    """Encode a result as one line of newline-delimited JSON."""
+    return json.dumps(result, ensure_ascii=False) + "\n"
+
+
+def format_sse(result):
+    """Encode a result as a Server-Sent Event."""
+    event = result.get("event", "result")
+    return f"event: {event}\ndata: {json.dumps(result, ensure_ascii=False)}\n\n"
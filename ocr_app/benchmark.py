@@ -0,0 +1,454 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import platform
+import argparse
+import resource
+import subprocess
+from datetime import datetime, timezone
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+# Sample sentences rendered into the synthetic corpus
+SAMPLE_TEXT = {
+    "eng": [
+        "The quick brown fox jumps over the lazy dog.",
+        "Invoice 2024-117: total due within 30 days.",
+        "Optical character recognition turns pixels into text.",
+        "Pack my box with five dozen liquor jugs!",
+    ],
+    "chi_sim": [
+        "今天天气很好，我们去公园散步。",
+        "光学字符识别把图像转换成文字。",
+        "这是一个用于测试的中文句子。",
+        "请在三十天内支付全部费用。",
+    ],
+}
+
+# Fonts able to render each language; the first one found is used
+FONT_CANDIDATES = {
+    "eng": [
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+        "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+        "/Library/Fonts/Arial.ttf",
+        "C:/Windows/Fonts/arial.ttf",
+    ],
+    "chi_sim": [
+        "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+        "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+        "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc",
+        "/System/Library/Fonts/PingFang.ttc",
+        "C:/Windows/Fonts/msyh.ttc",
+    ],
+}
+
+# Corpus dimensions: text height in pixels, Gaussian noise sigma, page width
+TEXT_SIZES = (12, 24, 48)
+NOISE_LEVELS = (0, 12)
+PAGE_WIDTHS = (800, 2400)
+
+# Timed runs per measurement; the median is reported
+DEFAULT_REPEAT = 3
+
+
+def find_font(language):
+    """Return the path of a font that can render ``language``, or None."""
+    for path in FONT_CANDIDATES.get(language, []):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def render_page(language, text_size, noise, width, seed=0):
+    """
+    Render a page of sample text.
+
+    Args:
+        language: Language code with an entry in SAMPLE_TEXT
+        text_size: Text height in pixels
+        noise: Standard deviation of the Gaussian noise added to the page
+        width: Page width in pixels; the height follows a 4:3 aspect ratio
+        seed: Seed for the noise, so the corpus is identical between runs
+
+    Returns:
+        Tuple of (BGR numpy array, rendered text)
+    """
+    height = width * 3 // 4
+    page = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    font_path = find_font(language)
+    if font_path:
+        font = ImageFont.truetype(font_path, text_size)
+    else:
+        font = ImageFont.load_default(text_size)
+
+    margin = max(10, width // 20)
+    line_height = int(text_size * 1.6)
+    sentences = SAMPLE_TEXT[language]
+    lines = []
+    y = margin
+    while y + line_height < height - margin:
+        line = sentences[len(lines) % len(sentences)]
+        draw.text((margin, y), line, fill=0, font=font)
+        lines.append(line)
+        y += line_height
+
+    array = np.asarray(page, dtype=np.float32)
+    if noise:
+        rng = np.random.default_rng(seed)
+        array = array + rng.normal(0, noise, array.shape)
+    array = np.clip(array, 0, 255).astype(np.uint8)
+    return cv2.cvtColor(array, cv2.COLOR_GRAY2BGR), "\n".join(lines)
+
+
+def build_corpus(languages=("eng", "chi_sim"), text_sizes=TEXT_SIZES,
+                 noise_levels=NOISE_LEVELS, widths=PAGE_WIDTHS):
+    """
+    Generate the synthetic corpus.
+
+    Languages without an installed font are skipped, since the default
+    bitmap font cannot render them.
+
+    Returns:
+        List of dicts with the ``name``, ``language``, PNG ``data`` and
+        rendered ``text`` of each page
+    """
+    corpus = []
+    for language in languages:
+        if language != "eng" and find_font(language) is None:
+            logger.warning(f"No font for {language} found, skipping it in the corpus")
+            continue
+        for text_size in text_sizes:
+            for noise in noise_levels:
+                for width in widths:
+                    image, text = render_page(language, text_size, noise, width, seed=len(corpus))
+                    ok, encoded = cv2.imencode(".png", image)
+                    if not ok:
+                        raise ValueError("Failed to encode benchmark page")
+                    corpus.append({
+                        "name": f"{language}-{text_size}px-noise{noise}-{width}w",
+                        "language": language,
+                        "data": encoded.tobytes(),
+                        "text": text,
+                    })
+    return corpus
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its children, in MB."""
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) / divisor, 1)
+
+
+def _timings(run, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def _summary(durations):
+    durations = np.asarray(durations) * 1000
+    return {
+        "median_ms": round(float(np.median(durations)), 3),
+        "min_ms": round(float(durations.min()), 3),
+        "runs": len(durations),
+    }
+
+
+def bench_stages(corpus, presets, repeat=DEFAULT_REPEAT, ocr=True):
+    """
+    Measure the latency of each pipeline stage on every corpus page.
+
+    Stages are decoding, the orientation estimate, each preprocessing
+    preset, OCR of the output of the default preset, and cleaning of the
+    OCR text.
+
+    Returns:
+        List of dicts with the ``page``, ``stage`` and latency summary
+    """
+    from .image_processor import decode_image
+    from .preprocessing import parse_pipeline
+    from .ocr import extract_text, clean_text
+    from .orientation import estimate_orientation
+
+    results = []
+    for page in corpus:
+        def record(stage, durations):
+            results.append({"page": page["name"], "stage": stage, **_summary(durations)})
+
+        record("decode", _timings(lambda: decode_image(page["data"]), repeat))
+        image = decode_image(page["data"])
+        record("orientation", _timings(lambda: estimate_orientation(page["data"]), repeat))
+
+        processed = {}
+        for preset in presets:
+            pipeline = parse_pipeline(preset)
+            processed[preset] = pipeline.run(image)
+            record(f"preprocess:{preset}", _timings(lambda: pipeline.run(image), repeat))
+
+        text = page["text"]
+        if ocr:
+            ocr_input = processed.get("default")
+            if ocr_input is None:
+                ocr_input = parse_pipeline("default").run(image)
+            ocr_input = cv2.cvtColor(ocr_input, cv2.COLOR_BGR2RGB) if ocr_input.ndim == 3 else ocr_input
+            text = extract_text(ocr_input, page["language"])
+            record("ocr", _timings(lambda: extract_text(ocr_input, page["language"]), repeat))
+
+        record("clean", _timings(lambda: clean_text(text, language=page["language"]), repeat))
+    return results
+
+
+async def _drain(pool, corpus, preprocess_type):
+    from .workers import run_ocr_pipeline
+
+    return await asyncio.gather(*(
+        pool.submit(run_ocr_pipeline, page["data"], preprocess_type, page["language"])
+        for page in corpus
+    ))
+
+
+def bench_throughput(corpus, worker_counts, mode="thread", preprocess_type="default"):
+    """
+    Measure end-to-end pipeline throughput at several worker counts.
+
+    Every page is submitted at once to a fresh OCRWorkerPool whose queue
+    holds the whole corpus, so the pool is never idle.
+
+    Returns:
+        List of dicts with ``workers``, ``images_per_s`` and ``peak_rss_mb``
+    """
+    from .workers import OCRWorkerPool
+
+    results = []
+    for workers in worker_counts:
+        pool = OCRWorkerPool(mode=mode, max_workers=workers, queue_size=len(corpus), timeout=600)
+        pool.start()
+        try:
+            # Warm the workers up so engine initialization is not measured
+            asyncio.run(_drain(pool, corpus[:workers], preprocess_type))
+            start = time.perf_counter()
+            asyncio.run(_drain(pool, corpus, preprocess_type))
+            elapsed = time.perf_counter() - start
+        finally:
+            pool.shutdown()
+        results.append({
+            "mode": mode,
+            "workers": workers,
+            "images": len(corpus),
+            "images_per_s": round(len(corpus) / elapsed, 2),
+            "peak_rss_mb": peak_rss_mb(),
+        })
+    return results
+
+
+async def _bench_upload(corpus, requests, concurrency, preprocess_type):
+    try:
+        import httpx
+    except ImportError:
+        raise RuntimeError("The /upload/ benchmark needs httpx (pip install httpx)")
+
+    from . import api
+
+    await api.startup_event()
+    try:
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=600) as client:
+            semaphore = asyncio.Semaphore(concurrency)
+            latencies = []
+            statuses = {}
+
+            async def upload(index):
+                page = corpus[index % len(corpus)]
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.post(
+                        "/upload/",
+                        files={"file": (f"{page['name']}.png", page["data"], "image/png")},
+                        data={"preprocess_type": preprocess_type, "language": page["language"]},
+                    )
+                    latencies.append(time.perf_counter() - start)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(upload(index) for index in range(requests)))
+            elapsed = time.perf_counter() - start
+    finally:
+        await api.shutdown_event()
+
+    latencies = np.asarray(latencies) * 1000
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "requests_per_s": round(requests / elapsed, 2),
+        **{f"p{q}_ms": round(float(np.percentile(latencies, q)), 1) for q in (50, 90, 95, 99)},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def bench_upload(corpus, requests=50, concurrency=4, preprocess_type="default"):
+    """
+    Measure /upload/ latency percentiles through an in-process ASGI client.
+
+    The result cache must be disabled (OCR_CACHE_ENABLED=0) before the API
+    module is imported, otherwise repeated pages are answered from the cache.
+
+    Returns:
+        Dict with the request rate, status counts and latency percentiles
+    """
+    return asyncio.run(_bench_upload(corpus, requests, concurrency, preprocess_type))
+
+
+def git_revision():
+    """Current commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(languages=("eng", "chi_sim"), presets=None, worker_counts=(1, 2, 4), mode="thread",
+        repeat=DEFAULT_REPEAT, ocr=True, upload_requests=50, upload_concurrency=4):
+    """
+    Run the whole benchmark suite.
+
+    Returns:
+        Dict with the run metadata and the results of every section
+    """
+    from .preprocessing import PRESETS
+    from .text_cleaning import benchmark as bench_cleaning
+
+    presets = list(presets or PRESETS)
+    corpus = build_corpus(languages)
+    logger.info(f"Generated {len(corpus)} benchmark pages")
+
+    results = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "opencv": cv2.__version__,
+            "engine": os.environ.get("OCR_ENGINE", "auto"),
+            "corpus": [page["name"] for page in corpus],
+        },
+        "stages": bench_stages(corpus, presets, repeat, ocr),
+        "cleaning": bench_cleaning(languages=languages),
+    }
+    if ocr:
+        results["throughput"] = bench_throughput(corpus, worker_counts, mode)
+        if upload_requests:
+            results["upload"] = bench_upload(corpus, upload_requests, upload_concurrency)
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def _stage_medians(results):
+    medians = {}
+    for row in results.get("stages", []):
+        medians.setdefault(row["stage"], []).append(row["median_ms"])
+    return {stage: float(np.sum(values)) for stage, values in medians.items()}
+
+
+def compare(baseline, current):
+    """
+    Compare two result files.
+
+    Args:
+        baseline: Results of the reference run (dict from ``run``)
+        current: Results of the run being evaluated
+
+    Returns:
+        List of (metric, baseline value, current value, relative change);
+        a positive change means slower for latencies and faster for rates
+    """
+    rows = []
+    old_stages, new_stages = _stage_medians(baseline), _stage_medians(current)
+    for stage in new_stages:
+        if stage in old_stages:
+            rows.append((f"stage {stage} (total ms)", old_stages[stage], new_stages[stage]))
+
+    old_throughput = {row["workers"]: row["images_per_s"] for row in baseline.get("throughput", [])}
+    for row in current.get("throughput", []):
+        if row["workers"] in old_throughput:
+            rows.append((f"throughput {row['workers']} workers (images/s)",
+                         old_throughput[row["workers"]], row["images_per_s"]))
+
+    old_upload, new_upload = baseline.get("upload") or {}, current.get("upload") or {}
+    for key in ("p50_ms", "p95_ms", "p99_ms", "requests_per_s"):
+        if key in old_upload and key in new_upload:
+            rows.append((f"upload {key}", old_upload[key], new_upload[key]))
+
+    if "peak_rss_mb" in baseline and "peak_rss_mb" in current:
+        rows.append(("peak RSS (MB)", baseline["peak_rss_mb"], current["peak_rss_mb"]))
+    return [
+        (metric, old, new, (new - old) / old if old else 0.0)
+        for metric, old, new in rows
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the preprocessing and OCR pipeline")
+    parser.add_argument("--output", "-o", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Results file of a previous run to compare against")
+    parser.add_argument("--languages", default="eng,chi_sim")
+    parser.add_argument("--presets", help="Comma-separated presets (default: all)")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--mode", default="thread", choices=("thread", "process"))
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--requests", type=int, default=50, help="/upload/ requests (0 to skip)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent /upload/ requests")
+    parser.add_argument("--no-ocr", action="store_true", help="Only benchmark decoding, preprocessing and cleaning")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    # Every request must do the full work instead of hitting the result cache
+    os.environ["OCR_CACHE_ENABLED"] = "0"
+
+    results = run(
+        languages=tuple(args.languages.split(",")),
+        presets=args.presets.split(",") if args.presets else None,
+        worker_counts=[int(count) for count in args.workers.split(",")],
+        mode=args.mode,
+        repeat=args.repeat,
+        ocr=not args.no_ocr,
+        upload_requests=args.requests,
+        upload_concurrency=args.concurrency,
+    )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Comparing {baseline['meta'].get('revision')} -> {results['meta'].get('revision')}", file=sys.stderr)
+        for metric, old, new, change in compare(baseline, results):
+            print(f"{metric:>45}: {old:10.2f} -> {new:10.2f} ({change:+.1%})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
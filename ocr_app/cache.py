@@ -0,0 +1,369 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from .ocr import get_engine_config
+from .preprocessing import parse_pipeline
+from .adaptive import AUTO, AUTO_FIRST_PASS, AUTO_ESCALATIONS
+
+logger = logging.getLogger(__name__)
+
+# Result cache configuration
+# OCR_CACHE_ENABLED: set to 0 to disable the cache
+# OCR_CACHE_MAX_BYTES: size of the in-memory LRU tier (default 64 MB)
+# OCR_CACHE_DB: path to a SQLite file for the persistent tier (disabled when unset)
+# OCR_CACHE_DB_MAX_BYTES: size of the persistent tier (default 1 GB)
+CACHE_ENABLED = os.environ.get("OCR_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+CACHE_MAX_BYTES = int(os.environ.get("OCR_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+CACHE_DB = os.environ.get("OCR_CACHE_DB")
+CACHE_DB_MAX_BYTES = int(os.environ.get("OCR_CACHE_DB_MAX_BYTES", 1024 * 1024 * 1024))
+
+# Part of every key: bump it when a change to decoding, OCR or the stored
+# result format makes existing entries (which outlive deploys on disk) stale
+CACHE_VERSION = 2
+
+# Disk hits record their access time in memory; the times are written in
+# one batch after this many hits or seconds, or with the next write
+ACCESS_FLUSH_COUNT = 100
+ACCESS_FLUSH_SECONDS = 30
+
+
+def hash_image(data):
+    """
+    Hash raw upload bytes.
+
+    Args:
+        data: Encoded image as bytes, bytearray or memoryview
+
+    Returns:
+        Hex digest identifying the image content
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_key(image_hash, *params):
+    """
+    Build a cache key from an image hash and the parameters that affect the result.
+
+    Args:
+        image_hash: Digest from ``hash_image``
+        *params: Preprocessing type, language, engine config, ...
+
+    Returns:
+        Cache key string
+    """
+    return "|".join([f"v{CACHE_VERSION}", image_hash, *(str(p) for p in params)])
+
+
+def pipeline_key(preprocess_type):
+    """
+    Describe what a preprocessing type runs, for cache keys.
+
+    Presets are expanded to their stage chains, so results cached before a
+    preset changed are not served for it afterwards.
+
+    Args:
+        preprocess_type: Preset name, custom stage chain, or 'auto'
+
+    Returns:
+        The expanded stage chain; for 'auto', the chains of every pass it may run
+    """
+    if preprocess_type == AUTO:
+        passes = [AUTO_FIRST_PASS, *AUTO_ESCALATIONS]
+        return "auto(" + ";".join(f"{parse_pipeline(preset).spec}/psm={psm}" for preset, psm in passes) + ")"
+    return parse_pipeline(preprocess_type).spec
+
+
+def get_cache_key(image_hash, preprocess_type, language, tiled=False, output="text"):
+    """
+    Build the result cache key for an image and its OCR parameters.
+
+    Args:
+        image_hash: Digest from ``hash_image``
+        preprocess_type: Preset name, custom stage chain, or 'auto'
+        language: Language code for OCR
+        tiled: Whether the image was OCRed block by block
+        output: 'text' for plain text results, 'data' for structured results
+
+    Returns:
+        Cache key string
+    """
+    oem_mode, psm_mode = get_engine_config(language)
+    params = [pipeline_key(preprocess_type), language, f"oem={oem_mode}", f"psm={psm_mode}"]
+    if tiled:
+        params.append("tiled")
+    if output != "text":
+        params.append(f"output={output}")
+    return make_key(image_hash, *params)
+
+
+class MemoryTier:
+    """LRU mapping bounded by the total size of its values."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+
+class SQLiteTier:
+    """Persistent tier stored in a single SQLite file, evicted by last access."""
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_results ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ocr_results_accessed ON ocr_results (accessed)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._accessed = {}
+        self._accessed_flushed = time.monotonic()
+        self.bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_results").fetchone()[0]
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM ocr_results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._accessed[key] = time.time()
+            if (len(self._accessed) >= ACCESS_FLUSH_COUNT
+                    or time.monotonic() - self._accessed_flushed >= ACCESS_FLUSH_SECONDS):
+                self._flush_accessed()
+                self._conn.commit()
+            return row[0]
+
+    def _flush_accessed(self):
+        # Caller holds the lock and commits
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE ocr_results SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._accessed.items()]
+            )
+            self._accessed.clear()
+        self._accessed_flushed = time.monotonic()
+
+    def set(self, key, payload):
+        size = len(payload)
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM ocr_results WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr_results (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, payload, size, time.time())
+            )
+            self.bytes += size - (old[0] if old else 0)
+            # Eviction goes by access time, so pending hits are written first
+            self._accessed.pop(key, None)
+            self._flush_accessed()
+            if self.bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Drop least recently used rows until the tier is back under 90% of its cap
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute("SELECT key, size FROM ocr_results ORDER BY accessed")
+        evict = []
+        for key, size in rows:
+            if self.bytes <= target:
+                break
+            evict.append((key,))
+            self.bytes -= size
+        self._conn.executemany("DELETE FROM ocr_results WHERE key = ?", evict)
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM ocr_results").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._accessed.clear()
+            self._conn.execute("DELETE FROM ocr_results")
+            self._conn.commit()
+            self.bytes = 0
+
+    def close(self):
+        with self._lock:
+            self._flush_accessed()
+            self._conn.commit()
+            self._conn.close()
+
+
+class ResultCache:
+    """
+    Two-tier cache for OCR results.
+
+    Values must be JSON serializable. Lookups check the in-memory LRU first
+    and then the optional SQLite tier, promoting disk hits into memory.
+    """
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, db_path=CACHE_DB,
+                 db_max_bytes=CACHE_DB_MAX_BYTES, enabled=CACHE_ENABLED):
+        self.enabled = enabled
+        self.memory = MemoryTier(max_bytes)
+        self.disk = None
+        if enabled and db_path:
+            try:
+                self.disk = SQLiteTier(db_path, db_max_bytes)
+            except Exception as e:
+                logger.error(f"Could not open OCR cache database {db_path}: {e}")
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Look up a cached result.
+
+        Args:
+            key: Key from ``make_key``
+
+        Returns:
+            The cached value, or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        value = self.memory.get(key)
+        if value is not None:
+            self.hits += 1
+            self.memory_hits += 1
+            return value
+
+        if self.disk is not None:
+            payload = self.disk.get(key)
+            if payload is not None:
+                value = json.loads(payload)
+                self.memory.set(key, value, len(payload))
+                self.hits += 1
+                self.disk_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        """
+        Store a result in both tiers.
+
+        Args:
+            key: Key from ``make_key``
+            value: JSON serializable result
+        """
+        if not self.enabled:
+            return
+        payload = json.dumps(value, separators=(",", ":"))
+        self.memory.set(key, value, len(payload))
+        if self.disk is not None:
+            try:
+                self.disk.set(key, payload)
+            except Exception as e:
+                logger.warning(f"Error writing OCR cache entry: {e}")
+
+    async def aget(self, key):
+        """Async ``get`` that only leaves the event loop for the disk tier."""
+        if not self.enabled:
+            return None
+        value = self.memory.get(key)
+        if value is not None:
+            self.hits += 1
+            self.memory_hits += 1
+            return value
+        if self.disk is None:
+            self.misses += 1
+            return None
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key, value):
+        """Async ``set`` that writes the disk tier on a worker thread."""
+        if not self.enabled:
+            return
+        if self.disk is None:
+            self.set(key, value)
+        else:
+            await asyncio.to_thread(self.set, key, value)
+
+    def clear(self):
+        """Remove every entry from both tiers."""
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def close(self):
+        """Close the persistent tier."""
+        if self.disk is not None:
+            self.disk.close()
+            self.disk = None
+
+    def stats(self):
+        """Return hit/miss counters and tier sizes."""
+        lookups = self.hits + self.misses
+        stats = {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+            "memory": {
+                "hits": self.memory_hits,
+                "entries": len(self.memory),
+                "bytes": self.memory.bytes,
+                "max_bytes": self.memory.max_bytes,
+            },
+        }
+        if self.disk is not None:
+            stats["disk"] = {
+                "hits": self.disk_hits,
+                "entries": self.disk.count(),
+                "bytes": self.disk.bytes,
+                "max_bytes": self.disk.max_bytes,
+                "path": self.disk.path,
+            }
+        return stats
+
+
+# Shared cache used by the API
+result_cache = ResultCache()
@@ -0,0 +1,162 @@
+import os
+import re
+import queue
+import shutil
+import logging
+import tempfile
+import threading
+import itertools
+import uuid
+from collections import deque
+import cv2
+
+logger = logging.getLogger(__name__)
+
+# Debug artifact configuration
+# OCR_DEBUG_ARTIFACTS: set to 1 to save intermediate preprocessing images (off by default)
+# OCR_DEBUG_DIR: directory for artifacts, one subdirectory per request
+# OCR_DEBUG_SAMPLE_RATE: save artifacts for 1 in N requests
+# OCR_DEBUG_MAX_BYTES: total size kept on disk, oldest requests are removed first
+# OCR_DEBUG_QUEUE_SIZE: images waiting to be written, extra images are dropped
+DEBUG_ENABLED = os.environ.get("OCR_DEBUG_ARTIFACTS", "0").lower() in ("1", "true", "yes")
+DEBUG_DIR = os.environ.get("OCR_DEBUG_DIR", os.path.join(tempfile.gettempdir(), "ocr_debug"))
+DEBUG_SAMPLE_RATE = max(1, int(os.environ.get("OCR_DEBUG_SAMPLE_RATE", 1)))
+DEBUG_MAX_BYTES = int(os.environ.get("OCR_DEBUG_MAX_BYTES", 100 * 1024 * 1024))
+DEBUG_QUEUE_SIZE = int(os.environ.get("OCR_DEBUG_QUEUE_SIZE", 32))
+
+# Request ids become directory names under OCR_DEBUG_DIR
+REQUEST_ID_PATTERN = re.compile(r"[0-9a-f]{1,64}")
+
+
+def check_request_id(request_id):
+    """Raise ValueError unless ``request_id`` is safe to use as a directory name."""
+    if not isinstance(request_id, str) or not REQUEST_ID_PATTERN.fullmatch(request_id):
+        raise ValueError(f"Invalid request id: {request_id!r}")
+
+
+class DebugArtifactWriter:
+    """
+    Background writer for debug images.
+
+    Images are PNG-encoded and written by a single daemon thread, so request
+    threads only pay for an array copy. When the queue is full images are
+    dropped, and the oldest request directories are deleted once the total
+    size on disk exceeds ``max_bytes``.
+    """
+
+    def __init__(self, base_dir=DEBUG_DIR, max_bytes=DEBUG_MAX_BYTES, queue_size=DEBUG_QUEUE_SIZE):
+        self.base_dir = base_dir
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._request_dirs = deque()
+        self._dir_sizes = {}
+        self._total_bytes = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                os.makedirs(self.base_dir, exist_ok=True)
+                self._thread = threading.Thread(
+                    target=self._run, name="ocr-debug-writer", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, request_id, name, image):
+        """
+        Queue an image to be written as ``<base_dir>/<request_id>/<name>.png``.
+
+        Args:
+            request_id: Namespace for the request's artifacts
+            name: Artifact name without extension
+            image: numpy array (copied, so the caller may reuse its buffer)
+
+        Raises:
+            ValueError: If ``request_id`` is not a lowercase hex string
+        """
+        check_request_id(request_id)
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((request_id, name, image.copy()))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            request_id, name, image = self._queue.get()
+            try:
+                self._write(request_id, name, image)
+            except Exception as e:
+                logger.warning(f"Error writing debug artifact {request_id}/{name}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, request_id, name, image):
+        request_dir = os.path.join(self.base_dir, request_id)
+        if request_id not in self._dir_sizes:
+            os.makedirs(request_dir, exist_ok=True)
+            self._request_dirs.append(request_id)
+            self._dir_sizes[request_id] = 0
+
+        ok, encoded = cv2.imencode(".png", image)
+        if not ok:
+            raise ValueError("PNG encoding failed")
+        with open(os.path.join(request_dir, f"{name}.png"), "wb") as f:
+            f.write(encoded)
+
+        self._dir_sizes[request_id] += encoded.size
+        self._total_bytes += encoded.size
+
+        # Keep the newest request even if it alone exceeds the cap
+        while self._total_bytes > self.max_bytes and len(self._request_dirs) > 1:
+            oldest = self._request_dirs.popleft()
+            self._total_bytes -= self._dir_sizes.pop(oldest)
+            shutil.rmtree(os.path.join(self.base_dir, oldest), ignore_errors=True)
+
+    def flush(self):
+        """Block until every queued artifact has been written."""
+        if self._thread is not None:
+            self._queue.join()
+
+
+class DebugSession:
+    """Collects the debug artifacts of a single request."""
+
+    def __init__(self, writer, request_id):
+        self.writer = writer
+        self.request_id = request_id
+
+    def save(self, name, image):
+        """Queue ``image`` to be saved as ``name`` for this request."""
+        self.writer.submit(self.request_id, name, image)
+
+
+_writer = DebugArtifactWriter()
+_counter = itertools.count()
+
+
+def start_session(request_id=None):
+    """
+    Start a debug session for a request if artifacts are enabled and sampled.
+
+    Args:
+        request_id: Identifier used as the artifact directory name, a
+            lowercase hex string such as ``uuid4().hex``
+
+    Returns:
+        DebugSession, or None when this request should not save artifacts
+
+    Raises:
+        ValueError: If ``request_id`` is not a lowercase hex string
+    """
+    if request_id is not None:
+        check_request_id(request_id)
+    if not DEBUG_ENABLED:
+        return None
+    if next(_counter) % DEBUG_SAMPLE_RATE != 0:
+        return None
+    return DebugSession(_writer, request_id or uuid.uuid4().hex)
@@ -0,0 +1,429 @@
+import os
+import hmac
+import json
+import time
+import random
+import struct
+import asyncio
+import logging
+import contextlib
+
+import numpy as np
+
+from .workers import (
+    run_ocr_pipeline, run_ocr_data_pipeline, PoolSaturatedError, PoolTimeoutError, OCR_MAX_WORKERS, OCR_TIMEOUT
+)
+from .preprocessing import Pipeline, parse_pipeline
+from .image_processor import ImageError
+from .uploads import MAX_IMAGE_PIXELS
+from .layout import OCRData
+from .tiling import split_into_tiles
+from .language import detect_language
+from .orientation import estimate_orientation
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Remote worker configuration
+# OCR_WORKER_NODES: comma-separated host:port list of worker nodes; when set the API
+#   dispatches OCR to them instead of running it in-process
+# OCR_NODE_WORKERS: assumed workers per node until its first health check answers
+# OCR_HEALTH_INTERVAL: seconds between health checks of every node
+# OCR_DISPATCH_RETRIES: other nodes tried when a node fails or is saturated
+# OCR_CONNECT_TIMEOUT: seconds to wait for a connection to a node
+# OCR_NODE_SECRET: shared secret the API sends with every request and nodes require
+#   (unset = no check, so the node port must only be reachable by the API)
+# OCR_NODE_MAX_MESSAGE_BYTES: total size of the binary data in one message, sized
+#   for the largest accepted image as a decoded BGR array
+WORKER_NODES = [node.strip() for node in os.environ.get("OCR_WORKER_NODES", "").split(",") if node.strip()]
+NODE_WORKERS = int(os.environ.get("OCR_NODE_WORKERS", OCR_MAX_WORKERS))
+HEALTH_INTERVAL = float(os.environ.get("OCR_HEALTH_INTERVAL", 5))
+DISPATCH_RETRIES = int(os.environ.get("OCR_DISPATCH_RETRIES", 2))
+CONNECT_TIMEOUT = float(os.environ.get("OCR_CONNECT_TIMEOUT", 2))
+NODE_SECRET = os.environ.get("OCR_NODE_SECRET", "")
+MAX_MESSAGE_BYTES = int(os.environ.get("OCR_NODE_MAX_MESSAGE_BYTES", 3 * MAX_IMAGE_PIXELS))
+
+# Functions worker nodes run; nothing else can be called remotely
+TASKS = {
+    fn.__name__: fn
+    for fn in (run_ocr_pipeline, run_ocr_data_pipeline, split_into_tiles, detect_language, estimate_orientation)
+}
+
+# Messages are a 4-byte big-endian header length, a JSON header and the
+# binary blobs (bytes, array buffers) the header refers to by index
+HEADER = struct.Struct(">I")
+MAX_HEADER_BYTES = 64 * 1024 * 1024
+
+
+class RemoteError(Exception):
+    """Raised when a task failed on a worker node."""
+
+
+class NodeUnavailableError(PoolSaturatedError):
+    """
+    Raised when no worker node can be reached.
+
+    Treated like a full pool, so requests get 503 and batch items back off
+    until a node is healthy again.
+    """
+
+
+def encode(value, blobs):
+    """
+    Convert a task argument or result into JSON, moving binary data to ``blobs``.
+
+    Supports None, bool, int, float, str, bytes, numpy arrays, lists,
+    tuples, dicts with string keys, Pipeline and OCRData.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        blobs.append(bytes(value))
+        return {"$bytes": len(blobs) - 1}
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            raise TypeError("Object arrays cannot be sent to a worker node")
+        blobs.append(np.ascontiguousarray(value).tobytes())
+        return {"$array": len(blobs) - 1, "dtype": value.dtype.str, "shape": list(value.shape)}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, tuple):
+        return {"$tuple": [encode(item, blobs) for item in value]}
+    if isinstance(value, list):
+        return [encode(item, blobs) for item in value]
+    if isinstance(value, Pipeline):
+        return {"$pipeline": value.spec}
+    if isinstance(value, OCRData):
+        return {"$ocrdata": encode({"columns": value.columns, "conf": value.conf, "words": value.words}, blobs)}
+    if isinstance(value, dict):
+        if any(not isinstance(key, str) or key.startswith("$") for key in value):
+            raise TypeError("Only dicts with plain string keys can be sent to a worker node")
+        return {key: encode(item, blobs) for key, item in value.items()}
+    raise TypeError(f"Cannot send {type(value).__name__} to a worker node")
+
+
+def decode(value, blobs):
+    """Inverse of ``encode``."""
+    if isinstance(value, list):
+        return [decode(item, blobs) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "$bytes" in value:
+        return blobs[value["$bytes"]]
+    if "$array" in value:
+        array = np.frombuffer(blobs[value["$array"]], dtype=np.dtype(value["dtype"]))
+        # Writable copy, since stages may work in place on their input
+        return array.reshape(value["shape"]).copy()
+    if "$tuple" in value:
+        return tuple(decode(item, blobs) for item in value["$tuple"])
+    if "$pipeline" in value:
+        return parse_pipeline(value["$pipeline"])
+    if "$ocrdata" in value:
+        data = decode(value["$ocrdata"], blobs)
+        return OCRData(data["columns"], data["conf"], data["words"])
+    return {key: decode(item, blobs) for key, item in value.items()}
+
+
+async def write_message(writer, header, blobs=()):
+    """Send a header dict and its blobs."""
+    header = dict(header, blobs=[len(blob) for blob in blobs])
+    payload = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    writer.write(HEADER.pack(len(payload)) + payload)
+    for blob in blobs:
+        writer.write(blob)
+    await writer.drain()
+
+
+async def read_message(reader, max_blob_bytes=MAX_MESSAGE_BYTES):
+    """
+    Receive one message.
+
+    Args:
+        reader: asyncio StreamReader
+        max_blob_bytes: Largest total size of the message's blobs
+
+    Returns:
+        Tuple of (header dict, list of blobs), or (None, []) at end of stream
+
+    Raises:
+        ValueError: If the message is malformed or over the size limits
+    """
+    try:
+        prefix = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None, []
+        raise
+    (length,) = HEADER.unpack(prefix)
+    if length > MAX_HEADER_BYTES:
+        raise ValueError(f"Message header of {length} bytes is too large")
+    header = json.loads(await reader.readexactly(length))
+    if not isinstance(header, dict):
+        raise ValueError("Message header is not an object")
+    sizes = header.pop("blobs", [])
+    if not isinstance(sizes, list) or not all(isinstance(size, int) and size >= 0 for size in sizes):
+        raise ValueError("Message blob sizes are invalid")
+    # Checked before anything is read, so an oversized message is never buffered
+    if sum(sizes) > max_blob_bytes:
+        raise ValueError(f"Message data of {sum(sizes)} bytes is over the {max_blob_bytes} byte limit")
+    blobs = [await reader.readexactly(size) for size in sizes]
+    return header, blobs
+
+
+def is_authorized(header, secret=NODE_SECRET):
+    """Whether a request header carries the shared node secret (always, when none is set)."""
+    if not secret:
+        return True
+    token = header.get("secret")
+    return isinstance(token, str) and hmac.compare_digest(token.encode("utf-8"), secret.encode("utf-8"))
+
+
+class WorkerNode:
+    """Connection details and load of one remote worker node."""
+
+    def __init__(self, address, max_workers=NODE_WORKERS, secret=NODE_SECRET):
+        host, _, port = address.rpartition(":")
+        if not host or not port.isdigit():
+            raise ValueError(f"Worker node address must be host:port, got '{address}'")
+        self.address = address
+        self.host = host
+        self.port = int(port)
+        self.max_workers = max_workers
+        self.capacity = max_workers
+        self.secret = secret
+        self.healthy = True
+        self.dispatched = 0
+        self.remote_pending = 0
+        self.failures = 0
+        self.last_check = None
+
+    @property
+    def load(self):
+        """Share of the node's capacity in use, from our own dispatches and its last report."""
+        # The random part spreads jobs over equally loaded nodes
+        return (max(self.dispatched, self.remote_pending) + random.random() * 0.01) / max(1, self.max_workers)
+
+    async def request(self, header, blobs=(), timeout=None):
+        """
+        Send one request on a fresh connection and wait for the response.
+
+        Raises:
+            NodeUnavailableError: If the node cannot be reached or hangs up
+            PoolTimeoutError: If the node accepted the request but did not
+                answer within ``timeout``
+        """
+        if self.secret:
+            header = dict(header, secret=self.secret)
+        # asyncio.TimeoutError is an OSError, so it is caught first in both blocks
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), CONNECT_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            raise NodeUnavailableError(
+                f"Cannot connect to worker node {self.address}: no answer within {CONNECT_TIMEOUT:g} seconds"
+            )
+        except OSError as e:
+            raise NodeUnavailableError(f"Cannot connect to worker node {self.address}: {e}")
+        try:
+            await write_message(writer, header, blobs)
+            response, response_blobs = await asyncio.wait_for(read_message(reader), timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeoutError(f"Worker node {self.address} did not answer within {timeout:g} seconds")
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            raise NodeUnavailableError(f"Worker node {self.address} failed: {e}")
+        finally:
+            writer.close()
+        if response is None:
+            raise NodeUnavailableError(f"Worker node {self.address} closed the connection")
+        return response, response_blobs
+
+    def stats(self):
+        return {
+            "address": self.address,
+            "healthy": self.healthy,
+            "max_workers": self.max_workers,
+            "dispatched": self.dispatched,
+            "pending": self.remote_pending,
+            "failures": self.failures,
+        }
+
+
+class RemotePool:
+    """
+    Dispatches OCR work to worker nodes, with the interface of OCRWorkerPool.
+
+    Each job goes to the healthy node with the lowest load. Nodes are
+    health-checked in the background; a node that cannot be reached is
+    marked unhealthy and the job is retried on another node, as is a job
+    rejected by a saturated node. Tasks are pure functions of their
+    arguments, so retrying them is safe. A job that times out is not
+    retried and leaves its node healthy.
+    """
+
+    mode = "remote"
+
+    def __init__(self, addresses=WORKER_NODES, timeout=OCR_TIMEOUT, retries=DISPATCH_RETRIES,
+                 health_interval=HEALTH_INTERVAL, secret=NODE_SECRET):
+        if not addresses:
+            raise ValueError("RemotePool needs at least one worker node address")
+        self.nodes = [WorkerNode(address, secret=secret) for address in addresses]
+        self.timeout = timeout
+        self.retries = retries
+        self.health_interval = health_interval
+        self.queue_size = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._health_task = None
+
+    @property
+    def max_workers(self):
+        return sum(node.max_workers for node in self.nodes if node.healthy) or 1
+
+    @property
+    def capacity(self):
+        return sum(node.capacity for node in self.nodes if node.healthy)
+
+    def start(self):
+        """Start the background health checks (needs a running event loop)."""
+        if self._health_task is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._health_task = loop.create_task(self._health_loop())
+        logger.info(f"Dispatching OCR to worker nodes: {', '.join(node.address for node in self.nodes)}")
+
+    def shutdown(self, wait=True):
+        """Stop the health checks."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+
+    async def check(self, node):
+        """Ask a node for its load and record whether it answered."""
+        try:
+            response, _ = await node.request({"op": "health"}, timeout=CONNECT_TIMEOUT)
+            if not response.get("ok"):
+                raise NodeUnavailableError(response.get("error", "health check failed"))
+        except (NodeUnavailableError, PoolTimeoutError) as e:
+            if node.healthy:
+                logger.warning(f"Worker node {node.address} is unavailable: {e}")
+            node.healthy = False
+            return False
+        if not node.healthy:
+            logger.info(f"Worker node {node.address} is available again")
+        node.healthy = True
+        node.max_workers = response["max_workers"]
+        node.capacity = response["max_workers"] + response["queue_size"]
+        node.remote_pending = response["in_flight"] + response["queued"]
+        node.last_check = time.time()
+        return True
+
+    async def check_all(self):
+        """Health-check every node at once."""
+        await asyncio.gather(*(self.check(node) for node in self.nodes))
+
+    async def _health_loop(self):
+        while True:
+            await self.check_all()
+            await asyncio.sleep(self.health_interval)
+
+    def _pick(self, exclude):
+        candidates = [node for node in self.nodes if node.healthy and node not in exclude]
+        if not candidates:
+            # Nothing known to be healthy: try nodes that failed their last check
+            candidates = [node for node in self.nodes if node not in exclude]
+        return min(candidates, key=lambda node: node.load) if candidates else None
+
+    def stats(self):
+        """Return a snapshot of the dispatcher and node state."""
+        in_flight = sum(node.dispatched for node in self.nodes)
+        return {
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "queue_size": self.queue_size,
+            "in_flight": min(in_flight, self.max_workers),
+            "queued": max(0, in_flight - self.max_workers),
+            "rejected": self._rejected,
+            "timed_out": self._timed_out,
+            "nodes": [node.stats() for node in self.nodes],
+        }
+
+    @contextlib.asynccontextmanager
+    async def reserve(self, image, timeout=None):
+        """Interface of OCRWorkerPool.reserve; nodes budget the jobs they run themselves."""
+        yield
+
+    async def submit(self, fn, *args, timeout=None, reserved=False):
+        """
+        Run ``fn(*args)`` on the least loaded worker node.
+
+        Args:
+            fn: One of the functions in TASKS
+            *args: Positional arguments for ``fn``
+            timeout: Seconds to wait, defaults to the pool timeout
+            reserved: Accepted for the interface of OCRWorkerPool.submit
+
+        Returns:
+            The return value of ``fn``
+
+        Raises:
+            PoolSaturatedError: If every node tried was full
+            PoolTimeoutError: If the job did not finish in time
+            NodeUnavailableError: If no node could be reached
+            ImageError: If the node could not decode or preprocess the image
+            RemoteError: If the task raised on the node
+        """
+        name = getattr(fn, "__name__", None)
+        if TASKS.get(name) is not fn:
+            raise ValueError(f"{name} cannot be run on a worker node")
+        if self._health_task is None:
+            self.start()
+
+        blobs = []
+        header = {"op": "run", "fn": name, "args": encode(list(args), blobs)}
+        timeout = self.timeout if timeout is None else timeout
+        tried = set()
+        error = None
+        for _ in range(self.retries + 1):
+            node = self._pick(tried)
+            if node is None:
+                break
+            tried.add(node)
+            node.dispatched += 1
+            try:
+                response, response_blobs = await node.request(header, blobs, timeout)
+            except PoolTimeoutError:
+                # The node is alive but the job is slow: retrying would run
+                # it again for another full timeout
+                self._timed_out += 1
+                raise PoolTimeoutError(f"OCR did not finish within {timeout:g} seconds on {node.address}")
+            except NodeUnavailableError as e:
+                node.failures += 1
+                node.healthy = False
+                logger.warning(f"{e}; retrying on another node")
+                error = e
+                continue
+            finally:
+                node.dispatched -= 1
+
+            if response.get("ok"):
+                metrics.replay(decode(response.get("metrics", []), response_blobs))
+                return decode(response["result"], response_blobs)
+            kind = response.get("error_type")
+            if kind == "saturated":
+                error = PoolSaturatedError(response["error"])
+                continue
+            if kind == "timeout":
+                self._timed_out += 1
+                raise PoolTimeoutError(response["error"])
+            if kind == "image":
+                raise ImageError(response["error"])
+            raise RemoteError(response.get("error", "Unknown worker node error"))
+
+        if isinstance(error, NodeUnavailableError) or error is None:
+            raise NodeUnavailableError("No OCR worker node is available, please retry later")
+        self._rejected += 1
+        raise PoolSaturatedError("All OCR worker nodes are busy, please retry later")
@@ -0,0 +1,251 @@
+import io
+import os
+import re
+import logging
+import tempfile
+import subprocess
+import cv2
+import numpy as np
+from PIL import Image, ImageSequence
+
+from .uploads import MAX_IMAGE_PIXELS
+
+logger = logging.getLogger(__name__)
+
+# Multi-page document configuration
+# OCR_PDF_DPI: resolution PDF pages are rasterized at
+# OCR_DOCUMENT_MAX_PAGES: maximum number of pages processed per document
+# OCR_DOCUMENT_WINDOW: decoded pages held in memory at once (default: OCR worker count)
+# PDFTOPPM_CMD / PDFINFO_CMD: poppler executables used for PDFs
+PDF_DPI = int(os.environ.get("OCR_PDF_DPI", 300))
+DOCUMENT_MAX_PAGES = int(os.environ.get("OCR_DOCUMENT_MAX_PAGES", 500))
+DOCUMENT_WINDOW = int(os.environ.get("OCR_DOCUMENT_WINDOW", 0))
+PDFTOPPM_CMD = os.environ.get("PDFTOPPM_CMD", "pdftoppm")
+PDFINFO_CMD = os.environ.get("PDFINFO_CMD", "pdfinfo")
+
+TIFF_EXTENSIONS = {".tif", ".tiff"}
+PDF_EXTENSIONS = {".pdf"}
+
+
+def tiff_frame_count(data):
+    """
+    Count the frames of a TIFF without decoding them.
+
+    Args:
+        data: Encoded TIFF bytes
+
+    Returns:
+        Number of frames
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        return getattr(image, "n_frames", 1)
+
+
+def iter_tiff_frames(data, max_pixels=MAX_IMAGE_PIXELS):
+    """
+    Lazily decode the frames of a (multi-page) TIFF.
+
+    Args:
+        data: Encoded TIFF bytes
+        max_pixels: Largest accepted frame, in pixels; only the first
+            frame is checked when the upload is read
+
+    Yields:
+        OpenCV image (BGR numpy array) for each frame
+
+    Raises:
+        ValueError: If a frame is over ``max_pixels``
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        for number, frame in enumerate(ImageSequence.Iterator(image), start=1):
+            width, height = frame.size
+            if width * height > max_pixels:
+                raise ValueError(f"TIFF page {number} is {width}x{height} pixels, the limit is {max_pixels} pixels")
+            yield cv2.cvtColor(np.asarray(frame.convert("RGB")), cv2.COLOR_RGB2BGR)
+
+
+def pdf_info(pdf_path, last_page=DOCUMENT_MAX_PAGES):
+    """
+    Read the page count and page sizes of a PDF with ``pdfinfo``.
+
+    Args:
+        pdf_path: Path to the PDF file
+        last_page: Last page whose size is read
+
+    Returns:
+        Tuple of (number of pages, dict of page number -> (width, height) in points)
+    """
+    proc = subprocess.run(
+        [PDFINFO_CMD, "-f", "1", "-l", str(max(1, last_page)), pdf_path],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=False
+    )
+    match = re.search(r"^Pages:\s+(\d+)", proc.stdout, re.MULTILINE)
+    if proc.returncode != 0 or not match:
+        raise ValueError(f"Could not read PDF: {proc.stderr.strip() or 'page count not found'}")
+    sizes = {
+        int(page): (float(width), float(height))
+        for page, width, height in re.findall(
+            r"^Page\s+(\d+) size:\s+([\d.]+) x ([\d.]+) pts", proc.stdout, re.MULTILINE
+        )
+    }
+    return int(match.group(1)), sizes
+
+
+def pdf_page_count(pdf_path):
+    """
+    Count the pages of a PDF with ``pdfinfo``.
+
+    Args:
+        pdf_path: Path to the PDF file
+
+    Returns:
+        Number of pages
+    """
+    return pdf_info(pdf_path, 1)[0]
+
+
+def page_dpi(size, dpi=PDF_DPI, max_pixels=MAX_IMAGE_PIXELS):
+    """
+    Resolution a PDF page is rendered at to stay within ``max_pixels``.
+
+    Args:
+        size: Page (width, height) in points
+        dpi: Requested resolution
+        max_pixels: Largest rendered page, in pixels
+
+    Returns:
+        ``dpi``, lowered for pages that would render larger than ``max_pixels``
+    """
+    area = (size[0] / 72) * (size[1] / 72)
+    if area <= 0 or area * dpi * dpi <= max_pixels:
+        return dpi
+    return max(1, int((max_pixels / area) ** 0.5))
+
+
+def render_pdf_page(pdf_path, page, dpi=PDF_DPI, scale_to=None):
+    """
+    Rasterize a single PDF page with ``pdftoppm``.
+
+    Args:
+        pdf_path: Path to the PDF file
+        page: 1-based page number
+        dpi: Rendering resolution
+        scale_to: Render the longest side at this many pixels instead of
+            at ``dpi``
+
+    Returns:
+        OpenCV image (BGR numpy array)
+    """
+    size = ["-scale-to", str(scale_to)] if scale_to else ["-r", str(dpi)]
+    # Without an output root pdftoppm writes the single page as PPM to stdout
+    proc = subprocess.run(
+        [PDFTOPPM_CMD, "-f", str(page), "-l", str(page), *size, "-singlefile", pdf_path],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=False
+    )
+    if proc.returncode != 0:
+        raise ValueError(
+            f"Could not render PDF page {page}: {proc.stderr.decode('utf-8', errors='replace').strip()}"
+        )
+    image = cv2.imdecode(np.frombuffer(proc.stdout, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Could not decode rendered PDF page {page}")
+    return image
+
+
+def iter_pdf_pages(data, dpi=PDF_DPI, max_pages=DOCUMENT_MAX_PAGES):
+    """
+    Lazily rasterize the pages of a PDF, one page at a time.
+
+    poppler needs a file path, so the PDF is written to a temporary file
+    once and removed when iteration finishes.
+
+    Args:
+        data: PDF bytes
+        dpi: Rendering resolution
+        max_pages: Maximum number of pages to render
+
+    Yields:
+        OpenCV image (BGR numpy array) for each page
+    """
+    fd, pdf_path = tempfile.mkstemp(prefix="ocr_", suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        page_count, sizes = pdf_info(pdf_path, max_pages)
+        if page_count > max_pages:
+            logger.warning(f"PDF has {page_count} pages, only the first {max_pages} are processed")
+        for page in range(1, min(page_count, max_pages) + 1):
+            # Oversized pages (posters, drawings) are rendered at a lower
+            # resolution instead of being decoded at any size
+            if page not in sizes:
+                yield render_pdf_page(pdf_path, page, scale_to=int(MAX_IMAGE_PIXELS ** 0.5))
+                continue
+            page_resolution = page_dpi(sizes[page], dpi)
+            if page_resolution < dpi:
+                logger.warning(f"Rendering PDF page {page} at {page_resolution} dpi to stay within the pixel limit")
+            yield render_pdf_page(pdf_path, page, page_resolution)
+    finally:
+        try:
+            os.unlink(pdf_path)
+        except OSError as e:
+            logger.warning(f"Error cleaning up temp PDF: {e}")
+
+
+def is_multipage(filename, data):
+    """
+    Check whether an upload is a document that should be processed page by page.
+
+    Args:
+        filename: Name of the uploaded file
+        data: Uploaded bytes
+
+    Returns:
+        True for PDFs and TIFFs with more than one frame
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in PDF_EXTENSIONS:
+        return True
+    if extension in TIFF_EXTENSIONS:
+        try:
+            return tiff_frame_count(data) > 1
+        except Exception:
+            return False
+    return False
+
+
+def iter_document_pages(filename, data, dpi=PDF_DPI, max_pages=DOCUMENT_MAX_PAGES):
+    """
+    Lazily decode the pages of a multi-page document.
+
+    Only the page currently being yielded is held in memory by this
+    iterator, so callers control how many pages are decoded at once.
+
+    Args:
+        filename: Name of the uploaded file
+        data: Uploaded bytes
+        dpi: Rendering resolution for PDFs
+        max_pages: Maximum number of pages to yield
+
+    Yields:
+        Tuples of (page name, BGR numpy array)
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in PDF_EXTENSIONS:
+        pages = iter_pdf_pages(data, dpi, max_pages)
+    elif extension in TIFF_EXTENSIONS:
+        pages = iter_tiff_frames(data)
+    else:
+        raise ValueError(f"Not a multi-page document: {filename}")
+
+    try:
+        for page, image in enumerate(pages, start=1):
+            if page > max_pages:
+                break
+            yield f"{filename}#page={page}", image
+    finally:
+        pages.close()
@@ -0,0 +1,346 @@
+import os
+import atexit
+import ctypes
+import ctypes.util
+import logging
+import threading
+import subprocess
+import time
+import numpy as np
+import pytesseract
+from PIL import Image
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# OCR engine backend
+# OCR_ENGINE: "auto" (default, C API when libtesseract is available), "capi" or "subprocess"
+# TESSERACT_LIB: explicit path to the libtesseract shared library
+OCR_ENGINE = os.environ.get("OCR_ENGINE", "auto").lower()
+TESSERACT_LIB = os.environ.get("TESSERACT_LIB")
+
+# Header row of Tesseract's TSV output
+TSV_HEADER = "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext\n"
+
+
+class EngineError(Exception):
+    """Raised when an OCR engine backend cannot be loaded or initialized."""
+
+
+def _to_array(image):
+    """
+    Convert a PIL image or numpy array into a contiguous uint8 array.
+
+    Args:
+        image: PIL Image or numpy array (grayscale, RGB or RGBA)
+
+    Returns:
+        numpy array with shape (h, w) or (h, w, channels)
+    """
+    if isinstance(image, Image.Image):
+        if image.mode not in ("L", "RGB", "RGBA"):
+            image = image.convert("RGB")
+        image = np.asarray(image)
+    if image.dtype != np.uint8:
+        image = image.astype(np.uint8)
+    return np.ascontiguousarray(image)
+
+
+def _to_pnm(array):
+    """
+    Encode an array as binary PGM/PPM, which needs no compression work.
+
+    Args:
+        array: uint8 array from ``_to_array``
+
+    Returns:
+        Encoded image bytes
+    """
+    if array.ndim == 2:
+        magic = b"P5"
+    else:
+        magic = b"P6"
+        if array.shape[2] == 4:
+            array = np.ascontiguousarray(array[:, :, :3])
+    height, width = array.shape[:2]
+    return b"%s\n%d %d\n255\n" % (magic, width, height) + array.tobytes()
+
+
+class SubprocessEngine:
+    """
+    Runs the ``tesseract`` binary for every image.
+
+    The image is piped through stdin and the text read back from stdout, so
+    no temporary files are written.
+    """
+
+    name = "subprocess"
+
+    def image_to_string(self, image, language="eng", psm=6, oem=3):
+        return self._run(image, language, psm, oem)
+
+    def image_to_tsv(self, image, language="eng", psm=6, oem=3):
+        """Recognize ``image`` and return Tesseract's TSV output (boxes, confidences, words)."""
+        return self._run(image, language, psm, oem, "tsv")
+
+    def detect_orientation_script(self, image):
+        """Run orientation and script detection (OSD) without recognizing text."""
+        output = self._run(image, "osd", 0, 3)
+        fields = dict(
+            (key.strip(), value.strip())
+            for key, _, value in (line.partition(":") for line in output.splitlines())
+        )
+        try:
+            return {
+                "orientation": int(fields["Orientation in degrees"]),
+                "orientation_confidence": float(fields["Orientation confidence"]),
+                "script": fields["Script"],
+                "script_confidence": float(fields["Script confidence"]),
+            }
+        except (KeyError, ValueError):
+            raise EngineError("Orientation and script detection failed (too little text?)")
+
+    def _run(self, image, language, psm, oem, *configs):
+        output = configs[0] if configs else "osd" if language == "osd" else "text"
+        start = time.perf_counter()
+        cmd = [
+            pytesseract.pytesseract.tesseract_cmd, "stdin", "stdout",
+            "-l", language, "--oem", str(oem), "--psm", str(psm), *configs
+        ]
+        try:
+            proc = subprocess.run(
+                cmd,
+                input=_to_pnm(_to_array(image)),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                check=False
+            )
+        except OSError as e:
+            metrics.engine_failures.labels(self.name).inc()
+            raise EngineError(f"Could not run {cmd[0]}: {e}")
+        metrics.engine_seconds.labels(self.name, output).observe(time.perf_counter() - start)
+
+        stderr = proc.stderr.decode("utf-8", errors="replace").strip()
+        if proc.returncode != 0:
+            metrics.engine_failures.labels(self.name).inc()
+            raise EngineError(f"Tesseract exited with code {proc.returncode}: {stderr}")
+
+        text = proc.stdout.decode("utf-8", errors="replace")
+        if not text.strip() and stderr:
+            logger.warning(f"Tesseract stderr: {stderr}")
+        return text
+
+
+class CAPIEngine:
+    """
+    Calls libtesseract in-process through its C API.
+
+    Each thread keeps one initialized TessBaseAPI handle per (language, oem),
+    so the model is loaded once per worker and reused across requests, and
+    image buffers are handed to Tesseract directly without temp files.
+    """
+
+    name = "capi"
+
+    def __init__(self, lib_path=None, tessdata_dir=None):
+        lib_path = lib_path or TESSERACT_LIB or ctypes.util.find_library("tesseract")
+        if not lib_path:
+            raise EngineError("libtesseract shared library not found")
+        try:
+            lib = ctypes.CDLL(lib_path)
+        except OSError as e:
+            raise EngineError(f"Could not load {lib_path}: {e}")
+
+        lib.TessVersion.restype = ctypes.c_char_p
+        lib.TessBaseAPICreate.restype = ctypes.c_void_p
+        lib.TessBaseAPIInit2.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int]
+        lib.TessBaseAPIInit2.restype = ctypes.c_int
+        lib.TessBaseAPISetPageSegMode.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.TessBaseAPISetImage.argtypes = [
+            ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int
+        ]
+        lib.TessBaseAPIGetUTF8Text.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIGetUTF8Text.restype = ctypes.c_void_p
+        lib.TessBaseAPIGetTsvText.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.TessBaseAPIGetTsvText.restype = ctypes.c_void_p
+        lib.TessBaseAPIDetectOrientationScript.argtypes = [
+            ctypes.c_void_p, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_float),
+            ctypes.POINTER(ctypes.c_char_p), ctypes.POINTER(ctypes.c_float)
+        ]
+        lib.TessBaseAPIDetectOrientationScript.restype = ctypes.c_int
+        lib.TessDeleteText.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIClear.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIEnd.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIDelete.argtypes = [ctypes.c_void_p]
+
+        self._lib = lib
+        self._tessdata_dir = tessdata_dir or os.environ.get("TESSDATA_PREFIX")
+        self._local = threading.local()
+        self._loaded = set()
+        self._handles = []
+        self._lock = threading.Lock()
+        self.version = lib.TessVersion().decode()
+        logger.info(f"Loaded libtesseract {self.version} from {lib_path}")
+
+    def _handle(self, language, oem):
+        handles = getattr(self._local, "handles", None)
+        if handles is None:
+            handles = self._local.handles = {}
+
+        key = (language, oem)
+        handle = handles.get(key)
+        if handle is None:
+            handle = self._lib.TessBaseAPICreate()
+            datapath = self._tessdata_dir.encode() if self._tessdata_dir else None
+            if self._lib.TessBaseAPIInit2(handle, datapath, language.encode(), oem) != 0:
+                self._lib.TessBaseAPIDelete(handle)
+                metrics.engine_failures.labels(self.name).inc()
+                raise EngineError(f"Could not initialize Tesseract for language '{language}'")
+            handles[key] = handle
+            with self._lock:
+                self._loaded.add(language)
+                self._handles.append(handle)
+            logger.info(f"Initialized Tesseract API handle for {language} (oem {oem})")
+        return handle
+
+    def preload(self, languages, oem=3):
+        """Initialize handles for ``languages`` on the calling thread."""
+        for language in languages:
+            self._handle(language, oem)
+
+    def loaded_languages(self):
+        """Languages that have a warm handle on at least one thread."""
+        with self._lock:
+            return sorted(self._loaded)
+
+    def close(self):
+        """Release every handle created by this engine."""
+        with self._lock:
+            handles, self._handles = self._handles, []
+            self._loaded.clear()
+        for handle in handles:
+            self._lib.TessBaseAPIEnd(handle)
+            self._lib.TessBaseAPIDelete(handle)
+
+    def image_to_string(self, image, language="eng", psm=6, oem=3):
+        return self._recognize(image, language, psm, oem, self._lib.TessBaseAPIGetUTF8Text, "text")
+
+    def image_to_tsv(self, image, language="eng", psm=6, oem=3):
+        """Recognize ``image`` and return Tesseract's TSV output (boxes, confidences, words)."""
+        tsv = self._recognize(
+            image, language, psm, oem, lambda handle: self._lib.TessBaseAPIGetTsvText(handle, 0), "tsv"
+        )
+        # Unlike the tsv renderer of the binary, the C API omits the header row
+        return tsv if tsv.startswith("level\t") else TSV_HEADER + tsv
+
+    def detect_orientation_script(self, image):
+        """Run orientation and script detection (OSD) without recognizing text."""
+        array = _to_array(image)
+        height, width = array.shape[:2]
+        bytes_per_pixel = 1 if array.ndim == 2 else array.shape[2]
+
+        handle = self._handle("osd", 3)
+        start = time.perf_counter()
+        self._lib.TessBaseAPISetPageSegMode(handle, 0)
+        self._lib.TessBaseAPISetImage(
+            handle, array.ctypes.data, width, height, bytes_per_pixel, array.strides[0]
+        )
+        orientation = ctypes.c_int()
+        orientation_confidence = ctypes.c_float()
+        script = ctypes.c_char_p()
+        script_confidence = ctypes.c_float()
+        try:
+            ok = self._lib.TessBaseAPIDetectOrientationScript(
+                handle, ctypes.byref(orientation), ctypes.byref(orientation_confidence),
+                ctypes.byref(script), ctypes.byref(script_confidence)
+            )
+        finally:
+            self._lib.TessBaseAPIClear(handle)
+        metrics.engine_seconds.labels(self.name, "osd").observe(time.perf_counter() - start)
+        if not ok or not script.value:
+            raise EngineError("Orientation and script detection failed (too little text?)")
+        return {
+            "orientation": orientation.value,
+            "orientation_confidence": orientation_confidence.value,
+            "script": script.value.decode(),
+            "script_confidence": script_confidence.value,
+        }
+
+    def _recognize(self, image, language, psm, oem, getter, output):
+        array = _to_array(image)
+        height, width = array.shape[:2]
+        bytes_per_pixel = 1 if array.ndim == 2 else array.shape[2]
+
+        handle = self._handle(language, oem)
+        start = time.perf_counter()
+        self._lib.TessBaseAPISetPageSegMode(handle, psm)
+        self._lib.TessBaseAPISetImage(
+            handle, array.ctypes.data, width, height, bytes_per_pixel, array.strides[0]
+        )
+        text_ptr = getter(handle)
+        try:
+            text = ctypes.string_at(text_ptr).decode("utf-8", errors="replace") if text_ptr else ""
+        finally:
+            if text_ptr:
+                self._lib.TessDeleteText(text_ptr)
+            # Drop the image and recognition results but keep the model loaded
+            self._lib.TessBaseAPIClear(handle)
+        metrics.engine_seconds.labels(self.name, output).observe(time.perf_counter() - start)
+        return text
+
+
+_engine = None
+_engine_lock = threading.Lock()
+_subprocess_engine = SubprocessEngine()
+
+
+def get_engine():
+    """
+    Get the configured OCR engine, creating it on first use.
+
+    Returns:
+        CAPIEngine or SubprocessEngine instance
+    """
+    global _engine
+    if _engine is not None:
+        return _engine
+
+    with _engine_lock:
+        if _engine is None:
+            if OCR_ENGINE == "subprocess":
+                _engine = _subprocess_engine
+            else:
+                try:
+                    _engine = CAPIEngine()
+                    atexit.register(_engine.close)
+                except EngineError as e:
+                    if OCR_ENGINE == "capi":
+                        raise
+                    logger.warning(f"Tesseract C API unavailable ({e}), using subprocess engine")
+                    _engine = _subprocess_engine
+    return _engine
+
+
+def get_fallback_engine():
+    """Get the subprocess engine used when the configured engine fails."""
+    return _subprocess_engine
+
+
+def warm_up(languages=None):
+    """
+    Preload engine handles on the current worker.
+
+    Used as the worker pool initializer so the first request on each worker
+    does not pay the model load cost.
+
+    Args:
+        languages: Language codes to preload (default: OCR_PRELOAD_LANGUAGES or 'eng')
+    """
+    if languages is None:
+        languages = os.environ.get("OCR_PRELOAD_LANGUAGES", "eng").split(",")
+    try:
+        engine = get_engine()
+        if isinstance(engine, CAPIEngine):
+            engine.preload([lang.strip() for lang in languages if lang.strip()])
+    except Exception as e:
+        logger.warning(f"Could not warm up OCR engine: {e}")
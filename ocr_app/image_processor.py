@@ -2,150 +2,136 @@ import cv2
 import numpy as np
 import logging
 import os
-import tempfile
-from PIL import Image, ImageEnhance, ImageFilter
-import io
+import time
+from . import debug_artifacts
+from . import metrics
+from .preprocessing import parse_pipeline
 
 # Configure logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-def load_image(image_path):
+class ImageError(ValueError):
+    """Raised when an image cannot be decoded or preprocessed as requested."""
+
+def decode_image(data):
     """
-    Load an image from a file path.
+    Decode an encoded image (PNG, JPEG, ...) from memory.
     
     Args:
-        image_path: Path to the image file
+        data: Encoded image as bytes, bytearray or memoryview
+        
+    Returns:
+        OpenCV image (numpy array)
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if buffer.size == 0:
+        raise ImageError("Image data is empty")
+    
+    start = time.perf_counter()
+    image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ImageError("Failed to decode image data with OpenCV")
+    metrics.decode_seconds.observe(time.perf_counter() - start)
+    
+    logger.debug("Decoded image from memory: %dx%d, %d bytes", image.shape[1], image.shape[0], buffer.size)
+    return image
+
+def load_image(image):
+    """
+    Load an image from a file path, an in-memory buffer or an array.
+    
+    Args:
+        image: Path to the image file, encoded image bytes, or a numpy array
         
     Returns:
         OpenCV image (numpy array)
     """
     try:
+        if isinstance(image, np.ndarray):
+            return image
+        
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            return decode_image(image)
+        
+        image_path = str(image)
+        
         # Check if file exists
         if not os.path.exists(image_path):
             raise FileNotFoundError(f"Image file not found: {image_path}")
-            
-        # First try PIL loading to check if image is valid
-        try:
-            pil_image = Image.open(image_path)
-            pil_image.verify()  # Verify it's a valid image
-            logger.info(f"Verified image with PIL: {image_path}, format: {pil_image.format}")
-        except Exception as e:
-            logger.warning(f"PIL image verification failed: {e}")
         
         # Load image using OpenCV
-        image = cv2.imread(image_path)
+        cv_image = cv2.imread(image_path)
         
-        if image is None:
-            raise ValueError(f"Failed to load image from {image_path} with OpenCV")
+        if cv_image is None:
+            raise ImageError(f"Failed to load image from {image_path} with OpenCV")
         
         # Log image information
-        height, width, channels = image.shape if len(image.shape) == 3 else (*image.shape, 1)
-        logger.info(f"Loaded image: {image_path}, dimensions: {width}x{height}, channels: {channels}")
+        height, width, channels = cv_image.shape if len(cv_image.shape) == 3 else (*cv_image.shape, 1)
+        logger.debug("Loaded image: %s, dimensions: %dx%d, channels: %d", image_path, width, height, channels)
         
-        return image
+        return cv_image
+    
+    except ImageError:
+        raise
         
     except Exception as e:
         logger.error(f"Error loading image: {str(e)}", exc_info=True)
         raise
 
-def preprocess_image(image_path, preprocessing_type="default"):
+def preprocess_image(image, preprocessing_type="default", request_id=None, scratch=None, owned=False):
     """
     Preprocess an image for OCR.
     
     Args:
-        image_path: Path to the image file
-        preprocessing_type: Type of preprocessing to apply
+        image: Path to the image file, encoded image bytes, or a numpy array
+        preprocessing_type: Preset name (default, grayscale, threshold, adaptive,
+            denoise) or a custom stage chain such as "grayscale,blur:ksize=3,otsu"
+        request_id: Optional identifier used to namespace debug artifacts
+        scratch: Optional ScratchBuffers the stages write into; the result may
+            then live in them and must be used before they are handed out again
+        owned: Whether a numpy array ``image`` is handed over and may be
+            overwritten (decoded images always are)
         
     Returns:
-        PIL Image object ready for OCR
+        numpy array (grayscale or RGB) ready for OCR
+        
+    Raises:
+        ImageError: If the image cannot be decoded or a stage rejects its
+            arguments; there is no fallback image, so a failed upload is
+            never OCRed (or cached) as if it were blank
     """
+    # Save intermediate results for debugging (None unless enabled and sampled);
+    # outside the try, since a bad request id is not a problem with the image
+    debug = debug_artifacts.start_session(request_id)
+
     try:
-        logger.info(f"Preprocessing image with method: {preprocessing_type}")
-        
-        # Load the image with OpenCV
-        cv_image = load_image(image_path)
-        
-        # Resize image if it's too large (to improve processing time)
-        max_dimension = 2000
-        height, width = cv_image.shape[:2]
-        
-        if max(height, width) > max_dimension:
-            scale = max_dimension / max(height, width)
-            new_width = int(width * scale)
-            new_height = int(height * scale)
-            cv_image = cv2.resize(cv_image, (new_width, new_height), interpolation=cv2.INTER_AREA)
-            logger.info(f"Resized image to: {new_width}x{new_height}")
-        
-        # Save intermediate results for debugging
-        debug_dir = os.path.join(tempfile.gettempdir(), "ocr_debug")
-        os.makedirs(debug_dir, exist_ok=True)
-        
-        # Apply preprocessing based on type
-        if preprocessing_type == "grayscale":
-            # Convert to grayscale
-            processed = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
-            cv2.imwrite(os.path.join(debug_dir, "grayscale.png"), processed)
-        
-        elif preprocessing_type == "threshold":
-            # Convert to grayscale and apply binary threshold
-            gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
-            # Apply Gaussian blur to reduce noise
-            blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-            # Apply Otsu's thresholding
-            processed = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-            cv2.imwrite(os.path.join(debug_dir, "threshold.png"), processed)
-        
-        elif preprocessing_type == "adaptive":
-            # Convert to grayscale and apply adaptive threshold
-            gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
-            # Apply Gaussian blur to reduce noise
-            blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-            # Apply adaptive thresholding
-            processed = cv2.adaptiveThreshold(
-                blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
-            )
-            cv2.imwrite(os.path.join(debug_dir, "adaptive.png"), processed)
-        
-        elif preprocessing_type == "denoise":
-            # Convert to grayscale and denoise
-            gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
-            # Apply non-local means denoising
-            processed = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
-            cv2.imwrite(os.path.join(debug_dir, "denoise.png"), processed)
-        
-        else:  # default
-            # Convert BGR to RGB
-            processed = cv2.cvtColor(cv_image, cv2.COLOR_BGR2RGB)
-            cv2.imwrite(os.path.join(debug_dir, "default.png"), cv2.cvtColor(processed, cv2.COLOR_RGB2BGR))
-        
-        # Convert OpenCV image to PIL Image for Tesseract
-        if len(processed.shape) == 2:  # Grayscale
-            pil_image = Image.fromarray(processed)
-        else:  # RGB
-            pil_image = Image.fromarray(processed)
-        
-        # Additional PIL-based enhancements for better OCR
-        if preprocessing_type == "default":
-            # Increase contrast slightly
-            enhancer = ImageEnhance.Contrast(pil_image)
-            pil_image = enhancer.enhance(1.5)
-            
-            # Increase sharpness
-            enhancer = ImageEnhance.Sharpness(pil_image)
-            pil_image = enhancer.enhance(1.5)
-        
-        # Save the final PIL image for reference
-        pil_debug_path = os.path.join(debug_dir, f"final_{preprocessing_type}.png")
-        pil_image.save(pil_debug_path)
-        logger.info(f"Saved processed image to: {pil_debug_path}")
-        
-        logger.info(f"Image preprocessing completed: {preprocessing_type}")
-        return pil_image
+        pipeline = parse_pipeline(preprocessing_type)
+        
+        # Load the image with OpenCV (decoded once, in memory for uploads)
+        cv_image = load_image(image)
+        owned = owned or cv_image is not image
+        
+        processed = pipeline.run(cv_image, debug, owned=owned, scratch=scratch)
+        # Free the decoded image as soon as the stages are done with it
+        del cv_image
+        
+        # Save the final image for reference
+        if debug:
+            debug.save(f"final_{pipeline.name if pipeline.is_preset else 'custom'}", processed)
+            logger.info("Queued debug artifacts for request %s", debug.request_id)
+        
+        # Tesseract expects RGB for color images
+        if processed.ndim == 3:
+            dst = scratch.get(processed.shape, processed.dtype, (processed,)) if scratch else None
+            processed = cv2.cvtColor(processed, cv2.COLOR_BGR2RGB, dst=dst)
+        
+        logger.debug("Image preprocessing completed: %s", pipeline.name)
+        return processed
     
-    except Exception as e:
-        logger.error(f"Error preprocessing image: {str(e)}", exc_info=True)
-        # Return a blank image with an error message
-        error_image = Image.new('RGB', (800, 100), color=(0, 0, 0))
-        logger.error("Returning blank image due to preprocessing error")
-        return error_image
+    except ImageError:
+        raise
+    
+    except (ValueError, cv2.error) as e:
+        logger.error(f"Error preprocessing image: {str(e)}")
+        raise ImageError(f"Cannot preprocess image: {str(e)}") from e
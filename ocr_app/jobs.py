@@ -0,0 +1,506 @@
+import os
+import json
+import time
+import uuid
+import heapq
+import sqlite3
+import asyncio
+import logging
+import threading
+import itertools
+
+logger = logging.getLogger(__name__)
+
+# Job queue configuration
+# OCR_JOB_BACKEND: "memory" (default) or "sqlite" for jobs that survive a restart
+# OCR_JOB_DB: SQLite file used by the sqlite backend
+# OCR_JOB_CONCURRENCY: jobs processed at the same time (default: OCR worker count)
+# OCR_JOB_TTL: seconds finished jobs and their results are kept
+# OCR_JOB_MAX_QUEUED: queued jobs accepted before submissions are rejected
+# OCR_JOB_MAX_QUEUED_BYTES: total size of queued uploads accepted before submissions are rejected
+# OCR_JOB_LEASE: seconds a running job stays claimed without a heartbeat from its process
+JOB_BACKEND = os.environ.get("OCR_JOB_BACKEND", "memory").lower()
+JOB_DB = os.environ.get("OCR_JOB_DB", "ocr_jobs.db")
+JOB_CONCURRENCY = int(os.environ.get("OCR_JOB_CONCURRENCY", 0))
+JOB_TTL = float(os.environ.get("OCR_JOB_TTL", 3600))
+JOB_MAX_QUEUED = int(os.environ.get("OCR_JOB_MAX_QUEUED", 1000))
+JOB_MAX_QUEUED_BYTES = int(os.environ.get("OCR_JOB_MAX_QUEUED_BYTES", 256 * 1024 * 1024))
+JOB_LEASE = float(os.environ.get("OCR_JOB_LEASE", 60))
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED_STATES = (DONE, FAILED)
+
+# Job columns without the payload, which is only read when a job is claimed
+JOB_COLUMNS = "id, status, priority, params, result, error, created_at, started_at, finished_at"
+
+# Seconds between expired job sweeps
+SWEEP_INTERVAL = 60
+
+# Attempts at claiming a job before giving up for this round, when other
+# processes keep claiming the same jobs first
+CLAIM_ATTEMPTS = 5
+
+
+class QueueFullError(Exception):
+    """Raised when too many jobs are already waiting."""
+
+
+def new_job(params, priority=0):
+    """
+    Create a job record.
+
+    Args:
+        params: JSON serializable job parameters
+        priority: Higher priorities run first
+
+    Returns:
+        Job dict
+    """
+    return {
+        "id": uuid.uuid4().hex,
+        "status": QUEUED,
+        "priority": priority,
+        "params": params,
+        "result": None,
+        "error": None,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+    }
+
+
+class MemoryJobStore:
+    """Keeps jobs in process memory. Jobs are lost on restart."""
+
+    blocking = False
+
+    def __init__(self):
+        self._jobs = {}
+        self._payloads = {}
+        self._payload_bytes = 0
+        self._heap = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, job, payload):
+        with self._lock:
+            self._jobs[job["id"]] = job
+            self._payloads[job["id"]] = payload
+            self._payload_bytes += len(payload)
+            heapq.heappush(self._heap, (-job["priority"], next(self._seq), job["id"]))
+
+    def claim(self, owner=None, lease_until=None):
+        """Mark the highest priority queued job as running and return it with its payload."""
+        with self._lock:
+            while self._heap:
+                _, _, job_id = heapq.heappop(self._heap)
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] != QUEUED:
+                    continue
+                job["status"] = RUNNING
+                job["started_at"] = time.time()
+                payload = self._payloads.pop(job_id, None)
+                self._payload_bytes -= len(payload) if payload is not None else 0
+                return dict(job), payload
+        return None
+
+    def finish(self, job_id, status, result=None, error=None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(status=status, result=result, error=error, finished_at=time.time())
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def count_queued(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job["status"] == QUEUED)
+
+    def queued_bytes(self):
+        with self._lock:
+            return self._payload_bytes
+
+    def delete_expired(self, before):
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job["status"] in FINISHED_STATES and job["finished_at"] < before
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+            return len(expired)
+
+    def renew(self, owner, lease_until):
+        return 0
+
+    def recover(self, now):
+        return 0
+
+    def close(self):
+        pass
+
+
+class SQLiteJobStore:
+    """
+    Durable job store backed by SQLite.
+
+    Payloads are stored with the job so queued work survives a restart.
+    Several processes may share the database: a job is claimed by exactly
+    one of them, which holds a lease on it and renews it while the job
+    runs. Jobs whose lease ran out, because their process stopped, are
+    queued again.
+    """
+
+    blocking = True
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, priority INTEGER NOT NULL, "
+            "params TEXT NOT NULL, payload BLOB, result TEXT, error TEXT, "
+            "created_at REAL NOT NULL, started_at REAL, finished_at REAL, "
+            "owner TEXT, lease_until REAL)"
+        )
+        # Databases created before leases were added
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(ocr_jobs)")}
+        for column, kind in (("owner", "TEXT"), ("lease_until", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE ocr_jobs ADD COLUMN {column} {kind}")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ocr_jobs_queue ON ocr_jobs (status, priority DESC, created_at)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _to_job(row):
+        return {
+            "id": row["id"],
+            "status": row["status"],
+            "priority": row["priority"],
+            "params": json.loads(row["params"]),
+            "result": json.loads(row["result"]) if row["result"] is not None else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+
+    def add(self, job, payload):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO ocr_jobs (id, status, priority, params, payload, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job["id"], job["status"], job["priority"], json.dumps(job["params"]),
+                 sqlite3.Binary(payload), job["created_at"])
+            )
+            self._conn.commit()
+
+    def claim(self, owner=None, lease_until=None):
+        """
+        Mark the highest priority queued job as running and return it with its payload.
+
+        The update only succeeds while the job is still queued, so when
+        processes sharing the database race for a job exactly one gets it
+        and the others move on to the next one.
+
+        Args:
+            owner: Identifier of the claiming process
+            lease_until: Time until which the claim holds without renewal
+        """
+        with self._lock:
+            for _ in range(CLAIM_ATTEMPTS):
+                row = self._conn.execute(
+                    f"SELECT {JOB_COLUMNS}, payload FROM ocr_jobs "
+                    "WHERE status = ? ORDER BY priority DESC, created_at LIMIT 1",
+                    (QUEUED,)
+                ).fetchone()
+                if row is None:
+                    self._conn.commit()
+                    return None
+                started_at = time.time()
+                cursor = self._conn.execute(
+                    "UPDATE ocr_jobs SET status = ?, started_at = ?, owner = ?, lease_until = ? "
+                    "WHERE id = ? AND status = ?",
+                    (RUNNING, started_at, owner, lease_until, row["id"], QUEUED)
+                )
+                self._conn.commit()
+                if cursor.rowcount == 1:
+                    job = self._to_job(row)
+                    job.update(status=RUNNING, started_at=started_at)
+                    return job, bytes(row["payload"]) if row["payload"] is not None else None
+            return None
+
+    def finish(self, job_id, status, result=None, error=None):
+        with self._lock:
+            # The payload is no longer needed once the job has a result
+            self._conn.execute(
+                "UPDATE ocr_jobs SET status = ?, result = ?, error = ?, finished_at = ?, payload = NULL, "
+                "lease_until = NULL WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {JOB_COLUMNS} FROM ocr_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            return self._to_job(row) if row else None
+
+    def count_queued(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM ocr_jobs WHERE status = ?", (QUEUED,)
+            ).fetchone()[0]
+
+    def queued_bytes(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM ocr_jobs WHERE status = ?", (QUEUED,)
+            ).fetchone()[0]
+
+    def delete_expired(self, before):
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM ocr_jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (*FINISHED_STATES, before)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def renew(self, owner, lease_until):
+        """Extend the lease on every job ``owner`` is running."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE ocr_jobs SET lease_until = ? WHERE status = ? AND owner = ?",
+                (lease_until, RUNNING, owner)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def recover(self, now):
+        """Queue jobs again whose process stopped renewing their lease before ``now``."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE ocr_jobs SET status = ?, started_at = NULL, owner = NULL, lease_until = NULL "
+                "WHERE status = ? AND (lease_until IS NULL OR lease_until < ?)",
+                (QUEUED, RUNNING, now)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_store(backend=JOB_BACKEND, path=JOB_DB):
+    """
+    Create a job store for the configured backend.
+
+    Args:
+        backend: 'memory' or 'sqlite'
+        path: SQLite file for the sqlite backend
+
+    Returns:
+        MemoryJobStore or SQLiteJobStore
+    """
+    if backend == "sqlite":
+        return SQLiteJobStore(path)
+    if backend != "memory":
+        raise ValueError(f"Unknown job backend: {backend}")
+    return MemoryJobStore()
+
+
+class JobQueue:
+    """
+    Runs submitted jobs in the background with a concurrency limit.
+
+    ``handler`` is an async callable taking (payload, params) and returning
+    a JSON serializable result. Finished jobs are kept for ``ttl`` seconds.
+    Running jobs are leased for ``lease`` seconds and the lease is renewed
+    while they run, so a queue sharing a durable store can tell jobs of a
+    stopped process from jobs another process is still working on.
+    """
+
+    def __init__(self, store, handler, concurrency, ttl=JOB_TTL, max_queued=JOB_MAX_QUEUED, lease=JOB_LEASE,
+                 max_queued_bytes=JOB_MAX_QUEUED_BYTES):
+        self.store = store
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.ttl = ttl
+        self.max_queued = max_queued
+        self.max_queued_bytes = max_queued_bytes
+        self.lease = lease
+        self.owner = uuid.uuid4().hex
+        self._wakeup = None
+        self._events = {}
+        self._tasks = []
+
+    async def _call(self, fn, *args):
+        if self.store.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def start(self):
+        """Start the dispatcher and sweeper tasks."""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        await self._recover()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+        # Pick up jobs left in a durable store
+        self._wakeup.set()
+
+    async def stop(self):
+        """Cancel background tasks and close the store."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.store.close()
+
+    async def submit(self, payload, params, priority=0):
+        """
+        Queue a job.
+
+        Args:
+            payload: Bytes to hand to the handler
+            params: JSON serializable parameters for the handler
+            priority: Higher priorities run first
+
+        Returns:
+            The new job dict
+
+        Raises:
+            QueueFullError: If ``max_queued`` jobs are already waiting, or
+                the payload would take the queued payloads over
+                ``max_queued_bytes``
+        """
+        if await self._call(self.store.count_queued) >= self.max_queued:
+            raise QueueFullError("Too many queued jobs, please retry later")
+        if await self._call(self.store.queued_bytes) + len(payload) > self.max_queued_bytes:
+            raise QueueFullError("Too much data queued, please retry later")
+        job = new_job(params, priority)
+        await self._call(self.store.add, job, payload)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def get(self, job_id):
+        """Get a job by id, or None if it does not exist or has expired."""
+        return await self._call(self.store.get, job_id)
+
+    async def wait(self, job_id, timeout):
+        """
+        Long-poll a job until it finishes or ``timeout`` seconds pass.
+
+        Returns:
+            The job dict (possibly still queued/running), or None if unknown
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in FINISHED_STATES or remaining <= 0:
+                return job
+            # [event, number of waiters], shared by everyone polling the job
+            waiter = self._events.setdefault(job_id, [asyncio.Event(), 0])
+            waiter[1] += 1
+            try:
+                # Re-check the store periodically in case another process ran the job
+                await asyncio.wait_for(waiter[0].wait(), min(remaining, 1.0))
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                # The last waiter to leave drops the entry, so jobs finished
+                # elsewhere or never finished do not leave one behind
+                waiter[1] -= 1
+                if not waiter[1] and self._events.get(job_id) is waiter:
+                    del self._events[job_id]
+
+    def _notify(self, job_id):
+        waiter = self._events.pop(job_id, None)
+        if waiter is not None:
+            waiter[0].set()
+
+    async def _worker(self):
+        while True:
+            # Clear before claiming so a submit that lands after an empty
+            # claim still wakes this worker
+            self._wakeup.clear()
+            claimed = await self._call(self.store.claim, self.owner, time.time() + self.lease)
+            if claimed is None:
+                await self._wakeup.wait()
+                continue
+
+            job, payload = claimed
+            try:
+                result = await self.handler(payload, job["params"])
+                await self._call(self.store.finish, job["id"], DONE, result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job {job['id']} failed: {str(e)}")
+                await self._call(self.store.finish, job["id"], FAILED, None, str(e))
+            finally:
+                self._notify(job["id"])
+
+    async def _recover(self):
+        recovered = await self._call(self.store.recover, time.time())
+        if recovered:
+            logger.info(f"Re-queued {recovered} interrupted jobs")
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await self._call(self.store.renew, self.owner, time.time() + self.lease)
+            except Exception as e:
+                logger.error(f"Error renewing job leases: {str(e)}")
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            try:
+                # Jobs of processes that stopped while others keep running
+                await self._recover()
+                removed = await self._call(self.store.delete_expired, time.time() - self.ttl)
+                if removed:
+                    logger.info(f"Removed {removed} expired jobs")
+            except Exception as e:
+                logger.error(f"Error removing expired jobs: {str(e)}")
+
+
+def public_job(job):
+    """Format a job for API responses."""
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "priority": job["priority"],
+        "filename": job["params"].get("filename"),
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "result": job["result"],
+        "error": job["error"],
+    }
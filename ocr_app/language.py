@@ -0,0 +1,181 @@
+import os
+import logging
+import cv2
+import numpy as np
+
+from .engine import get_engine, get_fallback_engine, EngineError
+from . import metrics
+from .image_processor import load_image
+from .layout import OCRData
+from .ocr import installed_languages, verify_language_pack
+from .tiling import analyze_text_layout
+
+logger = logging.getLogger(__name__)
+
+# Language detection configuration
+# OCR_DETECT_MAX_DIMENSION: longest side of the downsampled image used to locate text regions
+# OCR_DETECT_MIN_SCRIPT_CONFIDENCE: below this OSD script confidence, sampled OCR decides instead
+# OCR_DETECT_SAMPLE_REGIONS: largest text regions used for script detection and sampled OCR
+DETECT_MAX_DIMENSION = int(os.environ.get("OCR_DETECT_MAX_DIMENSION", 1024))
+DETECT_MIN_SCRIPT_CONFIDENCE = float(os.environ.get("OCR_DETECT_MIN_SCRIPT_CONFIDENCE", 0.3))
+DETECT_SAMPLE_REGIONS = int(os.environ.get("OCR_DETECT_SAMPLE_REGIONS", 3))
+
+DEFAULT_LANGUAGE = "eng"
+
+# Sampled regions are rescaled to this character height (pixels), which is
+# enough for Tesseract, and cropped to at most this size
+SAMPLE_TEXT_HEIGHT = 24
+SAMPLE_MAX_WIDTH = 1000
+SAMPLE_MAX_HEIGHT = 240
+
+# Language packs for each script reported by Tesseract OSD, most likely first
+SCRIPT_LANGUAGES = {
+    "Latin": ["eng", "fra", "deu", "spa", "ita", "por", "nld"],
+    "Han": ["chi_sim", "chi_tra", "jpn"],
+    "Japanese": ["jpn"],
+    "Katakana": ["jpn"],
+    "Hiragana": ["jpn"],
+    "Hangul": ["kor"],
+    "Cyrillic": ["rus", "ukr", "bul", "srp"],
+    "Arabic": ["ara", "fas", "urd"],
+    "Greek": ["ell"],
+    "Hebrew": ["heb"],
+    "Devanagari": ["hin", "mar", "nep"],
+    "Thai": ["tha"],
+}
+
+
+def _detect_script(image):
+    engine = get_engine()
+    try:
+        return engine.detect_orientation_script(image)
+    except EngineError as e:
+        if engine is get_fallback_engine():
+            raise
+        logger.warning(f"Script detection failed on {engine.name} engine ({e}), trying {get_fallback_engine().name}")
+        metrics.engine_fallbacks.inc()
+        return get_fallback_engine().detect_orientation_script(image)
+
+
+def sample_regions(image, count=DETECT_SAMPLE_REGIONS):
+    """
+    Pick the largest text regions of an image, rescaled for a quick pass.
+
+    Regions are scaled so characters are about SAMPLE_TEXT_HEIGHT pixels
+    tall and cropped to a few lines, so detection cost does not grow with
+    the image size.
+
+    Args:
+        image: OpenCV image (numpy array)
+        count: Number of regions to return
+
+    Returns:
+        List of numpy arrays
+    """
+    boxes, text_height = analyze_text_layout(image, DETECT_MAX_DIMENSION)
+    boxes = sorted(boxes, key=lambda box: box[2] * box[3], reverse=True)[:count]
+    scale = min(1.0, SAMPLE_TEXT_HEIGHT / text_height) if text_height else 1.0
+    regions = []
+    for x, y, w, h in boxes:
+        w = min(w, int(SAMPLE_MAX_WIDTH / scale))
+        h = min(h, int(SAMPLE_MAX_HEIGHT / scale))
+        region = image[y:y + h, x:x + w]
+        if scale < 1.0:
+            region = cv2.resize(region, (max(1, int(w * scale)), max(1, int(h * scale))),
+                                interpolation=cv2.INTER_AREA)
+        regions.append(region)
+    return regions
+
+
+def montage(regions, padding=16):
+    """Stack regions vertically on a white canvas so one OSD call sees all of them."""
+    width = max(region.shape[1] for region in regions) + 2 * padding
+    height = sum(region.shape[0] + padding for region in regions) + padding
+    canvas = np.full((height, width) + regions[0].shape[2:], 255, dtype=np.uint8)
+    y = padding
+    for region in regions:
+        canvas[y:y + region.shape[0], padding:padding + region.shape[1]] = region
+        y += region.shape[0] + padding
+    return canvas
+
+
+def score_language(regions, language):
+    """
+    Score how well ``language`` reads the sampled regions.
+
+    Args:
+        regions: Arrays from ``sample_regions``
+        language: Language code
+
+    Returns:
+        Mean word confidence (0-100), weighted by word length
+    """
+    engine = get_engine()
+    data = OCRData.merge(
+        (OCRData.from_tsv(engine.image_to_tsv(region, language, psm=6)), 0, 0, None)
+        for region in regions
+    )
+    return data.mean_confidence()
+
+
+def detect_language(image, candidates=None):
+    """
+    Detect the language of the text in an image without a full OCR pass.
+
+    The largest text regions are located on a downsampled copy and rescaled
+    to a small character height. Tesseract's orientation and script
+    detection runs on those regions first. When the script maps to a
+    single installed language pack that pack is returned directly;
+    otherwise the regions are OCRed in each remaining candidate language
+    and the one read with the highest confidence wins.
+
+    Args:
+        image: Encoded image bytes, a path to the image file, or a numpy array
+        candidates: Language codes to choose from (default: every installed pack)
+
+    Returns:
+        Dict with the detected ``language``, the ``script`` (when known), a
+        ``confidence`` score and the ``method`` that decided
+    """
+    available = [lang for lang in (candidates or installed_languages()) if verify_language_pack(lang)]
+    if not available:
+        available = [DEFAULT_LANGUAGE]
+
+    image = load_image(image)
+    regions = sample_regions(image)
+    if not regions:
+        language = DEFAULT_LANGUAGE if DEFAULT_LANGUAGE in available else available[0]
+        return {"language": language, "script": None, "confidence": 0.0, "method": "default"}
+
+    script = None
+    remaining = available
+    try:
+        osd = _detect_script(montage(regions))
+        script = osd["script"]
+        logger.debug("Detected script %s (confidence %.2f)", script, osd["script_confidence"])
+        if osd["script_confidence"] >= DETECT_MIN_SCRIPT_CONFIDENCE and script in SCRIPT_LANGUAGES:
+            matches = [lang for lang in SCRIPT_LANGUAGES[script] if lang in available]
+            if len(matches) == 1:
+                return {
+                    "language": matches[0],
+                    "script": script,
+                    "confidence": round(osd["script_confidence"], 2),
+                    "method": "osd",
+                }
+            if matches:
+                remaining = matches
+    except EngineError as e:
+        logger.warning(f"Script detection unavailable: {e}")
+
+    if len(remaining) == 1:
+        return {"language": remaining[0], "script": script, "confidence": 0.0, "method": "default"}
+
+    scores = {lang: score_language(regions, lang) for lang in remaining}
+    language = max(scores, key=scores.get)
+    logger.debug("Sampled OCR language scores: %s", scores)
+    return {
+        "language": language,
+        "script": script,
+        "confidence": round(scores[language] / 100, 2),
+        "method": "sample",
+    }
@@ -0,0 +1,209 @@
+import os
+import time
+import logging
+import threading
+import subprocess
+
+from .engine import get_engine
+
+logger = logging.getLogger(__name__)
+
+# Language registry configuration
+# OCR_LANGUAGE_REFRESH: seconds between checks of the tessdata directory for added or removed packs
+# OCR_LANGUAGES: comma-separated packs offered by the API (default: every installed pack)
+LANGUAGE_REFRESH = float(os.environ.get("OCR_LANGUAGE_REFRESH", 60))
+OFFERED_LANGUAGES = [lang.strip() for lang in os.environ.get("OCR_LANGUAGES", "").split(",") if lang.strip()]
+
+DEFAULT_LANGUAGE = "eng"
+
+# Longest accepted combination: every pack adds a full recognition model to
+# each Tesseract pass, and the result is stored in Conversion.language (20 chars)
+MAX_COMBINED_LANGUAGES = 3
+MAX_LANGUAGE_LENGTH = 20
+
+# Helper models that are not OCR languages
+HELPER_MODELS = {"osd", "equ"}
+
+# Display names of common packs; others are shown by their code
+LANGUAGE_NAMES = {
+    "eng": "English",
+    "chi_sim": "Chinese (Simplified)",
+    "chi_tra": "Chinese (Traditional)",
+    "jpn": "Japanese",
+    "kor": "Korean",
+    "fra": "French",
+    "deu": "German",
+    "spa": "Spanish",
+    "ita": "Italian",
+    "por": "Portuguese",
+    "nld": "Dutch",
+    "rus": "Russian",
+    "ukr": "Ukrainian",
+    "ara": "Arabic",
+    "heb": "Hebrew",
+    "hin": "Hindi",
+    "tha": "Thai",
+    "vie": "Vietnamese",
+}
+
+
+def split_languages(language):
+    """Split a combination such as 'eng+chi_sim' into its pack codes."""
+    return [code for code in (language or "").split("+") if code]
+
+
+class LanguageRegistry:
+    """
+    Installed Tesseract language packs and engine details.
+
+    The tessdata directory is listed once and then only stat'ed every
+    ``refresh_interval`` seconds; it is listed again when its modification
+    time changes. Validation is a set lookup and the info endpoints read a
+    cached snapshot, so requests never touch the filesystem or fork
+    ``tesseract``.
+
+    Args:
+        tessdata_dir: Directory holding the ``.traineddata`` files
+        tesseract_cmd: Tesseract executable, run once for its version
+        refresh_interval: Seconds between checks of the directory
+        offered: Packs offered by the API (default: every installed pack)
+    """
+
+    def __init__(self, tessdata_dir, tesseract_cmd, refresh_interval=LANGUAGE_REFRESH, offered=OFFERED_LANGUAGES):
+        self.tessdata_dir = tessdata_dir
+        self.tesseract_cmd = tesseract_cmd
+        self.refresh_interval = refresh_interval
+        self.offered = list(offered)
+        self._lock = threading.Lock()
+        self._packs = {}
+        self._installed = frozenset()
+        self._mtime = None
+        self._checked = None
+        self._version = None
+
+    def _scan(self):
+        packs = {}
+        try:
+            with os.scandir(self.tessdata_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".traineddata"):
+                        packs[entry.name[:-len(".traineddata")]] = entry.stat().st_size
+        except OSError as e:
+            logger.warning(f"Could not list tessdata directory {self.tessdata_dir}: {e}")
+        return packs
+
+    def _mtime_of_dir(self):
+        try:
+            return os.stat(self.tessdata_dir).st_mtime_ns
+        except OSError:
+            return None
+
+    def refresh(self, force=False):
+        """
+        Re-list the tessdata directory if it changed (or always with ``force``).
+
+        Returns:
+            True if the installed packs were re-read
+        """
+        with self._lock:
+            self._checked = time.monotonic()
+            mtime = self._mtime_of_dir()
+            if not force and self._packs and mtime == self._mtime:
+                return False
+            packs = self._scan()
+            self._packs = packs
+            self._installed = frozenset(packs)
+            self._mtime = mtime
+        logger.info(f"Found {len(packs)} Tesseract language packs in {self.tessdata_dir}")
+        return True
+
+    def _current(self):
+        checked = self._checked
+        if checked is None or time.monotonic() - checked >= self.refresh_interval:
+            self.refresh()
+        return self._installed
+
+    def is_installed(self, language):
+        """
+        Check that every pack of a language or combination is installed.
+
+        Args:
+            language: Code such as 'eng' or combination such as 'eng+chi_sim'
+        """
+        codes = split_languages(language)
+        installed = self._current()
+        return bool(codes) and all(code in installed for code in codes)
+
+    def languages(self):
+        """Sorted OCR languages offered by the API (installed helper models excluded)."""
+        installed = self._current()
+        if self.offered:
+            return [code for code in self.offered if code in installed]
+        return sorted(code for code in installed if code not in HELPER_MODELS)
+
+    def resolve(self, language, default=DEFAULT_LANGUAGE):
+        """
+        Return ``language`` if all of its packs are offered, else ``default``.
+
+        Repeated packs are dropped. Combinations of more than
+        ``MAX_COMBINED_LANGUAGES`` packs or longer than
+        ``MAX_LANGUAGE_LENGTH`` characters are not accepted either.
+
+        Args:
+            language: Requested code or '+'-joined combination
+            default: Language used for unknown, missing or too many packs
+        """
+        codes = list(dict.fromkeys(split_languages(language)))
+        offered = set(self.languages())
+        resolved = "+".join(codes)
+        if (codes and len(codes) <= MAX_COMBINED_LANGUAGES and len(resolved) <= MAX_LANGUAGE_LENGTH
+                and all(code in offered for code in codes)):
+            return resolved
+        return default
+
+    def version(self):
+        """Tesseract version details, read from ``tesseract --version`` once."""
+        if self._version is None:
+            try:
+                result = subprocess.run(
+                    [self.tesseract_cmd, "--version"], capture_output=True, text=True, check=False
+                )
+                # Older releases print the version to stderr
+                output = (result.stdout or result.stderr).strip()
+                self._version = {
+                    "tesseract_version": output.splitlines()[0].split()[-1] if output else "Unknown",
+                    "version_details": output or "Unknown",
+                }
+            except OSError as e:
+                logger.error(f"Could not run {self.tesseract_cmd}: {e}")
+                return {"tesseract_version": "Unknown", "version_details": "Unknown", "error": str(e)}
+        return self._version
+
+    def snapshot(self):
+        """
+        Describe the installed packs and the engine.
+
+        Returns:
+            Dict with the ``languages`` (code, name, size and whether a warm
+            engine handle is loaded), the ``default`` language and engine details
+        """
+        engine = get_engine()
+        loaded = set(engine.loaded_languages()) if hasattr(engine, "loaded_languages") else set()
+        self._current()
+        packs = self._packs
+        return {
+            "languages": [
+                {
+                    "id": code,
+                    "name": LANGUAGE_NAMES.get(code, code),
+                    "size": packs.get(code, 0),
+                    "preloaded": code in loaded,
+                }
+                for code in self.languages()
+            ],
+            "default": DEFAULT_LANGUAGE,
+            "combinations": f"Join up to {MAX_COMBINED_LANGUAGES} codes with '+', e.g. eng+chi_sim",
+            "tessdata_dir": self.tessdata_dir,
+            "engine": engine.name,
+            **self.version(),
+        }
@@ -0,0 +1,186 @@
+import io
+import logging
+from array import array
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Integer columns of Tesseract's TSV output, in file order
+INT_COLUMNS = (
+    "level", "page_num", "block_num", "par_num", "line_num", "word_num",
+    "left", "top", "width", "height",
+)
+
+# Tesseract layout levels
+PAGE, BLOCK, PARAGRAPH, LINE, WORD = 1, 2, 3, 4, 5
+
+
+class OCRData:
+    """
+    Columnar OCR result: text, boxes and confidences as parallel arrays.
+
+    Each row is one page, block, paragraph, line or word (see ``level``),
+    stored as one int32 array per TSV column, a float32 ``conf`` array
+    (-1 for non-word rows) and a list of word strings, so a dense page
+    does not allocate an object per word.
+    """
+
+    def __init__(self, columns, conf, words):
+        self.columns = columns
+        self.conf = conf
+        self.words = words
+
+    def __len__(self):
+        return len(self.words)
+
+    @classmethod
+    def from_tsv(cls, tsv):
+        """
+        Parse Tesseract TSV output in a single pass.
+
+        Args:
+            tsv: TSV text including the header row
+
+        Returns:
+            OCRData
+        """
+        ints = [array("i") for _ in INT_COLUMNS]
+        conf = array("f")
+        words = []
+        for line in tsv.splitlines()[1:]:
+            fields = line.split("\t", 11)
+            if len(fields) < 11:
+                continue
+            for column, value in zip(ints, fields):
+                column.append(int(value))
+            conf.append(float(fields[10]))
+            words.append(fields[11] if len(fields) > 11 else "")
+        columns = {
+            name: np.frombuffer(column, dtype=np.int32) if column else np.zeros(0, dtype=np.int32)
+            for name, column in zip(INT_COLUMNS, ints)
+        }
+        return cls(columns, np.frombuffer(conf, dtype=np.float32) if conf else np.zeros(0, dtype=np.float32), words)
+
+    @classmethod
+    def merge(cls, parts):
+        """
+        Concatenate results of several regions or pages.
+
+        Args:
+            parts: Iterable of (OCRData, x offset, y offset, page number or None)
+
+        Returns:
+            OCRData with boxes in the coordinates of the full image and block
+            numbers kept unique across parts
+        """
+        columns = {name: [] for name in INT_COLUMNS}
+        confs = []
+        words = []
+        block_offset = 0
+        for data, x, y, page in parts:
+            for name in INT_COLUMNS:
+                column = data.columns[name]
+                if name == "left":
+                    column = column + x
+                elif name == "top":
+                    column = column + y
+                elif name == "block_num":
+                    column = np.where(column > 0, column + block_offset, 0).astype(np.int32)
+                elif name == "page_num" and page is not None:
+                    column = np.full_like(column, page)
+                columns[name].append(column)
+            confs.append(data.conf)
+            words.extend(data.words)
+            if len(data):
+                block_offset += int(data.columns["block_num"].max())
+        return cls(
+            {name: np.concatenate(arrays).astype(np.int32) if arrays else np.zeros(0, dtype=np.int32)
+             for name, arrays in columns.items()},
+            np.concatenate(confs).astype(np.float32) if confs else np.zeros(0, dtype=np.float32),
+            words
+        )
+
+    def scale(self, sx, sy):
+        """Scale the boxes in place, e.g. back to the size of the original image."""
+        for name, factor in (("left", sx), ("width", sx), ("top", sy), ("height", sy)):
+            self.columns[name] = np.rint(self.columns[name] * factor).astype(np.int32)
+
+    def mean_confidence(self):
+        """
+        Mean word confidence (0-100), weighted by word length.
+
+        Returns:
+            The confidence, or 0 when no words were recognized
+        """
+        words = np.flatnonzero((self.columns["level"] == WORD) & (self.conf >= 0))
+        lengths = np.array([len(self.words[index].strip()) for index in words], dtype=np.float64)
+        if not lengths.sum():
+            return 0.0
+        return float(np.dot(self.conf[words], lengths) / lengths.sum())
+
+    @property
+    def text(self):
+        """
+        Plain text rebuilt from the words.
+
+        Words are joined with spaces, lines with newlines, and paragraphs and
+        blocks are separated by blank lines, like Tesseract's text output.
+        """
+        level = self.columns["level"]
+        indexes = np.flatnonzero(level == WORD)
+        parts = []
+        previous = None
+        for index in indexes:
+            word = self.words[index]
+            if not word.strip():
+                continue
+            key = (
+                self.columns["page_num"][index], self.columns["block_num"][index],
+                self.columns["par_num"][index], self.columns["line_num"][index]
+            )
+            if previous is not None:
+                if key[:3] != previous[:3]:
+                    parts.append("\n\n")
+                elif key != previous:
+                    parts.append("\n")
+                else:
+                    parts.append(" ")
+            parts.append(word)
+            previous = key
+        return "".join(parts)
+
+    def to_dict(self):
+        """JSON serializable columnar representation."""
+        data = {name: column.tolist() for name, column in self.columns.items()}
+        data["conf"] = np.round(self.conf.astype(np.float64), 2).tolist()
+        data["text"] = list(self.words)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild OCRData from ``to_dict`` output."""
+        return cls(
+            {name: np.asarray(data[name], dtype=np.int32) for name in INT_COLUMNS},
+            np.asarray(data["conf"], dtype=np.float32),
+            list(data["text"])
+        )
+
+    def to_npz(self, **extra):
+        """
+        Encode as a compressed NumPy ``.npz`` archive.
+
+        Args:
+            **extra: Additional arrays or scalars to store alongside the columns
+
+        Returns:
+            Archive bytes
+        """
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            conf=self.conf,
+            text=np.array(self.words, dtype=np.str_),
+            **self.columns,
+            **{name: np.asarray(value) for name, value in extra.items()}
+        )
+        return buffer.getvalue()
@@ -0,0 +1,180 @@
+import os
+import asyncio
+import logging
+import threading
+from collections import deque
+import numpy as np
+
+from .uploads import image_size
+
+logger = logging.getLogger(__name__)
+
+# Memory configuration
+# OCR_PIXEL_BUDGET: decoded image pixels the OCR workers may hold at once (0 disables the budget)
+# OCR_SCRATCH_MAX_BYTES: largest scratch buffer a worker keeps for reuse between jobs
+PIXEL_BUDGET = int(os.environ.get("OCR_PIXEL_BUDGET", 60_000_000))
+SCRATCH_MAX_BYTES = int(os.environ.get("OCR_SCRATCH_MAX_BYTES", 16 * 1024 * 1024))
+
+# Scratch buffers per worker: two for stage outputs to alternate between
+# and one for temporaries such as the smoothed copy used by sharpen
+SCRATCH_SLOTS = 3
+
+
+def image_pixels(image):
+    """
+    Number of pixels an image has once decoded.
+
+    Args:
+        image: numpy array, or encoded image bytes (only the header is read)
+
+    Returns:
+        Width times height, or 0 when it cannot be told without decoding
+    """
+    if isinstance(image, np.ndarray):
+        return int(image.shape[0] * image.shape[1]) if image.ndim >= 2 else 0
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        size = image_size(image)
+        return size[0] * size[1] if size else 0
+    return 0
+
+
+def rss_bytes():
+    """Resident set size of this process, or 0 where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class PixelBudget:
+    """
+    Admission control weighted by decoded image size.
+
+    A job reserves the pixels of its image before it runs and returns them
+    when it finishes, so the decoded images (and the preprocessing buffers
+    that scale with them) held at once stay under ``limit`` however the
+    uploads are mixed. Waiters are admitted in arrival order, so a large
+    image is not starved by a stream of small ones; an image larger than
+    the whole budget runs once nothing else is in flight.
+
+    Not thread-safe: use it from the event loop only.
+    """
+
+    def __init__(self, limit=PIXEL_BUDGET):
+        self.limit = max(0, limit)
+        self.in_use = 0
+        self._waiters = deque()
+
+    def _fits(self, pixels):
+        return self.in_use == 0 or self.in_use + pixels <= self.limit
+
+    async def acquire(self, pixels):
+        """
+        Wait until ``pixels`` fit in the budget and reserve them.
+
+        Returns:
+            The number of pixels reserved, to be passed to ``release``
+        """
+        if not self.limit or pixels <= 0:
+            return 0
+        if not self._waiters and self._fits(pixels):
+            self.in_use += pixels
+            return pixels
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((pixels, future))
+        try:
+            await future
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # Admitted just as the caller gave up
+                self.release(pixels)
+            else:
+                future.cancel()
+                self._wake()
+            raise
+        return pixels
+
+    def release(self, pixels):
+        """Return pixels reserved by ``acquire`` and admit waiters that now fit."""
+        if pixels <= 0:
+            return
+        self.in_use -= pixels
+        self._wake()
+
+    def _wake(self):
+        while self._waiters:
+            pixels, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if not self._fits(pixels):
+                break
+            self._waiters.popleft()
+            self.in_use += pixels
+            future.set_result(None)
+
+    def stats(self):
+        return {"pixel_budget": self.limit, "pixels_in_flight": self.in_use, "memory_waiting": len(self._waiters)}
+
+
+class ScratchBuffers:
+    """
+    Reusable arrays for preprocessing intermediates, one set per worker.
+
+    Stages write their outputs into these buffers instead of allocating a
+    new array per stage and job, so a worker's preprocessing memory stays
+    at a few buffers sized by the largest image it has processed instead
+    of churning through the allocator. Arrays handed out stay valid only
+    until the buffers are handed out again, so they must not outlive the job.
+
+    Args:
+        max_bytes: Largest buffer kept; bigger arrays are allocated normally
+            and freed with the job
+        slots: Number of buffers
+    """
+
+    def __init__(self, max_bytes=SCRATCH_MAX_BYTES, slots=SCRATCH_SLOTS):
+        self.max_bytes = max_bytes
+        self._slots = [np.empty(0, dtype=np.uint8) for _ in range(slots)]
+
+    @property
+    def nbytes(self):
+        return sum(slot.nbytes for slot in self._slots)
+
+    def get(self, shape, dtype=np.uint8, live=()):
+        """
+        Return an uninitialized array that shares no memory with ``live``.
+
+        Args:
+            shape: Shape of the array
+            dtype: Data type of the array
+            live: Arrays still in use, whose buffers must not be handed out
+
+        Returns:
+            numpy array, or None when the array is larger than ``max_bytes``
+            or every buffer is in use
+        """
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape)) * dtype.itemsize
+        if size > self.max_bytes:
+            return None
+        for index, slot in enumerate(self._slots):
+            if any(array is not None and np.may_share_memory(slot, array) for array in live):
+                continue
+            if slot.size < size:
+                slot = self._slots[index] = np.empty(size, dtype=np.uint8)
+            return slot[:size].view(dtype).reshape(shape)
+        return None
+
+
+_local = threading.local()
+
+
+def scratch_buffers():
+    """Scratch buffers of the calling worker thread."""
+    buffers = getattr(_local, "buffers", None)
+    if buffers is None:
+        buffers = _local.buffers = ScratchBuffers()
+    return buffers
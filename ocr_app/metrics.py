@@ -0,0 +1,332 @@
+import math
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Histogram buckets in seconds, from sub-millisecond stages to slow OCR runs
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Observations of the job running on the current thread, while it is recorded
+_recording = threading.local()
+
+
+def _record(key, value):
+    # Keep an observation for another process when a job is being recorded
+    observations = getattr(_recording, "observations", None)
+    if observations is None:
+        return False
+    observations.append((key[0], key[1], value))
+    return True
+
+
+@contextmanager
+def recording():
+    """
+    Collect the counter and histogram observations made on this thread.
+
+    Used around pool jobs: inside a process worker or on a worker node the
+    observations would land in a registry nobody scrapes, so they are sent
+    back with the job result and applied with ``replay`` where /metrics is
+    served.
+
+    Yields:
+        List the observations are appended to, as (metric name, label
+        values, value) tuples
+    """
+    previous = getattr(_recording, "observations", None)
+    _recording.observations = observations = []
+    try:
+        yield observations
+    finally:
+        _recording.observations = previous
+
+
+def replay(observations, target=None):
+    """
+    Apply observations collected by ``recording``.
+
+    Args:
+        observations: (metric name, label values, value) tuples
+        target: Optional registry to apply them to, defaults to ``registry``
+    """
+    metrics = (target or registry).metrics
+    for name, values, value in observations:
+        metric = metrics.get(name)
+        if metric is None:
+            continue
+        child = metric.labels(*values)
+        if isinstance(metric, Counter):
+            child.inc(value)
+        else:
+            child.observe(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+    # Appended to the name for the exposed family and its samples
+    suffix = ""
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def labels(self, *values):
+        """Return the child for one combination of label values."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}")
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+                    child.key = (self.name, values)
+        return child
+
+    def _default(self):
+        # Unlabelled metrics have a single child
+        return self.labels()
+
+    def render(self):
+        name = self.name + self.suffix
+        lines = [
+            f"# HELP {name} {self.documentation}",
+            f"# TYPE {name} {self.kind}",
+        ]
+        for values, child in sorted(self._children.items()):
+            lines.extend(child.render(name, self.label_names, values))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        if _record(self.key, amount):
+            return
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        # For collectors mirroring a count that is kept elsewhere
+        self.value = value
+
+    def render(self, name, label_names, values):
+        return [f"{name}{_format_labels(label_names, values)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, exposed as ``<name>_total``."""
+
+    kind = "counter"
+    suffix = "_total"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def render(self, name, label_names, values):
+        return [f"{name}{_format_labels(label_names, values)} {_format_value(self.value)}"]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default().set(value)
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One slot per bucket plus one for values above the largest bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        if _record(self.key, value):
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def render(self, name, label_names, values):
+        bucket_labels = (*label_names, "le")
+        lines = []
+        cumulative = 0
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f"{name}_bucket{_format_labels(bucket_labels, (*values, _format_value(float(bound))))} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(bucket_labels, (*values, '+Inf'))} {count}")
+        lines.append(f"{name}_sum{_format_labels(label_names, values)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(label_names, values)} {count}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Distribution of durations in seconds over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        """Context manager observing the duration of its block."""
+        return self._default().time()
+
+
+class Registry:
+    """
+    Set of metrics rendered together in the Prometheus text format.
+
+    Collectors are callables run at scrape time to refresh gauges from
+    state that is already tracked elsewhere (pool sizes, cache counters),
+    so the hot path pays nothing for them.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        for collector in self.collectors:
+            collector()
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Shared registry exposed on /metrics
+registry = Registry()
+
+upload_read_seconds = registry.histogram(
+    "ocr_upload_read_seconds", "Time spent reading the request body of an upload"
+)
+decode_seconds = registry.histogram(
+    "ocr_decode_seconds", "Time spent decoding an encoded image"
+)
+preprocess_stage_seconds = registry.histogram(
+    "ocr_preprocess_stage_seconds", "Time spent in each preprocessing stage", ("stage",)
+)
+engine_seconds = registry.histogram(
+    "ocr_engine_seconds", "Time spent in a Tesseract run", ("engine", "output")
+)
+clean_seconds = registry.histogram(
+    "ocr_clean_seconds", "Time spent cleaning OCR text"
+)
+queue_wait_seconds = registry.histogram(
+    "ocr_queue_wait_seconds", "Time a job waited for a free OCR worker"
+)
+job_seconds = registry.histogram(
+    "ocr_job_seconds", "Time an OCR worker spent on a job", ("function",)
+)
+request_seconds = registry.histogram(
+    "ocr_request_seconds", "Total processing time of an OCR request", ("endpoint",)
+)
+engine_failures = registry.counter(
+    "ocr_engine_failures", "Tesseract runs that failed", ("engine",)
+)
+engine_fallbacks = registry.counter(
+    "ocr_engine_fallbacks", "OCR runs retried on the subprocess engine after a failure"
+)
+
+# Mirrored from the worker pool, result cache and analytics writer at scrape time
+pool_in_flight = registry.gauge("ocr_pool_in_flight", "OCR jobs running on a worker")
+pool_queued = registry.gauge("ocr_pool_queued", "OCR jobs waiting for a free worker")
+pool_rejected = registry.counter("ocr_pool_rejected", "OCR jobs rejected because the pool was full")
+pool_timed_out = registry.counter("ocr_pool_timed_out", "OCR jobs that did not finish in time")
+pool_pixels_in_flight = registry.gauge("ocr_pool_pixels_in_flight", "Decoded image pixels reserved by OCR jobs")
+pool_memory_waiting = registry.gauge("ocr_pool_memory_waiting", "OCR jobs waiting for the pixel budget")
+process_rss_bytes = registry.gauge("ocr_process_rss_bytes", "Resident memory of the API process")
+cache_hits = registry.counter("ocr_cache_hits", "OCR result cache hits", ("tier",))
+cache_misses = registry.counter("ocr_cache_misses", "OCR result cache misses")
+cache_hit_ratio = registry.gauge("ocr_cache_hit_ratio", "Share of OCR result cache lookups that hit")
+cache_bytes = registry.gauge("ocr_cache_bytes", "Size of the OCR result cache", ("tier",))
+analytics_buffered = registry.gauge("ocr_analytics_buffered", "Tracking events waiting to be written")
+analytics_dropped = registry.counter("ocr_analytics_dropped", "Tracking events dropped because the buffer was full")
@@ -1,11 +1,13 @@
 import pytesseract
 import logging
-import tempfile
-import subprocess
 import os
-import re
+import numpy as np
 from PIL import Image
-import io
+from .engine import get_engine, get_fallback_engine, EngineError
+from .layout import OCRData
+from .text_cleaning import get_cleaner
+from .language_packs import LanguageRegistry, split_languages
+from . import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -17,20 +19,61 @@ tessdata_dir = os.environ.get("TESSDATA_PREFIX", r"C:\Program Files\Tesseract-OC
 os.environ["TESSDATA_PREFIX"] = tessdata_dir
 pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
 
+# Installed language packs, listed once and refreshed when tessdata changes
+language_registry = LanguageRegistry(tessdata_dir, tesseract_cmd)
+
+# Prefix of the text returned by extract_text when OCR fails
+OCR_ERROR_PREFIX = "OCR processing error"
+
+# Returned by extract_text when Tesseract finds no text
+NO_TEXT_MESSAGE = "No text detected in the image. Try a different preprocessing method or ensure the image contains text."
+
+def get_engine_config(language):
+    """
+    Get the Tesseract engine settings used for a language.
+    
+    Args:
+        language: Language code for OCR
+        
+    Returns:
+        Tuple of (oem, psm)
+    """
+    # common PSM modes:
+    # 3 = Fully automatic page segmentation, but no OSD (default)
+    # 6 = Assume a single uniform block of text
+    # 11 = Sparse text - Find as much text as possible in no particular order
+    # 
+    # For Chinese/Japanese text, PSM 6 or 11 often works better
+    psm_mode = 6
+    # Combinations such as 'chi_sim+eng' are configured for their primary language
+    primary = (split_languages(language) or [language])[0]
+    if primary in ["chi_sim", "chi_tra", "jpn", "kor"]:
+        # For Asian languages, try different PSM mode for better results
+        psm_mode = 11
+    return 3, psm_mode
+
 def verify_language_pack(language):
     """
     Verify that the requested language pack is installed.
     
     Args:
-        language: Language code to verify
+        language: Language code to verify, or a combination such as 'eng+chi_sim'
         
     Returns:
         bool: True if language pack is available, False otherwise
     """
-    traineddata_path = os.path.join(tessdata_dir, f"{language}.traineddata")
-    return os.path.exists(traineddata_path)
+    return language_registry.is_installed(language)
+
+def installed_languages():
+    """
+    List the OCR language packs in the tessdata directory.
+    
+    Returns:
+        Sorted list of language codes, without the 'osd' and 'equ' helper models
+    """
+    return language_registry.languages()
 
-def clean_text(text, fix_punctuation=True, fix_layout=True):
+def clean_text(text, fix_punctuation=True, fix_layout=True, language=None):
     """
     Clean up OCR text by fixing punctuation and layout issues.
     
@@ -38,61 +81,13 @@ def clean_text(text, fix_punctuation=True, fix_layout=True):
         text: The raw text from OCR
         fix_punctuation: Whether to fix common punctuation errors
         fix_layout: Whether to fix layout issues (sentence breaks, etc.)
+        language: Language code selecting language-specific rules
         
     Returns:
         Cleaned text
     """
-    if not text:
-        return text
-    
-    # Fix the issue with dots converting to 1
-    if fix_punctuation:
-        # Replace standalone 1s that might be periods
-        text = re.sub(r'(\s)1(\s)', r'\1.\2', text)
-        # Fix other common OCR errors with punctuation
-        text = text.replace(' ,', ',')
-        text = text.replace(' .', '.')
-        text = text.replace(' :', ':')
-        text = text.replace(' ;', ';')
-        text = text.replace(' !', '!')
-        text = text.replace(' ?', '?')
-    
-    # Fix layout/alignment issues
-    if fix_layout:
-        # Join sentences that got broken across lines incorrectly
-        # This is a simple version - more sophisticated NLP could be used
-        lines = text.split('\n')
-        new_lines = []
-        current_line = ""
-        
-        for line in lines:
-            line = line.strip()
-            if not line:  # Keep empty lines
-                if current_line:
-                    new_lines.append(current_line)
-                    current_line = ""
-                new_lines.append("")
-                continue
-                
-            # If current line ends with a sentence-ending punctuation, start a new line
-            if current_line and (current_line.endswith('.') or 
-                               current_line.endswith('!') or 
-                               current_line.endswith('?') or
-                               current_line.endswith('。')):  # Chinese period
-                new_lines.append(current_line)
-                current_line = line
-            elif not current_line:  # Start a new paragraph
-                current_line = line
-            else:  # Continue the sentence
-                current_line += " " + line
-        
-        # Add the last line if there's anything left
-        if current_line:
-            new_lines.append(current_line)
-            
-        text = '\n'.join(new_lines)
-    
-    return text
+    with metrics.clean_seconds.time():
+        return get_cleaner(language).clean(text, fix_punctuation=fix_punctuation, fix_layout=fix_layout)
 
 
 def extract_text(image, language="eng"):
@@ -100,15 +95,13 @@ def extract_text(image, language="eng"):
     Extract text from an image using Tesseract OCR.
     
     Args:
-        image: PIL Image object
+        image: PIL Image or numpy array (grayscale or RGB)
         language: Language code for OCR (default: 'eng', also supports 'chi_sim', 'chi_tra', etc.)
         
     Returns:
         Extracted text as string
     """
     try:
-        logger.info("Starting OCR text extraction")
-        
         # Verify language pack is installed
         if not verify_language_pack(language):
             error_msg = (
@@ -116,130 +109,119 @@ def extract_text(image, language="eng"):
                 f"from https://github.com/tesseract-ocr/tessdata and place it in {tessdata_dir}"
             )
             logger.error(error_msg)
-            return f"OCR processing error: {error_msg}"
+            return f"{OCR_ERROR_PREFIX}: {error_msg}"
             
         # Verify we have a valid image
         if image is None:
             raise ValueError("Image is None - cannot perform OCR")
             
-        if not isinstance(image, Image.Image):
-            raise TypeError(f"Expected PIL.Image, got {type(image)}")
+        if not isinstance(image, (Image.Image, np.ndarray)):
+            raise TypeError(f"Expected PIL.Image or numpy array, got {type(image)}")
         
-        # Create a temporary directory for OCR files
-        temp_dir = tempfile.mkdtemp(prefix="ocr_")
-        temp_path = os.path.join(temp_dir, "ocr_image.png")
-        output_base = os.path.join(temp_dir, "ocr_output")
-        output_file = output_base + ".txt"
+        # Configure Tesseract options based on language
+        oem_mode, psm_mode = get_engine_config(language)
         
+        # Use the configured engine (warm in-process API, or the tesseract
+        # binary fed through stdin/stdout). Neither touches the filesystem.
+        engine = get_engine()
+        logger.debug("Running %s engine with language %s (--oem %s --psm %s)", engine.name, language, oem_mode, psm_mode)
         try:
-            # Save the image to the temporary file
-            image.save(temp_path)
-            logger.info(f"Saved temporary image for OCR to {temp_path}")
-            
-            # Log image details
-            width, height = image.size
-            format_info = f"{image.format}" if image.format else "Unknown"
-            logger.info(f"Image info: {width}x{height} {format_info} {image.mode}")
-            
-            # Configure Tesseract options based on language
-            # common PSM modes:
-            # 3 = Fully automatic page segmentation, but no OSD (default)
-            # 6 = Assume a single uniform block of text
-            # 11 = Sparse text - Find as much text as possible in no particular order
-            # 
-            # For Chinese/Japanese text, PSM 6 or 11 often works better
-            psm_mode = 6
-            if language in ["chi_sim", "chi_tra", "jpn", "kor"]:
-                # For Asian languages, try different PSM mode for better results
-                psm_mode = 11
-                
-            custom_config = f'--oem 3 --psm {psm_mode}'
-            
-            logger.info(f"Using language: {language} with config: {custom_config}")
-            
-            # Run OCR in two ways to ensure we get a result
-            
-            # Method 1: Use pytesseract directly with language
-            logger.info(f"Running pytesseract with language: {language}")
-            text = pytesseract.image_to_string(image, lang=language, config=custom_config)
-            
-            # If the result is empty, try direct command line for more debug info
-            if not text.strip():
-                logger.warning(f"No text returned from pytesseract with {language}, trying direct command")
-                
-                # Method 2: Use command line directly for better debug output
-                cmd = [tesseract_cmd, temp_path, output_base, "-l", language, f"--psm", str(psm_mode)]
-                
-                proc = subprocess.run(
-                    cmd, 
-                    stdout=subprocess.PIPE, 
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    check=False
-                )
-                
-                logger.info(f"Tesseract exit code: {proc.returncode}")
-                if proc.stdout:
-                    logger.info(f"Tesseract stdout: {proc.stdout}")
-                if proc.stderr:
-                    logger.warning(f"Tesseract stderr: {proc.stderr}")
-                
-                # Read text from output file if it exists
-                if os.path.exists(output_file):
-                    with open(output_file, 'r') as f:
-                        text = f.read()
-                        logger.info(f"Read {len(text)} characters from direct command output")
-                else:
-                    logger.warning(f"Output file not found: {output_file}")
-        
-        finally:
-            # Clean up temporary files
-            try:
-                if os.path.exists(temp_path):
-                    os.unlink(temp_path)
-                if os.path.exists(output_file):
-                    os.unlink(output_file)
-                # Try to remove temp directory
-                if os.path.exists(temp_dir):
-                    os.rmdir(temp_dir)
-            except Exception as e:
-                logger.warning(f"Error cleaning up temp files: {e}")
+            text = engine.image_to_string(image, language, psm=psm_mode, oem=oem_mode)
+        except EngineError as e:
+            if engine is get_fallback_engine():
+                raise
+            engine = get_fallback_engine()
+            metrics.engine_fallbacks.inc()
+            logger.warning(f"OCR engine failed ({e}), falling back to {engine.name} engine")
+            text = engine.image_to_string(image, language, psm=psm_mode, oem=oem_mode)
         
         # Basic cleaning
         text = text.strip()
         
         if not text:
             logger.warning("No text was extracted from the image")
-            return "No text detected in the image. Try a different preprocessing method or ensure the image contains text."
+            return NO_TEXT_MESSAGE
         
         # Apply our advanced text cleaning (but don't apply layout fixes by default)
         # Layout fixes will be optional via API/button
-        text = clean_text(text, fix_punctuation=True, fix_layout=False)
+        text = clean_text(text, fix_punctuation=True, fix_layout=False, language=language)
         
-        logger.info(f"Successfully extracted {len(text)} characters of text")
+        logger.debug("Extracted %d characters of text", len(text))
         return text
     
     except Exception as e:
         logger.error(f"Error extracting text with OCR: {str(e)}", exc_info=True)
-        return f"OCR processing error: {str(e)}. Please try again with a different image or preprocessing method."
+        return f"{OCR_ERROR_PREFIX}: {str(e)}. Please try again with a different image or preprocessing method."
 
-def get_ocr_info():
-    """Get information about the Tesseract OCR installation."""
-    try:
-        # Run tesseract version command directly
-        result = subprocess.run(
-            [tesseract_cmd, "--version"], 
-            capture_output=True, 
-            text=True,
-            check=False
-        )
+def extract_data(image, language="eng", psm=None):
+    """
+    Extract text with word, line and block boxes and per-word confidences.
+    
+    Everything comes from a single engine pass (Tesseract's TSV output).
+    
+    Args:
+        image: PIL Image or numpy array (grayscale or RGB)
+        language: Language code for OCR
+        psm: Page segmentation mode overriding the language default
         
-        version_info = result.stdout.strip() if result.stdout else "Unknown"
+    Returns:
+        OCRData with the layout columns
+        
+    Raises:
+        ValueError: If the language pack is missing or the image is invalid
+        EngineError: If neither engine can recognize the image
+    """
+    if not verify_language_pack(language):
+        raise ValueError(f"Language pack '{language}' is not installed")
+    
+    if not isinstance(image, (Image.Image, np.ndarray)):
+        raise TypeError(f"Expected PIL.Image or numpy array, got {type(image)}")
+    
+    oem_mode, psm_mode = get_engine_config(language)
+    if psm is not None:
+        psm_mode = psm
+    engine = get_engine()
+    logger.debug("Running %s engine for structured output with language %s", engine.name, language)
+    try:
+        tsv = engine.image_to_tsv(image, language, psm=psm_mode, oem=oem_mode)
+    except EngineError as e:
+        if engine is get_fallback_engine():
+            raise
+        engine = get_fallback_engine()
+        metrics.engine_fallbacks.inc()
+        logger.warning(f"OCR engine failed ({e}), falling back to {engine.name} engine")
+        tsv = engine.image_to_tsv(image, language, psm=psm_mode, oem=oem_mode)
+    
+    data = OCRData.from_tsv(tsv)
+    logger.debug("Extracted %d layout rows", len(data))
+    return data
+
+def layout_text(data, language=None):
+    """
+    Get the cleaned plain text of a structured OCR result.
+    
+    Args:
+        data: OCRData from ``extract_data``
+        language: Language code selecting language-specific cleaning rules
         
+    Returns:
+        Text as returned by ``extract_text``
+    """
+    text = data.text
+    if not text.strip():
+        return NO_TEXT_MESSAGE
+    return clean_text(text, fix_punctuation=True, fix_layout=False, language=language)
+
+def get_ocr_info():
+    """Get information about the Tesseract OCR installation (cached after the first call)."""
+    try:
+        info = language_registry.snapshot()
         return {
-            "tesseract_version": pytesseract.get_tesseract_version(),
+            "tesseract_version": info["tesseract_version"],
             "tesseract_path": pytesseract.pytesseract.tesseract_cmd,
-            "version_details": version_info
+            "version_details": info["version_details"],
+            "engine": info["engine"],
+            "languages": [lang["id"] for lang in info["languages"]],
         }
     except Exception as e:
         logger.error(f"Error getting OCR info: {str(e)}", exc_info=True)
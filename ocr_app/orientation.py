@@ -0,0 +1,224 @@
+import io
+import os
+import logging
+import cv2
+import numpy as np
+from PIL import Image
+
+from .engine import get_engine, get_fallback_engine, EngineError
+from .image_processor import load_image
+from .ocr import language_registry
+from .preprocessing import ROTATIONS, estimate_text_height
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Orientation correction configuration
+# OCR_ORIENTATION: set to 0 to skip orientation and skew correction
+# OCR_ORIENTATION_MAX_DIMENSION: longest side of the downsampled copy the estimate is made on
+# OCR_ORIENTATION_MIN_CONFIDENCE: OSD orientation confidence needed to turn a page
+# OCR_MAX_SKEW: largest skew angle (degrees) that is corrected
+ORIENTATION_ENABLED = os.environ.get("OCR_ORIENTATION", "1").lower() in ("1", "true", "yes")
+ORIENTATION_MAX_DIMENSION = int(os.environ.get("OCR_ORIENTATION_MAX_DIMENSION", 1024))
+ORIENTATION_MIN_CONFIDENCE = float(os.environ.get("OCR_ORIENTATION_MIN_CONFIDENCE", 2.0))
+MAX_SKEW = float(os.environ.get("OCR_MAX_SKEW", 15))
+
+# Skew below this many degrees is left alone, resampling would cost more than it gains
+MIN_SKEW = 0.2
+
+# Line blobs must be this many times longer than they are tall to measure an angle
+MIN_LINE_ASPECT = 5
+
+# Estimate for images that are left as they are
+UPRIGHT = {"rotation": 0, "rotation_confidence": 0.0, "skew": 0.0}
+
+# Reduced decoding modes; JPEG is decoded directly at the reduced size
+REDUCED_GRAYSCALE = {
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+}
+
+
+def _ink(gray):
+    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+
+
+def analysis_image(image, max_dimension=ORIENTATION_MAX_DIMENSION):
+    """
+    Get a grayscale copy of an image no larger than ``max_dimension``.
+
+    Encoded images are decoded at a reduced size where the format allows
+    it, so a large photo is never decoded in full just to be analyzed.
+
+    Args:
+        image: Encoded image bytes, a path to the image file, or a numpy array
+        max_dimension: Longest side of the copy
+
+    Returns:
+        Grayscale numpy array
+    """
+    gray = None
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        try:
+            with Image.open(io.BytesIO(image)) as header:
+                longest = max(header.size)
+        except Exception:
+            longest = 0
+        flags = next(
+            (flags for factor, flags in REDUCED_GRAYSCALE.items() if longest / factor >= max_dimension),
+            cv2.IMREAD_GRAYSCALE
+        )
+        gray = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), flags)
+        if gray is None:
+            raise ValueError("Failed to decode image data with OpenCV")
+    else:
+        gray = load_image(image)
+        if gray.ndim == 3:
+            gray = cv2.cvtColor(gray, cv2.COLOR_BGR2GRAY)
+
+    height, width = gray.shape
+    scale = max_dimension / max(height, width)
+    if scale < 1:
+        gray = cv2.resize(gray, (max(1, int(width * scale)), max(1, int(height * scale))),
+                          interpolation=cv2.INTER_AREA)
+    return gray
+
+
+def detect_rotation(gray, min_confidence=ORIENTATION_MIN_CONFIDENCE):
+    """
+    Find the quarter turn that makes a page upright with Tesseract OSD.
+
+    Args:
+        gray: Grayscale image from ``analysis_image``
+        min_confidence: Orientation confidence needed to report a turn
+
+    Returns:
+        Tuple of (clockwise rotation in degrees, confidence); (0, 0.0) when
+        OSD is unavailable or not sure enough
+    """
+    if not language_registry.is_installed("osd"):
+        return 0, 0.0
+    engine = get_engine()
+    try:
+        osd = engine.detect_orientation_script(gray)
+    except EngineError as e:
+        if engine is get_fallback_engine():
+            logger.debug("Orientation detection failed: %s", e)
+            return 0, 0.0
+        metrics.engine_fallbacks.inc()
+        try:
+            osd = get_fallback_engine().detect_orientation_script(gray)
+        except EngineError as e:
+            logger.debug("Orientation detection failed: %s", e)
+            return 0, 0.0
+
+    confidence = osd["orientation_confidence"]
+    if confidence < min_confidence:
+        return 0, confidence
+    # OSD reports how far the page is turned clockwise; turn it the rest of the way
+    return (360 - osd["orientation"]) % 360, confidence
+
+
+def estimate_skew(gray, max_angle=MAX_SKEW):
+    """
+    Measure the angle of the text lines of an upright page.
+
+    Characters are smeared horizontally into line blobs, and the long side
+    of the minimum-area rectangle around each elongated blob gives that
+    line's angle. The median, weighted by line length, is robust against
+    pictures, rules and stray marks.
+
+    Args:
+        gray: Grayscale image from ``analysis_image``
+        max_angle: Largest angle (degrees) considered a skew
+
+    Returns:
+        Angle in degrees to rotate by (counter-clockwise positive, as for
+        ``cv2.getRotationMatrix2D``), 0.0 when the lines are level or
+        cannot be measured
+    """
+    ink = _ink(gray)
+    text_height = estimate_text_height(ink)
+    if not text_height:
+        return 0.0
+
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (int(text_height * 1.5) | 1, 1))
+    lines = cv2.dilate(ink, kernel)
+    contours = cv2.findContours(lines, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]
+
+    angles = []
+    weights = []
+    for contour in contours:
+        rect = cv2.minAreaRect(contour)
+        length, thickness = max(rect[1]), min(rect[1])
+        if length < 4 * text_height or length < MIN_LINE_ASPECT * max(thickness, 1):
+            continue
+        corners = cv2.boxPoints(rect)
+        edges = (corners[1] - corners[0], corners[2] - corners[1])
+        dx, dy = max(edges, key=lambda edge: edge[0] ** 2 + edge[1] ** 2)
+        angle = np.degrees(np.arctan2(dy, dx))
+        # Direction of the long side does not matter, fold into (-90, 90]
+        if angle > 90:
+            angle -= 180
+        elif angle <= -90:
+            angle += 180
+        if abs(angle) <= max_angle:
+            angles.append(angle)
+            weights.append(length)
+
+    if not angles:
+        return 0.0
+    order = np.argsort(angles)
+    cumulative = np.cumsum(np.asarray(weights)[order])
+    skew = float(np.asarray(angles)[order][np.searchsorted(cumulative, cumulative[-1] / 2)])
+    return skew if abs(skew) >= MIN_SKEW else 0.0
+
+
+def estimate_orientation(image):
+    """
+    Estimate the correction that turns a page upright and levels its lines.
+
+    Both measurements run on one small grayscale copy: OSD decides on
+    quarter turns, then the skew is measured on the turned copy. The result
+    is small and JSON serializable so it can be cached per image and pinned
+    on every preprocessing pass (see ``Pipeline.oriented``).
+
+    Args:
+        image: Encoded image bytes, a path to the image file, or a numpy array
+
+    Returns:
+        Dict with the clockwise ``rotation`` (0, 90, 180 or 270), its
+        ``rotation_confidence`` and the ``skew`` angle in degrees
+    """
+    if not ORIENTATION_ENABLED:
+        return dict(UPRIGHT)
+
+    gray = analysis_image(image)
+    rotation, confidence = detect_rotation(gray)
+    if rotation:
+        gray = cv2.rotate(gray, ROTATIONS[rotation])
+    skew = estimate_skew(gray)
+    if rotation or skew:
+        logger.debug("Estimated orientation: rotate %d, skew %.2f", rotation, skew)
+    return {
+        "rotation": rotation,
+        "rotation_confidence": round(float(confidence), 2),
+        "skew": round(skew, 2),
+    }
+
+
+def orient_pipeline(pipeline, image):
+    """
+    Pin an orientation estimate on ``pipeline`` if its ``orient`` stage needs one.
+
+    Args:
+        pipeline: Pipeline to run
+        image: Decoded image (numpy array) the pipeline will run on
+
+    Returns:
+        Pipeline whose ``rotation`` is known before it runs
+    """
+    if not pipeline.needs_orientation:
+        return pipeline
+    return pipeline.oriented(estimate_orientation(image))
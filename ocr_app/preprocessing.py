@@ -0,0 +1,524 @@
+import os
+import time
+import logging
+import threading
+import cv2
+import numpy as np
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Resolution normalization configuration
+# OCR_TARGET_TEXT_HEIGHT: character height (pixels) the normalize stage rescales text to
+# OCR_MAX_UPSCALE: largest factor small text is enlarged by
+TARGET_TEXT_HEIGHT = int(os.environ.get("OCR_TARGET_TEXT_HEIGHT", 20))
+MAX_UPSCALE = float(os.environ.get("OCR_MAX_UPSCALE", 2))
+
+# Text within this factor of the target height is left at its resolution
+TEXT_HEIGHT_TOLERANCE = 1.25
+
+# Below this height (thumbnail pixels) characters are too coarse to measure,
+# so they are measured again on a native-resolution crop
+MIN_MEASURABLE_HEIGHT = 8
+
+# Kernel of PIL's ImageFilter.SMOOTH, used as the blurred reference for sharpening
+SMOOTH_KERNEL = np.array([[1, 1, 1], [1, 5, 1], [1, 1, 1]], dtype=np.float32) / 13
+
+# Weights of the BGR channels in the luma used for the contrast mean (ITU-R 601-2)
+LUMA_WEIGHTS = (0.114, 0.587, 0.299)
+
+
+# Scratch buffers of the pipeline running on the current thread, if any
+_running = threading.local()
+
+
+def _scratch(shape, dtype, *live):
+    # Output array for a stage that cannot write over its input: a scratch
+    # buffer of the running pipeline, or None to let OpenCV allocate
+    buffers = getattr(_running, "scratch", None)
+    if buffers is None:
+        return None
+    return buffers.get(shape, dtype, live)
+
+
+def _gray(image):
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=_scratch(image.shape[:2], image.dtype, image))
+
+
+def _dst(image, owned, *live):
+    # Stages write over the previous stage's output when it belongs to the
+    # pipeline, and into a scratch buffer when it is the caller's array
+    return image if owned else _scratch(image.shape, image.dtype, image, *live)
+
+
+def _resized(image, size, interpolation):
+    width, height = size
+    dst = _scratch((height, width) + image.shape[2:], image.dtype, image)
+    return cv2.resize(image, size, dst=dst, interpolation=interpolation)
+
+
+def estimate_text_height(ink):
+    """
+    Estimate the typical character height of a binarized image.
+
+    Args:
+        ink: Binary image with text as non-zero pixels
+
+    Returns:
+        Median height in pixels of character-sized connected components,
+        or 0 when there are none
+    """
+    stats = cv2.connectedComponentsWithStats(ink, connectivity=8)[2][1:]
+    heights = stats[:, cv2.CC_STAT_HEIGHT]
+    widths = stats[:, cv2.CC_STAT_WIDTH]
+    # Ignore specks and rules/frames that span a large part of the image
+    keep = (heights >= 4) & (heights < ink.shape[0] / 4) & (widths < ink.shape[1] / 4)
+    return float(np.median(heights[keep])) if keep.any() else 0.0
+
+
+def _ink(gray):
+    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+
+
+def measure_text_height(image, analysis_size=1024):
+    """
+    Measure the character height of an image without processing it at full size.
+
+    Characters are measured on a thumbnail. When they are too small there
+    to measure reliably, they are measured again on a native-resolution
+    crop around the densest ink of the thumbnail.
+
+    Args:
+        image: OpenCV image (numpy array)
+        analysis_size: Longest side of the thumbnail
+
+    Returns:
+        Character height in native pixels, or 0 when no text was found
+    """
+    gray = _gray(image)
+    height, width = gray.shape
+    scale = min(1.0, analysis_size / max(height, width))
+    if scale == 1.0:
+        return estimate_text_height(_ink(gray))
+
+    thumbnail = cv2.resize(gray, (max(1, int(width * scale)), max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    ink = _ink(thumbnail)
+    text_height = estimate_text_height(ink)
+    if text_height >= MIN_MEASURABLE_HEIGHT:
+        return text_height / scale
+
+    # Centre the crop on the row and column with the most ink
+    crop = analysis_size // 2
+    cy = int(np.argmax(ink.sum(axis=1, dtype=np.int64)) / scale)
+    cx = int(np.argmax(ink.sum(axis=0, dtype=np.int64)) / scale)
+    y0 = min(max(0, cy - crop), max(0, height - 2 * crop))
+    x0 = min(max(0, cx - crop), max(0, width - 2 * crop))
+    return estimate_text_height(_ink(gray[y0:y0 + 2 * crop, x0:x0 + 2 * crop]))
+
+
+def resize(image, owned, max_dimension=2000):
+    """Downscale so the longest side is at most ``max_dimension`` pixels."""
+    height, width = image.shape[:2]
+    if max(height, width) <= max_dimension:
+        return image
+    scale = max_dimension / max(height, width)
+    size = (int(width * scale), int(height * scale))
+    logger.debug("Resized image to: %dx%d", size[0], size[1])
+    return _resized(image, size, cv2.INTER_AREA)
+
+
+def normalize(image, owned, text_height=TARGET_TEXT_HEIGHT, max_upscale=MAX_UPSCALE,
+              max_dimension=2000):
+    """
+    Rescale so characters are about ``text_height`` pixels tall.
+
+    Oversized photos and scans are shrunk to the smallest size Tesseract
+    reads accurately, and small screenshots are enlarged up to
+    ``max_upscale`` times. Images without measurable text fall back to
+    ``resize`` with ``max_dimension``.
+    """
+    measured = measure_text_height(image)
+    if not measured:
+        return resize(image, owned, max_dimension)
+
+    scale = float(text_height) / measured
+    if 1 / TEXT_HEIGHT_TOLERANCE <= scale <= TEXT_HEIGHT_TOLERANCE:
+        return image
+    scale = min(scale, float(max_upscale))
+    height, width = image.shape[:2]
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    logger.debug(
+        "Normalized text height %.1fpx to %.1fpx: %dx%d -> %dx%d",
+        measured, measured * scale, width, height, size[0], size[1]
+    )
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+    return _resized(image, size, interpolation)
+
+
+def grayscale(image, owned):
+    """Convert to a single channel."""
+    return _gray(image)
+
+
+def blur(image, owned, ksize=5):
+    """Gaussian blur to reduce noise."""
+    ksize = int(ksize) | 1
+    return cv2.GaussianBlur(image, (ksize, ksize), 0, dst=_dst(image, owned))
+
+
+def otsu(image, owned):
+    """Binary threshold with the level picked by Otsu's method."""
+    gray = _gray(image)
+    owned = owned or gray is not image
+    return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=_dst(gray, owned))[1]
+
+
+def adaptive(image, owned, block_size=11, c=2):
+    """Gaussian adaptive threshold, robust to uneven lighting."""
+    gray = _gray(image)
+    owned = owned or gray is not image
+    return cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+        int(block_size) | 1, float(c), dst=_dst(gray, owned)
+    )
+
+
+def denoise(image, owned, h=10, template_size=7, search_size=21):
+    """Non-local means denoising."""
+    dst = _scratch(image.shape, image.dtype, image)
+    if image.ndim == 2:
+        return cv2.fastNlMeansDenoising(image, dst, float(h), int(template_size), int(search_size))
+    return cv2.fastNlMeansDenoisingColored(
+        image, dst, float(h), float(h), int(template_size), int(search_size)
+    )
+
+
+def contrast(image, owned, factor=1.5):
+    """
+    Scale pixel values away from the mean luminance.
+
+    Equivalent to ``PIL.ImageEnhance.Contrast``: ``mean + factor * (image - mean)``.
+    """
+    factor = float(factor)
+    means = cv2.mean(image)
+    if image.ndim == 2:
+        mean = means[0]
+    else:
+        mean = sum(weight * value for weight, value in zip(LUMA_WEIGHTS, means))
+    mean = int(mean + 0.5)
+    return cv2.addWeighted(image, factor, image, 0, mean * (1 - factor), dst=_dst(image, owned))
+
+
+def sharpen(image, owned, factor=1.5):
+    """
+    Blend the image away from a smoothed copy of itself.
+
+    Equivalent to ``PIL.ImageEnhance.Sharpness``: ``smooth + factor * (image - smooth)``.
+    """
+    factor = float(factor)
+    smooth = cv2.filter2D(image, -1, SMOOTH_KERNEL, dst=_scratch(image.shape, image.dtype, image))
+    return cv2.addWeighted(image, factor, smooth, 1 - factor, 0, dst=_dst(image, owned, smooth))
+
+
+def deskew(image, owned, max_angle=15):
+    """Rotate the text lines level, using the minimum-area box around the ink."""
+    gray = _gray(image)
+    ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+    points = cv2.findNonZero(ink)
+    if points is None:
+        return image
+
+    angle = cv2.minAreaRect(points)[2]
+    # minAreaRect reports angles in [0, 90); map to the smallest correction
+    if angle > 45:
+        angle -= 90
+    if abs(angle) < 0.1 or abs(angle) > float(max_angle):
+        return image
+
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    logger.debug("Deskewing image by %.2f degrees", angle)
+    return cv2.warpAffine(
+        image, matrix, (width, height), dst=_scratch(image.shape, image.dtype, image),
+        flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE
+    )
+
+
+# cv2.rotate codes for clockwise quarter turns
+ROTATIONS = {
+    90: cv2.ROTATE_90_CLOCKWISE,
+    180: cv2.ROTATE_180,
+    270: cv2.ROTATE_90_COUNTERCLOCKWISE,
+}
+
+
+def orient(image, owned, rotation=None, skew=None):
+    """
+    Turn the page upright and rotate its text lines level.
+
+    ``rotation`` is the clockwise quarter turn (0, 90, 180 or 270) and
+    ``skew`` the angle in degrees, normally pinned from an estimate cached
+    per image (see ``Pipeline.oriented``). Without them the image is
+    analyzed here first.
+    """
+    if rotation is None or skew is None:
+        # Imported here because the orientation module builds on this one
+        from .orientation import estimate_orientation
+        estimate = estimate_orientation(image)
+        rotation, skew = estimate["rotation"], estimate["skew"]
+
+    rotation = int(rotation) % 360
+    if rotation in ROTATIONS:
+        logger.debug("Rotating image %d degrees clockwise", rotation)
+        shape = image.shape if rotation == 180 else (image.shape[1], image.shape[0]) + image.shape[2:]
+        image = cv2.rotate(image, ROTATIONS[rotation], dst=_scratch(shape, image.dtype, image))
+    skew = float(skew)
+    if not skew:
+        return image
+
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), skew, 1.0)
+    logger.debug("Deskewing image by %.2f degrees", skew)
+    return cv2.warpAffine(
+        image, matrix, (width, height), dst=_scratch(image.shape, image.dtype, image),
+        flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE
+    )
+
+
+# Available stages: name -> function(image, owned, **params)
+STAGES = {
+    "resize": resize,
+    "normalize": normalize,
+    "grayscale": grayscale,
+    "blur": blur,
+    "otsu": otsu,
+    "adaptive": adaptive,
+    "denoise": denoise,
+    "contrast": contrast,
+    "sharpen": sharpen,
+    "deskew": deskew,
+    "orient": orient,
+}
+
+# Named stage chains for the original preprocessing types
+PRESETS = {
+    "default": "resize,contrast:factor=1.5,sharpen:factor=1.5",
+    "grayscale": "resize,grayscale",
+    "threshold": "resize,grayscale,blur:ksize=5,otsu",
+    "adaptive": "resize,grayscale,blur:ksize=5,adaptive:block_size=11:c=2",
+    "denoise": "resize,grayscale,denoise",
+    # The same chains, rescaled to the target text height instead of a fixed size
+    "default-normalized": "normalize,contrast:factor=1.5,sharpen:factor=1.5",
+    "grayscale-normalized": "normalize,grayscale",
+    "threshold-normalized": "normalize,grayscale,blur:ksize=5,otsu",
+    "adaptive-normalized": "normalize,grayscale,blur:ksize=5,adaptive:block_size=11:c=2",
+    "denoise-normalized": "normalize,grayscale,denoise",
+}
+
+
+class Param:
+    """
+    Type and range of a stage parameter, checked when a stage chain is parsed.
+
+    Args:
+        kind: int or float
+        low: Smallest accepted value
+        high: Largest accepted value
+        odd: Only accept odd values (kernel and window sizes)
+        choices: Accepted values, instead of a range
+    """
+
+    def __init__(self, kind, low=None, high=None, odd=False, choices=None):
+        self.kind = kind
+        self.low = low
+        self.high = high
+        self.odd = odd
+        self.choices = choices
+
+    def describe(self):
+        kind = "an integer" if self.kind is int else "a number"
+        if self.choices:
+            return f"one of {', '.join(str(choice) for choice in self.choices)}"
+        if self.odd:
+            kind = "an odd integer"
+        return f"{kind} from {self.low:g} to {self.high:g}"
+
+    def parse(self, value):
+        """Convert a parameter value, or raise ValueError if it is not accepted."""
+        try:
+            parsed = self.kind(value)
+        except ValueError:
+            raise ValueError(f"must be {self.describe()}")
+        if self.choices:
+            valid = parsed in self.choices
+        else:
+            valid = self.low <= parsed <= self.high and (not self.odd or parsed % 2 == 1)
+        if not valid or parsed != parsed:
+            raise ValueError(f"must be {self.describe()}")
+        return parsed
+
+
+# Parameters each stage accepts in a custom chain. Ranges keep a chain from
+# producing huge images (the pixel budget only counts decoded uploads) or
+# feeding OpenCV arguments that fail inside the worker
+STAGE_PARAMS = {
+    "resize": {"max_dimension": Param(int, 64, 10000)},
+    "normalize": {
+        "text_height": Param(int, 8, 100),
+        "max_upscale": Param(float, 1, 4),
+        "max_dimension": Param(int, 64, 10000),
+    },
+    "grayscale": {},
+    "blur": {"ksize": Param(int, 1, 31, odd=True)},
+    "otsu": {},
+    "adaptive": {"block_size": Param(int, 3, 99, odd=True), "c": Param(float, -50, 50)},
+    "denoise": {
+        "h": Param(float, 0, 100),
+        "template_size": Param(int, 3, 21, odd=True),
+        "search_size": Param(int, 3, 35, odd=True),
+    },
+    "contrast": {"factor": Param(float, 0, 5)},
+    "sharpen": {"factor": Param(float, 0, 5)},
+    "deskew": {"max_angle": Param(float, 0, 45)},
+    "orient": {"rotation": Param(int, choices=(0, 90, 180, 270)), "skew": Param(float, -90, 90)},
+}
+
+
+class Pipeline:
+    """
+    An ordered chain of preprocessing stages.
+
+    Stages run on OpenCV arrays (BGR or single channel). Each stage writes
+    over the previous stage's output where OpenCV allows it, so a chain
+    allocates roughly one buffer per change of shape or channel count
+    instead of one per stage. Given scratch buffers, stages write there
+    instead and a chain allocates nothing in the common case.
+    """
+
+    def __init__(self, stages, name=None):
+        self.stages = stages
+        self.spec = ",".join(
+            ":".join([stage, *(f"{key}={value}" for key, value in params.items())])
+            for stage, params in stages
+        )
+        self.name = name or self.spec
+
+    @property
+    def is_preset(self):
+        return self.name in PRESETS
+
+    def without(self, *names):
+        """Return a copy of this pipeline without the given stages."""
+        return Pipeline([(stage, params) for stage, params in self.stages if stage not in names])
+
+    @property
+    def needs_orientation(self):
+        """Whether an ``orient`` stage still has to analyze the image itself."""
+        return any(stage == "orient" and not params for stage, params in self.stages)
+
+    @property
+    def rotation(self):
+        """Clockwise quarter turn pinned on the ``orient`` stage (0 when none)."""
+        for stage, params in self.stages:
+            if stage == "orient":
+                return int(params.get("rotation", 0)) % 360
+        return 0
+
+    def oriented(self, orientation):
+        """
+        Return a copy with an orientation estimate pinned on its ``orient`` stage.
+
+        Args:
+            orientation: Dict with ``rotation`` and ``skew`` from
+                ``estimate_orientation``, or None to leave the pipeline as is
+
+        Returns:
+            Pipeline with the same name
+        """
+        if orientation is None or not any(stage == "orient" for stage, _ in self.stages):
+            return self
+        pinned = {"rotation": orientation["rotation"], "skew": orientation["skew"]}
+        return Pipeline(
+            [(stage, pinned if stage == "orient" else params) for stage, params in self.stages],
+            self.name
+        )
+
+    def run(self, image, debug=None, owned=False, scratch=None):
+        """
+        Run every stage over ``image``.
+
+        Args:
+            image: OpenCV image (numpy array)
+            debug: Optional debug session receiving each stage's output
+            owned: Whether the caller hands ``image`` over, so stages may
+                write over it; otherwise it is left unmodified
+            scratch: Optional ScratchBuffers for stage outputs; the result
+                may then live in them and must be used before they are
+                handed out again
+
+        Returns:
+            numpy array (grayscale or BGR)
+        """
+        previous = getattr(_running, "scratch", None)
+        _running.scratch = scratch
+        try:
+            for index, (stage, params) in enumerate(self.stages, start=1):
+                start = time.perf_counter()
+                result = STAGES[stage](image, owned, **params)
+                metrics.preprocess_stage_seconds.labels(stage).observe(time.perf_counter() - start)
+                owned = owned or result is not image
+                image = result
+                if debug:
+                    debug.save(f"{index:02d}_{stage}", image)
+        finally:
+            _running.scratch = previous
+        return image
+
+
+def parse_pipeline(spec):
+    """
+    Parse a preset name or a custom stage chain.
+
+    Custom chains are comma-separated stage names with optional
+    colon-separated parameters, e.g. ``grayscale,blur:ksize=3,otsu``.
+
+    Args:
+        spec: Preset name, stage chain, or an existing Pipeline
+
+    Returns:
+        Pipeline
+
+    Raises:
+        ValueError: If a stage or parameter is unknown, or a parameter value
+            is of the wrong type or out of range
+    """
+    if isinstance(spec, Pipeline):
+        return spec
+    spec = (spec or "default").strip()
+    name = spec if spec in PRESETS else None
+    if name:
+        spec = PRESETS[name]
+
+    stages = []
+    for part in spec.split(","):
+        stage, *params = [token.strip() for token in part.split(":")]
+        if stage not in STAGES:
+            raise ValueError(
+                f"Unknown preprocessing stage '{stage}'. "
+                f"Available presets: {', '.join(PRESETS)}; stages: {', '.join(STAGES)}"
+            )
+        arguments = STAGE_PARAMS[stage]
+        values = {}
+        for param in params:
+            key, _, value = param.partition("=")
+            if key not in arguments or not value:
+                raise ValueError(f"Invalid parameter '{param}' for stage '{stage}'")
+            try:
+                values[key] = arguments[key].parse(value)
+            except ValueError as e:
+                raise ValueError(f"Invalid value '{value}' for parameter '{key}' of stage '{stage}': {e}")
+        stages.append((stage, values))
+    return Pipeline(stages, name)
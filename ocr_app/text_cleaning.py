@@ -0,0 +1,305 @@
+import re
+import time
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Punctuation Tesseract tends to separate from the preceding word
+SPACED_PUNCTUATION = ",.:;!?"
+
+# Standalone 1s that are really periods, and spaces before punctuation, in
+# one pass. The lookahead sees whether the space after a "1" is itself
+# followed by punctuation, so it is removed like any other such space.
+PUNCTUATION_PATTERN = re.compile(
+    rf"(\s)1(\s)(?=([{SPACED_PUNCTUATION}])|)|( )([{SPACED_PUNCTUATION}])"
+)
+
+# Unicode ranges of Han, kana and CJK compatibility ideographs, and of
+# CJK and full-width punctuation
+CJK_CHARACTERS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+CJK_PUNCTUATION = "\u3000-\u303f\uff00-\uffef"
+
+# ASCII punctuation following a CJK character becomes its full-width form
+FULL_WIDTH = str.maketrans(",.:;!?", "，。：；！？")
+
+
+def _fix_punctuation(match):
+    if match.group(4):
+        return match.group(5)
+    before, after, punctuation = match.group(1, 2, 3)
+    return (
+        ("" if before == " " else before)
+        + "."
+        + ("" if after == " " and punctuation else after)
+    )
+
+
+class TextRules:
+    """
+    Language-specific cleaning rules.
+
+    Args:
+        pattern: Optional regex applied to each line after the punctuation fixes
+        replace: Replacement string or function for ``pattern`` matches
+        sentence_endings: Characters that end a sentence when fixing layout
+        glue: Function (previous line, next line) -> separator used when a
+            sentence broken across lines is joined back together
+    """
+
+    def __init__(self, pattern=None, replace="", sentence_endings=".!?。", glue=None):
+        self.pattern = re.compile(pattern) if isinstance(pattern, str) else pattern
+        self.replace = replace
+        self.sentence_endings = tuple(sentence_endings)
+        self.glue = glue or (lambda previous, line: " ")
+
+    def apply(self, text):
+        if self.pattern is None:
+            return text
+        return self.pattern.sub(self.replace, text)
+
+
+def _cjk_replace(match):
+    punctuation = match.group(1)
+    return punctuation.translate(FULL_WIDTH) if punctuation else ""
+
+
+def _cjk_glue(previous, line):
+    # Chinese and Japanese do not separate words with spaces
+    return "" if _CJK_CHARACTER.match(previous[-1]) and _CJK_CHARACTER.match(line[0]) else " "
+
+
+_CJK_CHARACTER = re.compile(f"[{CJK_CHARACTERS}{CJK_PUNCTUATION}]")
+
+DEFAULT_RULES = TextRules()
+
+CJK_RULES = TextRules(
+    # Spaces Tesseract puts between CJK characters, and ASCII punctuation after them
+    pattern=(
+        rf"(?<=[{CJK_CHARACTERS}])[ \t]+(?=[{CJK_CHARACTERS}{CJK_PUNCTUATION}])"
+        rf"|(?<=[{CJK_PUNCTUATION}])[ \t]+(?=[{CJK_CHARACTERS}])"
+        rf"|(?<=[{CJK_CHARACTERS}][{SPACED_PUNCTUATION}])[ \t]+(?=[{CJK_CHARACTERS}])"
+        rf"|(?<=[{CJK_CHARACTERS}])([{SPACED_PUNCTUATION}])"
+    ),
+    replace=_cjk_replace,
+    sentence_endings=".!?。！？",
+    glue=_cjk_glue,
+)
+
+# Rules by language code; languages without an entry use DEFAULT_RULES
+LANGUAGE_RULES = {
+    "chi_sim": CJK_RULES,
+    "chi_sim_vert": CJK_RULES,
+    "chi_tra": CJK_RULES,
+    "chi_tra_vert": CJK_RULES,
+    "jpn": CJK_RULES,
+    "jpn_vert": CJK_RULES,
+}
+
+
+def register_rules(language, rules):
+    """
+    Use custom cleaning rules for a language.
+
+    Args:
+        language: Language code, e.g. 'tha'
+        rules: TextRules instance
+    """
+    LANGUAGE_RULES[language] = rules
+    get_cleaner.cache_clear()
+
+
+class TextCleaner:
+    """
+    Cleans OCR text for one language.
+
+    Punctuation fixes run as a single precompiled regex pass and layout
+    fixes assemble lines with ``join``, so cleaning is linear in the size of
+    the text. ``clean_lines`` does the same work incrementally on a stream
+    of lines.
+    """
+
+    def __init__(self, rules=DEFAULT_RULES):
+        self.rules = rules
+
+    def fix_punctuation(self, text):
+        """Fix punctuation and apply the language rules to a block of text."""
+        return self.rules.apply(PUNCTUATION_PATTERN.sub(_fix_punctuation, text))
+
+    def _fix_line(self, line, after_newline, before_newline):
+        # The punctuation pattern treats line breaks as whitespace, so the
+        # line is padded with the newlines around it and they are stripped
+        # again; a newline consumed by a match on the previous line is not
+        # available to this one
+        start = "\n" if after_newline else ""
+        end = "\n" if before_newline else ""
+        state = {"consumed": False}
+
+        def replace(match):
+            if end and match.end(2) == len(start) + len(line) + 1:
+                state["consumed"] = True
+            return _fix_punctuation(match)
+
+        fixed = PUNCTUATION_PATTERN.sub(replace, start + line + end)
+        fixed = fixed[len(start):len(fixed) - len(end)]
+        return self.rules.apply(fixed), state["consumed"]
+
+    def join_paragraphs(self, lines):
+        """
+        Join sentences that were broken across lines.
+
+        Args:
+            lines: Iterable of lines
+
+        Yields:
+            Output lines; blank lines are kept as paragraph breaks
+        """
+        endings = self.rules.sentence_endings
+        glue = self.rules.glue
+        parts = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                if parts:
+                    yield "".join(parts)
+                    parts = []
+                yield ""
+                continue
+            if parts:
+                if parts[-1].endswith(endings):
+                    yield "".join(parts)
+                    parts = [line]
+                else:
+                    parts.append(glue(parts[-1], line))
+                    parts.append(line)
+            else:
+                parts.append(line)
+        if parts:
+            yield "".join(parts)
+
+    def clean(self, text, fix_punctuation=True, fix_layout=True):
+        """
+        Clean a complete text.
+
+        Args:
+            text: The raw text from OCR
+            fix_punctuation: Whether to fix common punctuation errors
+            fix_layout: Whether to fix layout issues (sentence breaks, etc.)
+
+        Returns:
+            Cleaned text
+        """
+        if not text:
+            return text
+        if fix_punctuation:
+            text = self.fix_punctuation(text)
+        if fix_layout:
+            text = "\n".join(self.join_paragraphs(text.split("\n")))
+        return text
+
+    def clean_lines(self, lines, fix_punctuation=True, fix_layout=True):
+        """
+        Clean a stream of lines, e.g. the pages of a document as they are OCRed.
+
+        Gives the same result as ``clean`` on the joined text while holding
+        only the current paragraph in memory.
+
+        Args:
+            lines: Iterable of lines without trailing newlines
+            fix_punctuation: Whether to fix common punctuation errors
+            fix_layout: Whether to fix layout issues (sentence breaks, etc.)
+
+        Yields:
+            Cleaned lines
+        """
+        if fix_punctuation:
+            lines = self._fix_lines(lines)
+        if fix_layout:
+            lines = self.join_paragraphs(lines)
+        yield from lines
+
+    def _fix_lines(self, lines):
+        # Each line is fixed once the next one is known, since a "1" at its
+        # end is only a period when another line follows
+        lines = iter(lines)
+        previous = next(lines, None)
+        if previous is None:
+            return
+        after_newline = False
+        for line in lines:
+            fixed, consumed = self._fix_line(previous, after_newline, True)
+            yield fixed
+            after_newline = not consumed
+            previous = line
+        yield self._fix_line(previous, after_newline, False)[0]
+
+
+@lru_cache(maxsize=None)
+def get_cleaner(language=None):
+    """
+    Get the text cleaner for a language.
+
+    Args:
+        language: Language code, or None for the default rules. Combined
+            codes such as 'chi_sim+eng' use the rules of the first language
+            that has any.
+
+    Returns:
+        TextCleaner
+    """
+    for code in (language or "").split("+"):
+        if code in LANGUAGE_RULES:
+            return TextCleaner(LANGUAGE_RULES[code])
+    return TextCleaner(DEFAULT_RULES)
+
+
+def _sample_text(language, size):
+    if language in LANGUAGE_RULES:
+        line = "我 是 中 国 人 , 今 天 天 气 很 好 . 这 是 第 1 行 文 字 :"
+    else:
+        line = "The quick brown fox jumps over the lazy dog , twice 1 Then it rests ; it"
+    lines = []
+    length = 0
+    while length < size:
+        lines.append(line if len(lines) % 8 else "")
+        length += len(line.encode("utf-8")) + 1
+    return "\n".join(lines)
+
+
+def benchmark(languages=("eng", "chi_sim"), size=4 * 1024 * 1024, repeat=3):
+    """
+    Measure cleaning throughput on synthetic OCR output.
+
+    Args:
+        languages: Language codes to benchmark
+        size: Approximate size of the sample text in bytes
+        repeat: Runs per measurement; the fastest is reported
+
+    Returns:
+        List of dicts with the ``language``, ``mode`` and ``mb_per_s``
+    """
+    results = []
+    for language in languages:
+        text = _sample_text(language, size)
+        megabytes = len(text.encode("utf-8")) / (1024 * 1024)
+        cleaner = get_cleaner(language)
+        modes = {
+            "punctuation": lambda: cleaner.clean(text, fix_punctuation=True, fix_layout=False),
+            "full": lambda: cleaner.clean(text),
+            "stream": lambda: sum(1 for _ in cleaner.clean_lines(text.split("\n"))),
+        }
+        for mode, run in modes.items():
+            best = min(_timed(run) for _ in range(repeat))
+            results.append({"language": language, "mode": mode, "mb_per_s": round(megabytes / best, 1)})
+    return results
+
+
+def _timed(run):
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    for result in benchmark():
+        print(f"{result['language']:>8} {result['mode']:>12}: {result['mb_per_s']:8.1f} MB/s")
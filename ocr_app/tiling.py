@@ -0,0 +1,309 @@
+import io
+import os
+import logging
+import cv2
+import numpy as np
+from PIL import Image
+
+from .image_processor import load_image
+from .preprocessing import parse_pipeline, estimate_text_height, orient
+from .ocr import OCR_ERROR_PREFIX, NO_TEXT_MESSAGE, layout_text
+from .workers import run_ocr_pipeline, run_ocr_data_pipeline
+from .layout import OCRData
+from .batch import stream_batch, submit_when_ready
+from .adaptive import ocr_auto, AUTO
+from .orientation import estimate_orientation
+
+logger = logging.getLogger(__name__)
+
+# Tiled OCR configuration
+# OCR_TILED_MIN_PIXELS: images with more pixels than this are OCRed in tiles automatically (0 = only on request)
+# OCR_TILE_ANALYSIS_SIZE: longest side of the downscaled copy used to find text blocks
+# OCR_TILE_MAX_HEIGHT: taller text blocks are split at blank rows into strips of at most this height
+TILED_MIN_PIXELS = int(os.environ.get("OCR_TILED_MIN_PIXELS", 0))
+TILE_ANALYSIS_SIZE = int(os.environ.get("OCR_TILE_ANALYSIS_SIZE", 1600))
+TILE_MAX_HEIGHT = int(os.environ.get("OCR_TILE_MAX_HEIGHT", 1200))
+
+# Pixels of margin kept around each block at native resolution
+TILE_PADDING = 8
+
+
+def should_tile(data, requested=False, min_pixels=TILED_MIN_PIXELS):
+    """
+    Decide whether an image is OCRed in tiles.
+
+    Only the image header is read to get its dimensions.
+
+    Args:
+        data: Encoded image bytes
+        requested: Whether the client asked for tiled OCR
+        min_pixels: Pixel count above which tiling is used automatically
+
+    Returns:
+        True to OCR the image in tiles
+    """
+    if requested:
+        return True
+    if min_pixels <= 0:
+        return False
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+    except Exception:
+        return False
+    return width * height > min_pixels
+
+
+def _split_tall_block(ink, x, y, w, h, max_height):
+    # Cut at the emptiest rows, so strips end between text lines
+    if h <= max_height:
+        return [(x, y, w, h)]
+    profile = ink[y:y + h, x:x + w].sum(axis=1)
+    strips = []
+    top = 0
+    while h - top > max_height:
+        window = profile[top + max_height // 2:top + max_height]
+        cut = top + max_height // 2 + int(np.argmin(window))
+        strips.append((x, y + top, w, cut - top))
+        top = cut
+    strips.append((x, y + top, w, h - top))
+    return strips
+
+
+def reading_order(boxes):
+    """
+    Sort boxes top-to-bottom, and left-to-right within a row.
+
+    Boxes whose vertical extents overlap by more than half of the shorter
+    one are treated as the same row.
+
+    Args:
+        boxes: List of (x, y, w, h)
+
+    Returns:
+        The boxes in reading order
+    """
+    rows = []
+    for box in sorted(boxes, key=lambda box: box[1]):
+        x, y, w, h = box
+        if rows:
+            row = rows[-1]
+            row_top = min(b[1] for b in row)
+            row_bottom = max(b[1] + b[3] for b in row)
+            overlap = min(row_bottom, y + h) - max(row_top, y)
+            if overlap > 0.5 * min(h, row_bottom - row_top):
+                row.append(box)
+                continue
+        rows.append([box])
+    return [box for row in rows for box in sorted(row, key=lambda box: box[0])]
+
+
+def analyze_text_layout(image, analysis_size=TILE_ANALYSIS_SIZE, max_height=TILE_MAX_HEIGHT):
+    """
+    Locate text blocks in an image and estimate its character height.
+
+    The image is binarized on a downscaled copy and dilated so that the
+    characters of a paragraph merge into one connected component. The
+    kernels scale with the character height, so word gaps and line gaps
+    are bridged for small and large print alike. The component bounding
+    boxes are mapped back to native resolution.
+
+    Args:
+        image: OpenCV image (numpy array)
+        analysis_size: Longest side of the copy used for detection
+        max_height: Maximum block height at native resolution
+
+    Returns:
+        Tuple of (list of (x, y, w, h) boxes at native resolution in reading
+        order, character height in native pixels)
+    """
+    height, width = image.shape[:2]
+    scale = min(1.0, analysis_size / max(height, width))
+    small = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if scale < 1.0:
+        small = cv2.resize(small, (max(1, int(width * scale)), max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+
+    ink = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+    text_height = estimate_text_height(ink)
+    # Wide kernel joins characters into lines, the tall one joins lines into blocks
+    span = max(9, int(text_height * 0.8))
+    merged = cv2.dilate(ink, cv2.getStructuringElement(cv2.MORPH_RECT, (span, 3)))
+    merged = cv2.morphologyEx(merged, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (3, span)))
+    contours = cv2.findContours(merged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]
+
+    ink = ink > 0
+    small_max_height = max(2, int(max_height * scale))
+    boxes = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        # Specks smaller than a character at analysis scale
+        if w < 4 or h < 4:
+            continue
+        for sx, sy, sw, sh in _split_tall_block(ink, x, y, w, h, small_max_height):
+            x0 = max(0, int(sx / scale) - TILE_PADDING)
+            y0 = max(0, int(sy / scale) - TILE_PADDING)
+            x1 = min(width, int((sx + sw) / scale) + TILE_PADDING)
+            y1 = min(height, int((sy + sh) / scale) + TILE_PADDING)
+            boxes.append((x0, y0, x1 - x0, y1 - y0))
+
+    logger.debug("Found %d text blocks in %dx%d image", len(boxes), width, height)
+    return reading_order(boxes), text_height / scale
+
+
+def find_text_blocks(image, analysis_size=TILE_ANALYSIS_SIZE, max_height=TILE_MAX_HEIGHT):
+    """
+    Locate text blocks in an image.
+
+    Args:
+        image: OpenCV image (numpy array)
+        analysis_size: Longest side of the copy used for detection
+        max_height: Maximum block height at native resolution
+
+    Returns:
+        List of (x, y, w, h) boxes at native resolution, in reading order
+    """
+    return analyze_text_layout(image, analysis_size, max_height)[0]
+
+
+def split_into_tiles(image, orientation=None, estimate=False):
+    """
+    Decode an image, turn it upright and cut it into text block tiles.
+
+    Runs on an OCR worker; the tiles are views into the decoded image.
+
+    Args:
+        image: Encoded image bytes, a path to the image file, or a numpy array
+        orientation: Estimate from ``estimate_orientation`` to apply before
+            cutting, or None to keep the image as it is
+        estimate: Estimate the orientation here when none is given
+
+    Returns:
+        List of ((x, y, w, h), tile array) in reading order
+    """
+    image = load_image(image)
+    if orientation is None and estimate:
+        orientation = estimate_orientation(image)
+    if orientation:
+        image = orient(image, False, orientation["rotation"], orientation["skew"])
+    return [
+        (box, image[box[1]:box[1] + box[3], box[0]:box[0] + box[2]])
+        for box in find_text_blocks(image)
+    ]
+
+
+def join_blocks(texts):
+    """
+    Stitch the texts of blocks in reading order into the text of the page.
+
+    Args:
+        texts: Block texts in reading order
+
+    Returns:
+        Page text; the first OCR error when a block failed
+    """
+    joined = []
+    for text in texts:
+        if text.startswith(OCR_ERROR_PREFIX):
+            return text
+        if text != NO_TEXT_MESSAGE:
+            joined.append(text)
+    return "\n\n".join(joined) if joined else NO_TEXT_MESSAGE
+
+
+async def iter_tiled(pool, image, preprocess_type="default", language="eng", structured=False,
+                     orientation=None):
+    """
+    OCR a large image block by block, yielding each block as it completes.
+
+    The first item is ``{"event": "layout", "boxes": [...]}`` with the
+    (x, y, width, height) of every block in reading order. Each block then
+    yields a ``stream_batch`` result whose ``index`` refers to ``boxes``,
+    in completion order rather than reading order, and the batch's
+    ``{"event": "done", ...}`` summary comes last.
+
+    The tiles share the memory of the decoded image (or, in process and
+    remote mode, copies of it held here), so the whole image's pixels stay
+    reserved in the pool's budget until the last block is done and the
+    block jobs run under that reservation.
+
+    Args:
+        pool: OCRWorkerPool to run on
+        image: Encoded image bytes or a numpy array
+        preprocess_type: Preset name, custom stage chain, or 'auto' to pick
+            the preprocessing per block
+        language: Language code for OCR
+        structured: Produce OCRData per block instead of plain text
+        orientation: Orientation estimate for the image; the whole image is
+            turned upright before it is cut into blocks
+
+    Yields:
+        The layout event, per-block result dicts and the summary
+    """
+    async with pool.reserve(image):
+        # Block detection is admitted like any other request; the blocks then
+        # wait for free workers instead of being rejected
+        # An orient chain without a cached estimate makes it in the split job
+        estimate = preprocess_type != AUTO and parse_pipeline(preprocess_type).needs_orientation
+        tiles = await pool.submit(split_into_tiles, image, orientation, estimate, reserved=True)
+        yield {"event": "layout", "boxes": [tuple(int(v) for v in box) for box, _ in tiles]}
+
+        if preprocess_type == AUTO:
+            async def process(name, tile):
+                data, _ = await ocr_auto(pool, tile, language, wait=True, native=True, reserved=True)
+                return {"result": data if structured else layout_text(data, language)}
+        else:
+            pipeline = parse_pipeline(preprocess_type).without("resize", "orient")
+            fn = run_ocr_data_pipeline if structured else run_ocr_pipeline
+
+            async def process(name, tile):
+                return {"result": await submit_when_ready(pool, fn, tile, pipeline, language, reserved=True)}
+
+        items = ((f"block {box}", tile) for box, tile in tiles)
+        async for result in stream_batch(items, process, pool.max_workers, len(tiles)):
+            yield result
+
+
+async def ocr_tiled(pool, image, preprocess_type="default", language="eng", structured=False,
+                    orientation=None):
+    """
+    OCR a large image block by block at native resolution.
+
+    Text blocks are OCRed concurrently across the worker pool and the
+    results are stitched back together in reading order. Preprocessing
+    runs per block without the fixed-size ``resize`` stage, so small print
+    keeps its full resolution; the ``-normalized`` presets still rescale
+    each block to the target text height.
+
+    Args:
+        pool: OCRWorkerPool to run on
+        image: Encoded image bytes or a numpy array
+        preprocess_type: Preset name, custom stage chain, or 'auto' to pick
+            the preprocessing per block
+        language: Language code for OCR
+        structured: Return OCRData with boxes in full image coordinates
+            instead of plain text
+        orientation: Orientation estimate for the image; the whole image is
+            turned upright before it is cut into blocks
+
+    Returns:
+        Extracted text as string, or OCRData when ``structured`` is set
+    """
+    boxes = []
+    results = {}
+    async for result in iter_tiled(pool, image, preprocess_type, language, structured, orientation):
+        if result.get("event") == "layout":
+            boxes = result["boxes"]
+        elif "error" in result:
+            if structured:
+                raise RuntimeError(result["error"])
+            return f"{OCR_ERROR_PREFIX}: {result['error']}"
+        elif "result" in result:
+            results[result["index"]] = result["result"]
+
+    if structured:
+        return OCRData.merge(
+            (results[index], box[0], box[1], None)
+            for index, box in enumerate(boxes) if index in results
+        )
+    return join_blocks(results[index] for index in sorted(results))
@@ -1,31 +1,43 @@
 import os
+import time
 import logging
 from datetime import datetime
-from models import db, Visitor, Conversion
+from sqlalchemy import select
+from models import UsageCounter
+from .analytics import (
+    analytics, VISITOR, CONVERSION, VISITORS_COUNTER, CONVERSIONS_COUNTER,
+    LANGUAGE_COUNTER_PREFIX, PREPROCESSING_COUNTER_PREFIX
+)
 
 logger = logging.getLogger(__name__)
 
+# Statistics configuration
+# OCR_STATS_TTL: seconds a statistics snapshot is reused before the counters are read again
+STATS_TTL = float(os.environ.get("OCR_STATS_TTL", 5))
+
+# (monotonic time, statistics) of the last counter read
+_stats_snapshot = None
+
 def track_visitor(request):
     """
     Track a visitor to the application.
     
+    The event is buffered in memory and written to the database in batches
+    by the analytics writer, so this never blocks the request.
+    
     Args:
         request: The incoming request
     """
     try:
         # Get IP address and user agent from the request
-        ip_address = request.client.host
+        ip_address = request.client.host if request.client else None
         user_agent = request.headers.get('user-agent', 'Unknown')
         
-        # Create a new visitor record
-        visitor = Visitor()
-        visitor.ip_address = ip_address
-        visitor.user_agent = user_agent
-        visitor.visit_date = datetime.utcnow()
-        
-        # Add to the database
-        db.session.add(visitor)
-        db.session.commit()
+        analytics.record(VISITOR, {
+            "ip_address": ip_address,
+            "user_agent": user_agent[:255],
+            "visit_date": datetime.utcnow()
+        })
         
         return True
     except Exception as e:
@@ -36,6 +48,9 @@ def track_conversion(request, image_size, language, preprocessing_type, characte
     """
     Track a successful OCR conversion.
     
+    The event is buffered in memory and written to the database in batches
+    by the analytics writer, so this never blocks the request.
+    
     Args:
         request: The incoming request
         image_size: Size of the processed image
@@ -45,73 +60,76 @@ def track_conversion(request, image_size, language, preprocessing_type, characte
     """
     try:
         # Get IP address from the request
-        ip_address = request.client.host
-        
-        # Create a new conversion record
-        conversion = Conversion()
-        conversion.ip_address = ip_address
-        conversion.image_size = image_size
-        conversion.language = language
-        conversion.preprocessing_type = preprocessing_type
-        conversion.characters_extracted = characters_extracted
-        conversion.conversion_date = datetime.utcnow()
+        ip_address = request.client.host if request.client else None
         
-        # Add to the database
-        db.session.add(conversion)
-        db.session.commit()
+        analytics.record(CONVERSION, {
+            "ip_address": ip_address,
+            "image_size": image_size,
+            "language": language,
+            "preprocessing_type": preprocessing_type,
+            "characters_extracted": characters_extracted,
+            "conversion_date": datetime.utcnow()
+        })
         
         return True
     except Exception as e:
         logger.error(f"Error tracking conversion: {str(e)}")
         return False
 
+def _read_counters():
+    with analytics.engine.connect() as conn:
+        return dict(conn.execute(select(UsageCounter.__table__.c.name, UsageCounter.__table__.c.value)).all())
+
 def get_statistics():
     """
     Get visitor and conversion statistics.
     
+    Statistics are read from the usage counters maintained by the analytics
+    writer, so no request scans the visitor or conversion tables. The result
+    is cached for OCR_STATS_TTL seconds.
+    
     Returns:
         Dictionary with statistics
     """
+    global _stats_snapshot
+    snapshot = _stats_snapshot
+    if snapshot is not None and time.monotonic() - snapshot[0] < STATS_TTL:
+        return snapshot[1]
+    
     try:
-        visitor_count = db.session.query(Visitor).count()
-        conversion_count = db.session.query(Conversion).count()
-        
-        # Get statistics by language
-        language_stats = db.session.query(
-            Conversion.language, 
-            db.func.count(Conversion.id)
-        ).group_by(Conversion.language).all()
-        
-        # Get statistics by preprocessing type
-        preprocessing_stats = db.session.query(
-            Conversion.preprocessing_type, 
-            db.func.count(Conversion.id)
-        ).group_by(Conversion.preprocessing_type).all()
+        counters = _read_counters()
+        visitor_count = counters.pop(VISITORS_COUNTER, 0)
+        conversion_count = counters.pop(CONVERSIONS_COUNTER, 0)
         
         # Calculate conversion rate
         conversion_rate = 0
         if visitor_count > 0:
             conversion_rate = (conversion_count / visitor_count) * 100
-            
-        # Format language stats
-        language_data = {lang: count for lang, count in language_stats}
         
-        # Format preprocessing stats
-        preprocessing_data = {prep: count for prep, count in preprocessing_stats}
+        # Split per-language and per-preprocessing counters
+        language_data = {}
+        preprocessing_data = {}
+        for name, count in counters.items():
+            if name.startswith(LANGUAGE_COUNTER_PREFIX):
+                language_data[name[len(LANGUAGE_COUNTER_PREFIX):]] = count
+            elif name.startswith(PREPROCESSING_COUNTER_PREFIX):
+                preprocessing_data[name[len(PREPROCESSING_COUNTER_PREFIX):]] = count
         
-        return {
+        stats = {
             "visitor_count": visitor_count,
             "conversion_count": conversion_count,
             "conversion_rate": round(conversion_rate, 2),
             "language_stats": language_data,
             "preprocessing_stats": preprocessing_data
         }
+        _stats_snapshot = (time.monotonic(), stats)
+        return stats
     except Exception as e:
-        print(f"Error getting statistics: {str(e)}")
+        logger.error(f"Error getting statistics: {str(e)}")
         return {
             "visitor_count": 0,
             "conversion_count": 0,
             "conversion_rate": 0,
             "language_stats": {},
             "preprocessing_stats": {}
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,263 @@
+import io
+import os
+import logging
+import warnings
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Upload limits
+# OCR_MAX_UPLOAD_BYTES: largest accepted file (default 50 MB)
+# OCR_MAX_BATCH_BYTES: largest accepted request body of the batch endpoint (default 500 MB)
+# OCR_MAX_IMAGE_PIXELS: largest accepted image, in pixels (default 100 megapixels)
+MAX_UPLOAD_BYTES = int(os.environ.get("OCR_MAX_UPLOAD_BYTES", 50 * 1024 * 1024))
+MAX_BATCH_BYTES = int(os.environ.get("OCR_MAX_BATCH_BYTES", 500 * 1024 * 1024))
+MAX_IMAGE_PIXELS = int(os.environ.get("OCR_MAX_IMAGE_PIXELS", 100_000_000))
+
+# Bytes read from an upload at a time
+CHUNK_SIZE = 64 * 1024
+
+# Room for the multipart boundaries and form fields around a single file
+FORM_OVERHEAD = 64 * 1024
+
+# How far into a file to look for the image dimensions before leaving the
+# check to the decoder (JPEG headers can be preceded by large EXIF blocks)
+HEADER_SEARCH_BYTES = 1024 * 1024
+
+# Magic bytes of the accepted formats
+SIGNATURES = [
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+    (b"%PDF-", "pdf"),
+    (b"PK\x03\x04", "zip"),
+]
+
+EXTENSION_FORMATS = {
+    ".jpg": "jpeg",
+    ".jpeg": "jpeg",
+    ".png": "png",
+    ".gif": "gif",
+    ".bmp": "bmp",
+    ".tif": "tiff",
+    ".tiff": "tiff",
+    ".pdf": "pdf",
+    ".zip": "zip",
+}
+
+# Formats that are routed by their extension (page splitting, archive
+# expansion), so the extension has to be right; single images are decoded
+# by content and may be mislabeled among themselves
+ROUTED_FORMATS = {"tiff", "pdf", "zip"}
+
+# PDF pages are rasterized at OCR_PDF_DPI, so their size is not in the header
+UNSIZED_FORMATS = {"pdf", "zip"}
+
+# Keep PIL (TIFF pages, header reads) within the same pixel budget
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+
+class UploadRejectedError(Exception):
+    """Raised when an upload is refused before it is fully read or decoded."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def sniff_format(head):
+    """
+    Identify a file format from its first bytes.
+
+    Args:
+        head: Leading bytes of the file
+
+    Returns:
+        Format name such as 'png' or 'pdf', or None if unknown
+    """
+    for signature, name in SIGNATURES:
+        if head.startswith(signature):
+            return name
+    return None
+
+
+def image_size(head):
+    """
+    Read the dimensions of an image from the start of its data.
+
+    Args:
+        head: Leading bytes of an encoded image
+
+    Returns:
+        Tuple of (width, height), or None if the header is not complete yet
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            with Image.open(io.BytesIO(head)) as image:
+                return image.size
+    except Image.DecompressionBombError:
+        # PIL refuses to even open images twice over the limit
+        return (MAX_IMAGE_PIXELS + 1, 1)
+    except Exception:
+        return None
+
+
+def check_format(filename, head, extensions):
+    """
+    Check that the first bytes of an upload match an accepted format.
+
+    Args:
+        filename: Name of the uploaded file
+        head: First chunk of the file
+        extensions: Accepted file extensions
+
+    Returns:
+        The sniffed format name
+
+    Raises:
+        UploadRejectedError: If the format is unknown, not accepted, or does
+            not match an extension that decides how the file is processed
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in extensions:
+        raise UploadRejectedError(
+            f"Unsupported file format. Supported formats: {', '.join(sorted(extensions))}"
+        )
+    detected = sniff_format(head)
+    accepted = {EXTENSION_FORMATS[ext] for ext in extensions if ext in EXTENSION_FORMATS}
+    if detected not in accepted:
+        raise UploadRejectedError(
+            f"{filename} is not a supported image or document (unrecognized content)", status_code=415
+        )
+    claimed = EXTENSION_FORMATS.get(extension)
+    if detected != claimed and (detected in ROUTED_FORMATS or claimed in ROUTED_FORMATS):
+        raise UploadRejectedError(
+            f"{filename} contains {detected.upper()} data but has a {extension} extension", status_code=415
+        )
+    return detected
+
+
+def check_pixels(filename, size, max_pixels=MAX_IMAGE_PIXELS):
+    """Raise UploadRejectedError if an image of ``size`` is over the pixel limit."""
+    width, height = size
+    if width * height > max_pixels:
+        raise UploadRejectedError(
+            f"{filename} is {width}x{height} pixels, the limit is {max_pixels} pixels", status_code=413
+        )
+
+
+async def read_upload(file, extensions, max_bytes=MAX_UPLOAD_BYTES, max_pixels=MAX_IMAGE_PIXELS):
+    """
+    Read an uploaded file in chunks, rejecting bad uploads before they are decoded.
+
+    Starlette parses the whole multipart body before the endpoint runs
+    (spooling parts over 1 MB to a temporary file), so only
+    BodySizeLimitMiddleware cuts off an oversized request while it
+    arrives. The checks here keep bad files away from the decoder and the
+    OCR workers: the format is sniffed from the first chunk, the image
+    dimensions are checked as soon as the header has been read, and
+    reading stops at the first failed check, so a rejected file is never
+    copied into memory in full.
+
+    Args:
+        file: FastAPI UploadFile
+        extensions: Accepted file extensions
+        max_bytes: Largest accepted file size
+        max_pixels: Largest accepted image size in pixels
+
+    Returns:
+        The file contents as bytes
+
+    Raises:
+        UploadRejectedError: With the HTTP status code to answer with
+    """
+    filename = file.filename or ""
+    if not filename:
+        raise UploadRejectedError("No filename provided")
+    if file.size is not None and file.size > max_bytes:
+        raise UploadRejectedError(f"{filename} is larger than {max_bytes} bytes", status_code=413)
+
+    chunks = []
+    total = 0
+    detected = None
+    sized = False
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        total += len(chunk)
+        if total > max_bytes:
+            raise UploadRejectedError(f"{filename} is larger than {max_bytes} bytes", status_code=413)
+
+        if detected is None:
+            detected = check_format(filename, chunk, extensions)
+            sized = detected in UNSIZED_FORMATS
+        if not sized:
+            head = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+            size = image_size(head)
+            if size is not None:
+                check_pixels(filename, size, max_pixels)
+                sized = True
+            elif total >= HEADER_SEARCH_BYTES:
+                # Leave the check to the decoder
+                sized = True
+
+    if detected is None:
+        raise UploadRejectedError(f"{filename} is empty")
+    return chunks[0] if len(chunks) == 1 else b"".join(chunks)
+
+
+class BodySizeLimitMiddleware:
+    """
+    ASGI middleware answering 413 for request bodies over a size limit.
+
+    Requests announcing a larger Content-Length are refused before any of
+    the body is read; chunked bodies are cut off as soon as they exceed the
+    limit, so an oversized upload is never spooled completely.
+
+    Args:
+        app: ASGI application
+        max_bytes: Default body limit
+        path_limits: Optional dict of path -> body limit overriding the default
+    """
+
+    def __init__(self, app, max_bytes=MAX_UPLOAD_BYTES + FORM_OVERHEAD, path_limits=None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        limit = self.path_limits.get(scope["path"], self.max_bytes)
+        detail = f"Request body is larger than {limit} bytes"
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                if value.isdigit() and int(value) > limit:
+                    response = JSONResponse({"detail": detail}, status_code=413)
+                    return await response(scope, receive, send)
+                break
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside the body parser and answered by the
+                    # application's HTTPException handler
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
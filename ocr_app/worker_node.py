@@ -0,0 +1,186 @@
+import os
+import sys
+import asyncio
+import inspect
+import logging
+import argparse
+import subprocess
+
+import numpy as np
+
+from .workers import OCRWorkerPool, PoolSaturatedError, PoolTimeoutError
+from .image_processor import ImageError
+from .debug_artifacts import check_request_id
+from .dispatch import (
+    TASKS, NODE_SECRET, encode, decode, read_message, write_message, is_authorized, WorkerNode,
+    NodeUnavailableError
+)
+
+logger = logging.getLogger(__name__)
+
+# Worker node configuration
+# OCR_NODE_HOST / OCR_NODE_PORT: address a worker node listens on
+NODE_HOST = os.environ.get("OCR_NODE_HOST", "127.0.0.1")
+NODE_PORT = int(os.environ.get("OCR_NODE_PORT", 9000))
+
+LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+
+def check_task_args(fn, args):
+    """
+    Check the arguments of a dispatched task before it runs.
+
+    Images must be sent as data: a path would make the node read its own
+    files, and the request id names a directory for debug artifacts.
+
+    Raises:
+        ValueError: If the arguments do not fit ``fn`` or are not allowed remotely
+    """
+    try:
+        arguments = inspect.signature(fn).bind(*args).arguments
+    except TypeError as e:
+        raise ValueError(f"Invalid arguments for {fn.__name__}: {e}")
+    if not isinstance(arguments.get("image"), (bytes, np.ndarray)):
+        raise ValueError("Worker nodes only accept images as encoded bytes or arrays")
+    if arguments.get("request_id") is not None:
+        check_request_id(arguments["request_id"])
+
+
+class WorkerNodeServer:
+    """
+    Stateless OCR worker node.
+
+    Runs dispatched tasks on a local OCRWorkerPool and answers health
+    checks with the pool's load. It holds no database, cache or job state,
+    so any number of nodes can be added or removed behind the API.
+    """
+
+    def __init__(self, pool=None, host=NODE_HOST, port=NODE_PORT, secret=NODE_SECRET):
+        self.pool = pool or OCRWorkerPool()
+        self.host = host
+        self.port = port
+        self.secret = secret
+        self._server = None
+
+    async def start(self):
+        self.pool.start()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"OCR worker node listening on {self.host}:{self.port} with {self.pool.max_workers} workers")
+        if not self.secret and self.host not in LOOPBACK_HOSTS:
+            logger.warning("OCR_NODE_SECRET is not set: anyone who can reach this port can run OCR jobs on it")
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        self.pool.shutdown(wait=False)
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request, blobs = await read_message(reader)
+                if request is None:
+                    break
+                if not is_authorized(request, self.secret):
+                    logger.warning("Rejected worker node request without the shared secret")
+                    await write_message(writer, {"ok": False, "error_type": "error", "error": "Not authorized"})
+                    break
+                response, response_blobs = await self._dispatch(request, blobs)
+                await write_message(writer, response, response_blobs)
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            logger.warning(f"Dropping worker node connection: {e}")
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request, blobs):
+        op = request.get("op")
+        if op == "health":
+            return {"ok": True, **self.pool.stats()}, []
+        if op != "run":
+            return {"ok": False, "error_type": "error", "error": f"Unknown operation: {op}"}, []
+
+        fn = TASKS.get(request.get("fn"))
+        if fn is None:
+            return {"ok": False, "error_type": "error", "error": f"Unknown task: {request.get('fn')}"}, []
+        try:
+            args = decode(request.get("args"), blobs)
+            if not isinstance(args, list):
+                raise ValueError("Task arguments must be a list")
+            check_task_args(fn, args)
+        except (ValueError, TypeError, KeyError, IndexError) as e:
+            return {"ok": False, "error_type": "error", "error": f"Invalid task: {e}"}, []
+        observations = []
+        try:
+            result = await self.pool.submit(fn, *args, observations=observations)
+        except PoolSaturatedError as e:
+            return {"ok": False, "error_type": "saturated", "error": str(e)}, []
+        except PoolTimeoutError as e:
+            return {"ok": False, "error_type": "timeout", "error": str(e)}, []
+        except ImageError as e:
+            return {"ok": False, "error_type": "image", "error": str(e)}, []
+        except Exception as e:
+            logger.error(f"Task {fn.__name__} failed: {str(e)}", exc_info=True)
+            return {"ok": False, "error_type": "error", "error": str(e)}, []
+
+        # The job's timings go back to the API, which serves /metrics
+        result_blobs = []
+        return {
+            "ok": True, "result": encode(result, result_blobs), "metrics": encode(observations, result_blobs)
+        }, result_blobs
+
+
+async def check_node(address):
+    """Health-check a node; returns its stats or raises NodeUnavailableError."""
+    response, _ = await WorkerNode(address).request({"op": "health"}, timeout=5)
+    return response
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run stateless OCR worker nodes")
+    parser.add_argument("--host", default=NODE_HOST)
+    parser.add_argument("--port", type=int, default=NODE_PORT)
+    parser.add_argument("--count", type=int, default=1,
+                        help="Start this many nodes on consecutive ports (for testing on one machine)")
+    parser.add_argument("--check", metavar="HOST:PORT", help="Health-check a running node and exit")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
+
+    if args.check:
+        try:
+            print(asyncio.run(check_node(args.check)))
+        except NodeUnavailableError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        return
+
+    if args.count > 1:
+        # One process per node, like separate machines
+        processes = [
+            subprocess.Popen([sys.executable, "-m", "ocr_app.worker_node", "--host", args.host, "--port", str(port)])
+            for port in range(args.port, args.port + args.count)
+        ]
+        addresses = ",".join(f"{args.host}:{port}" for port in range(args.port, args.port + args.count))
+        print(f"Started {args.count} worker nodes, run the API with OCR_WORKER_NODES={addresses}")
+        try:
+            for process in processes:
+                process.wait()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+        return
+
+    try:
+        asyncio.run(WorkerNodeServer(host=args.host, port=args.port).serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
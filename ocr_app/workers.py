@@ -0,0 +1,290 @@
+import os
+import time
+import asyncio
+import logging
+import contextlib
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from .image_processor import load_image, preprocess_image
+from .preprocessing import parse_pipeline
+from .orientation import orient_pipeline
+from .memory import PixelBudget, image_pixels, scratch_buffers, PIXEL_BUDGET
+from .ocr import extract_text, extract_data
+from .engine import warm_up
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Worker pool configuration
+# OCR_WORKER_MODE: "thread" (default) or "process"
+# OCR_MAX_WORKERS: number of OCR jobs that may run at the same time
+# OCR_QUEUE_SIZE: number of jobs allowed to wait for a free worker
+# OCR_TIMEOUT: seconds a request waits for its OCR result
+OCR_WORKER_MODE = os.environ.get("OCR_WORKER_MODE", "thread")
+OCR_MAX_WORKERS = int(os.environ.get("OCR_MAX_WORKERS", os.cpu_count() or 1))
+OCR_QUEUE_SIZE = int(os.environ.get("OCR_QUEUE_SIZE", OCR_MAX_WORKERS * 2))
+OCR_TIMEOUT = float(os.environ.get("OCR_TIMEOUT", 60))
+
+
+class PoolSaturatedError(Exception):
+    """Raised when the worker pool and its queue are both full."""
+
+
+class PoolTimeoutError(Exception):
+    """Raised when a job does not finish within its timeout."""
+
+
+def run_ocr_pipeline(image, preprocess_type="default", language="eng", request_id=None):
+    """
+    Run the preprocess + OCR pipeline for a single image.
+
+    This is a module level function so it can be pickled for process workers.
+
+    Args:
+        image: Encoded image bytes, a path to the image file, or a numpy array
+        preprocess_type: Type of preprocessing to apply
+        language: Language code for OCR
+        request_id: Optional identifier used to namespace debug artifacts
+
+    Returns:
+        Extracted text as string
+    """
+    processed_image = preprocess_image(image, preprocess_type, request_id, scratch_buffers())
+    return extract_text(processed_image, language)
+
+
+def run_ocr_data_pipeline(image, preprocess_type="default", language="eng", request_id=None, psm=None):
+    """
+    Run the preprocess + OCR pipeline and return structured output.
+
+    Args:
+        image: Encoded image bytes, a path to the image file, or a numpy array
+        preprocess_type: Type of preprocessing to apply
+        language: Language code for OCR
+        request_id: Optional identifier used to namespace debug artifacts
+        psm: Page segmentation mode overriding the language default
+
+    Returns:
+        OCRData with text, boxes and confidences
+    """
+    decoded = not isinstance(image, np.ndarray)
+    image = load_image(image)
+    pipeline = orient_pipeline(parse_pipeline(preprocess_type), image)
+    height, width = image.shape[:2]
+    # Hand a decoded upload over to the pipeline so it is not held while Tesseract runs
+    processed_image = preprocess_image(image, pipeline, request_id, scratch_buffers(), owned=decoded)
+    del image
+    data = extract_data(processed_image, language, psm)
+    # Report boxes in the coordinates of the uploaded image, turned upright
+    if pipeline.rotation in (90, 270):
+        width, height = height, width
+    if processed_image.shape[:2] != (height, width):
+        data.scale(width / processed_image.shape[1], height / processed_image.shape[0])
+    return data
+
+
+def _run_timed(fn, *args):
+    """
+    Run a pool job and report when it started and finished.
+
+    Wall-clock timestamps are used so the submitting process can compute
+    queue wait and run time for process workers too. The metrics the job
+    records (decoding, stages, Tesseract runs) are returned with the result
+    instead of landing in a process worker's own registry.
+
+    Returns:
+        Tuple of (start time, end time, return value of ``fn``, observations)
+    """
+    started = time.time()
+    with metrics.recording() as observations:
+        result = fn(*args)
+    return started, time.time(), result, observations
+
+
+class OCRWorkerPool:
+    """
+    Bounded executor for blocking OCR work.
+
+    At most ``max_workers`` jobs run concurrently and at most ``queue_size``
+    more wait for a free worker. Anything beyond that is rejected right away
+    with PoolSaturatedError so the event loop never queues unbounded work.
+
+    Jobs whose first argument is an image are also admitted against a
+    pixel budget, so the decoded images in flight fit in memory: a few
+    large photos run one after another while many small screenshots still
+    run side by side. Work that keeps an image decoded across several jobs
+    (the tiles of a tiled request) holds its pixels with ``reserve``.
+    """
+
+    def __init__(self, mode=OCR_WORKER_MODE, max_workers=OCR_MAX_WORKERS,
+                 queue_size=OCR_QUEUE_SIZE, timeout=OCR_TIMEOUT, pixel_budget=PIXEL_BUDGET):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown worker mode: {mode}")
+        self.mode = mode
+        self.max_workers = max(1, max_workers)
+        self.queue_size = max(0, queue_size)
+        self.timeout = timeout
+        self.budget = PixelBudget(pixel_budget)
+        self._executor = None
+        self._pending = 0
+        self._rejected = 0
+        self._timed_out = 0
+
+    def start(self):
+        """Create the underlying executor."""
+        if self._executor is not None:
+            return
+        if self.mode == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=warm_up
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="ocr-worker",
+                initializer=warm_up
+            )
+        logger.info(
+            f"Started OCR {self.mode} pool with {self.max_workers} workers "
+            f"and queue size {self.queue_size}"
+        )
+
+    def shutdown(self, wait=True):
+        """Stop the executor, cancelling jobs that have not started yet."""
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        self._executor = None
+
+    @property
+    def capacity(self):
+        """Total number of jobs the pool accepts (running + queued)."""
+        return self.max_workers + self.queue_size
+
+    def stats(self):
+        """Return a snapshot of the pool state."""
+        return {
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "queue_size": self.queue_size,
+            "in_flight": min(self._pending, self.max_workers),
+            "queued": max(0, self._pending - self.max_workers),
+            "rejected": self._rejected,
+            "timed_out": self._timed_out,
+            **self.budget.stats(),
+        }
+
+    def _release(self, pixels=0):
+        self._pending -= 1
+        self.budget.release(pixels)
+
+    @contextlib.asynccontextmanager
+    async def reserve(self, image, timeout=None):
+        """
+        Hold the pixels of ``image`` in the budget until the block exits.
+
+        For work that keeps an image decoded across several jobs, such as
+        the tiles cut from it: jobs inside the block are submitted with
+        ``reserved=True`` and run under this reservation instead of
+        reserving their own pixels on top of it.
+
+        Args:
+            image: numpy array, or encoded image bytes (only the header is read)
+            timeout: Seconds to wait for room in the budget, defaults to the
+                pool timeout
+
+        Raises:
+            PoolTimeoutError: If the pixels did not fit in time
+        """
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            pixels = await asyncio.wait_for(self.budget.acquire(image_pixels(image)), timeout)
+        except asyncio.TimeoutError:
+            self._timed_out += 1
+            raise PoolTimeoutError(f"Not enough memory for OCR within {timeout:g} seconds")
+        try:
+            yield
+        finally:
+            self.budget.release(pixels)
+
+    async def submit(self, fn, *args, timeout=None, observations=None, reserved=False):
+        """
+        Run ``fn(*args)`` on the pool and wait for its result.
+
+        Args:
+            fn: Callable to run (must be picklable in process mode)
+            *args: Positional arguments for ``fn``
+            timeout: Seconds to wait, defaults to the pool timeout
+            observations: Optional list receiving the metrics the job
+                recorded, instead of applying them to this process's
+                registry (worker nodes send them back to the API)
+            reserved: The job's image is covered by a ``reserve`` block, so
+                it does not wait for the pixel budget
+
+        Returns:
+            The return value of ``fn``
+
+        Raises:
+            PoolSaturatedError: If the pool and queue are full
+            PoolTimeoutError: If the job did not finish in time, including
+                time spent waiting for the pixel budget
+        """
+        if self._executor is None:
+            self.start()
+
+        if self._pending >= self.capacity:
+            self._rejected += 1
+            raise PoolSaturatedError(
+                f"OCR workers are busy ({self._pending} jobs pending), please retry later"
+            )
+
+        loop = asyncio.get_running_loop()
+        self._pending += 1
+        submitted = time.time()
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            needed = image_pixels(args[0]) if args and not reserved else 0
+            pixels = await asyncio.wait_for(self.budget.acquire(needed), timeout)
+        except asyncio.TimeoutError:
+            self._pending -= 1
+            self._timed_out += 1
+            raise PoolTimeoutError(f"Not enough memory for OCR within {timeout:g} seconds")
+        except BaseException:
+            self._pending -= 1
+            raise
+        try:
+            future = self._executor.submit(_run_timed, fn, *args)
+        except Exception:
+            self._release(pixels)
+            raise
+        # Release the slot and pixels only when the job really finishes, even
+        # if the caller stopped waiting, so the bounds reflect actual usage.
+        def on_done(_future):
+            try:
+                loop.call_soon_threadsafe(self._release, pixels)
+            except RuntimeError:
+                # Event loop already closed during shutdown
+                pass
+
+        future.add_done_callback(on_done)
+
+        try:
+            remaining = max(0.0, timeout - (time.time() - submitted))
+            started, finished, result, recorded = await asyncio.wait_for(asyncio.wrap_future(future), remaining)
+        except asyncio.TimeoutError:
+            self._timed_out += 1
+            future.cancel()
+            raise PoolTimeoutError(f"OCR did not finish within {timeout:g} seconds")
+        recorded.append((metrics.queue_wait_seconds.name, (), max(0.0, started - submitted)))
+        recorded.append((metrics.job_seconds.name, (getattr(fn, "__name__", "job"),), finished - started))
+        if observations is None:
+            metrics.replay(recorded)
+        else:
+            observations.extend(recorded)
+        return result
+
+
+# Shared pool used by the API
+ocr_pool = OCRWorkerPool()
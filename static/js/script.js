@@ -69,6 +69,52 @@ document.addEventListener('DOMContentLoaded', function() {
         uploadFile(file);
     }
 
+    // Spinner text for the progress events of the OCR stream
+    const progressLabels = {
+        orientation: 'Straightening the image...',
+        layout: 'Finding text blocks...',
+        ocr: 'Recognizing text...'
+    };
+
+    // Function to read a Server-Sent Events response, calling onEvent for
+    // each event; resolves with the data of the final 'done' event
+    function readEvents(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let result = null;
+        
+        function pump() {
+            return reader.read().then(({ done, value }) => {
+                buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+                
+                // Events are separated by a blank line
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const frame = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    
+                    let name = 'message';
+                    let payload = '';
+                    frame.split('\n').forEach(line => {
+                        if (line.startsWith('event:')) name = line.slice(6).trim();
+                        else if (line.startsWith('data:')) payload += line.slice(5).trim();
+                    });
+                    if (!payload) continue;
+                    
+                    const data = JSON.parse(payload);
+                    onEvent(name, data);
+                    if (name === 'done') result = data;
+                }
+                
+                if (!done) return pump();
+                if (!result) throw new Error('The connection closed before the text was complete');
+                return result;
+            });
+        }
+        return pump();
+    }
+
     // Function to upload the file and process OCR
     function uploadFile(file) {
         if (!file) {
@@ -83,7 +129,6 @@ document.addEventListener('DOMContentLoaded', function() {
         // Get selected preprocessing type (with fallback to default)
         const preprocessType = preprocessingTypeSelect ? preprocessingTypeSelect.value : 'default';
         formData.append('preprocess_type', preprocessType);
-        formData.append('auto_detect_language', 'false');
         
         // Get selected language (with fallback to English)
         const language = languageSelect ? languageSelect.value : 'eng';
@@ -98,8 +143,37 @@ document.addEventListener('DOMContentLoaded', function() {
         
         console.log(`Uploading file: ${file.name}, size: ${formatFileSize(file.size)}, type: ${preprocessType}, language: ${language}`);
         
+        // Pages and text blocks arrive in completion order; they are shown
+        // in reading order as soon as each one is done
+        const parts = [];
+        
+        function handleEvent(name, data) {
+            if (name === 'error') {
+                throw new Error(data.detail || `Server error: ${data.status}`);
+            }
+            
+            if (name === 'start') {
+                if (fileNameDisplay) fileNameDisplay.textContent = data.filename || file.name;
+                if (fileSizeDisplay) fileSizeDisplay.textContent = formatFileSize(data.size || file.size);
+                if (processingTimeDisplay) processingTimeDisplay.textContent = 'In progress...';
+                if (preprocessingInfo) {
+                    preprocessingInfo.textContent = `Preprocessing: ${data.preprocessing_type} | Language: ${data.language}`;
+                }
+            } else if (name === 'progress' && processingSpinner) {
+                let label = progressLabels[data.stage] || 'Processing your image...';
+                if (data.stage === 'ocr' && data.completed) {
+                    label += data.total ? ` (${data.completed} of ${data.total})` : ` (${data.completed} done)`;
+                }
+                processingSpinner.querySelector('p').textContent = label;
+            } else if ((name === 'page' || name === 'block') && ocrText) {
+                parts[data.index] = data.text;
+                ocrText.innerHTML = highlightText(parts.filter(part => part !== undefined).join('\n\n'));
+                if (resultContainer) resultContainer.style.display = 'block';
+            }
+        }
+        
         // Send request to server
-        fetch('/upload/', {
+        fetch('/api/extract-text/stream', {
             method: 'POST',
             body: formData
         })
@@ -115,17 +189,12 @@ document.addEventListener('DOMContentLoaded', function() {
                         throw new Error(`Error processing image (${response.status}: ${response.statusText})`);
                     });
             }
-            return response.json();
+            return readEvents(response, handleEvent);
         })
         .then(data => {
             console.log('OCR processing successful', data);
             
-            // Check if we have valid data
-            if (!data) {
-                throw new Error('No data received from server');
-            }
-            
-            // Display the results
+            // Display the full text, in reading order
             if (ocrText) {
                 const extractedText = data.text || 'No text was detected in the image.';
                 
@@ -136,17 +205,10 @@ document.addEventListener('DOMContentLoaded', function() {
                 console.log(`Extracted ${extractedText.length} characters of text`);
             }
             
-            // Update file information
-            if (fileNameDisplay) fileNameDisplay.textContent = data.filename || file.name;
-            if (fileSizeDisplay) fileSizeDisplay.textContent = formatFileSize(data.size || file.size);
             if (processingTimeDisplay) processingTimeDisplay.textContent = `${data.processing_time || '?'} seconds`;
-            
-            // Update preprocessing and language info
-            let infoText = `Preprocessing: ${data.preprocessing_type || preprocessType}`;
-            if (data.language) {
-                infoText += ` | Language: ${data.language}`;
+            if (data.auto && preprocessingInfo) {
+                preprocessingInfo.textContent = `Preprocessing: ${preprocessType} (${data.auto.preprocessing_type}, confidence ${data.auto.confidence}%) | Language: ${language}`;
             }
-            if (preprocessingInfo) preprocessingInfo.textContent = infoText;
             
             // Show result container
             if (resultContainer) resultContainer.style.display = 'block';
@@ -207,6 +269,9 @@ document.addEventListener('DOMContentLoaded', function() {
         const formData = new FormData();
         formData.append('text', currentText);
         formData.append('fix_layout', 'true');
+        if (languageSelect) {
+            formData.append('language', languageSelect.value);
+        }
         
         // Send request to clean text API
         fetch('/api/clean-text/', {
@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from ocr_app import adaptive
+from ocr_app.adaptive import AUTO_ESCALATIONS, _candidate, ocr_auto
+from ocr_app.engine import TSV_HEADER
+from ocr_app.layout import OCRData
+from ocr_app.preprocessing import PRESETS, parse_pipeline
+from ocr_app.workers import OCRWorkerPool
+
+ORIENTATION = {"rotation": 90, "rotation_confidence": 5.0, "skew": 1.5}
+
+
+def test_presets_leave_orientation_to_auto():
+    assert not any(parse_pipeline(name).needs_orientation for name in PRESETS)
+    assert not any(stage == "orient" for name in PRESETS for stage, _ in parse_pipeline(name).stages)
+
+
+def test_auto_passes_turn_the_page_with_the_shared_estimate():
+    pipeline = _candidate("grayscale", False, ORIENTATION)
+    assert pipeline.name == "grayscale"
+    assert pipeline.stages[0] == ("orient", {"rotation": 90, "skew": 1.5})
+    assert pipeline.stages[1:] == parse_pipeline("grayscale").stages
+    assert pipeline.rotation == 90
+
+
+def test_auto_passes_without_an_estimate_or_on_tiles_do_not_orient():
+    assert _candidate("grayscale", False, None).stages == parse_pipeline("grayscale").stages
+    tile = _candidate("grayscale", True, ORIENTATION)
+    assert not any(stage in ("orient", "resize") for stage, _ in tile.stages)
+
+
+def test_normalized_presets_only_swap_the_resize_stage():
+    originals = [name for name in PRESETS if not name.endswith("-normalized")]
+    assert originals == ["default", "grayscale", "threshold", "adaptive", "denoise"]
+    for name in originals:
+        stages = parse_pipeline(name).stages
+        normalized = parse_pipeline(f"{name}-normalized").stages
+        assert stages[0] == ("resize", {}) and normalized[0] == ("normalize", {})
+        assert stages[1:] == normalized[1:]
+
+
+def scored(confidence):
+    return OCRData.from_tsv(TSV_HEADER + f"5\t1\t1\t1\t1\t1\t0\t0\t10\t10\t{confidence}\tword\n")
+
+
+@pytest.fixture
+def passes(monkeypatch):
+    """Fake OCR scoring each (preset, psm) pass; records the passes that ran and their orientation."""
+    ran = []
+    estimates = []
+
+    def use(scores, delays=None):
+        def fake_data(image, pipeline, language, request_id=None, psm=None):
+            ran.append((pipeline.name, psm, pipeline.rotation))
+            time.sleep((delays or {}).get((pipeline.name, psm), 0))
+            score = scores.get((pipeline.name, psm), 0)
+            if score is None:
+                raise RuntimeError("pass failed")
+            return scored(score)
+
+        monkeypatch.setattr(adaptive, "run_ocr_data_pipeline", fake_data)
+        return ran
+
+    def estimate(image):
+        estimates.append(image.shape)
+        return {"rotation": 180, "rotation_confidence": 4.0, "skew": 0.0}
+
+    monkeypatch.setattr(adaptive, "estimate_orientation", estimate)
+    use.estimates = estimates
+    return use
+
+
+def run_auto(**options):
+    pool = OCRWorkerPool(mode="thread", max_workers=2, queue_size=8, timeout=10)
+
+    async def run():
+        try:
+            return await ocr_auto(pool, np.zeros((20, 20), np.uint8), **options)
+        finally:
+            pool.shutdown()
+
+    return asyncio.run(run())
+
+
+def test_confident_first_pass_stops_there(passes):
+    ran = passes({("grayscale-normalized", None): 92})
+    data, info = run_auto(min_confidence=80)
+    assert info == {"preprocessing_type": "grayscale-normalized", "psm": None, "confidence": 92.0, "passes": 1}
+    assert ran == [("grayscale-normalized", None, 180)]
+    assert len(passes.estimates) == 1
+
+
+def test_escalation_stops_at_the_first_confident_pass(passes):
+    first, second, third, fourth = AUTO_ESCALATIONS
+    ran = passes({first: None, second: 85, third: 95, fourth: 99}, delays={first: 0.1})
+    data, info = run_auto(min_confidence=80, parallel=2)
+    assert (info["preprocessing_type"], info["psm"], info["confidence"]) == (*second, 85.0)
+    # The slow pass is cancelled and the later ones never start
+    assert info["passes"] == 2
+    assert {(name, psm) for name, psm, _ in ran[1:]} == {first, second}
+    # Every pass was turned with the one estimate
+    assert {rotation for _, _, rotation in ran} == {180} and len(passes.estimates) == 1
+
+
+def test_most_confident_pass_wins_when_none_is_confident_enough(passes):
+    ran = passes({("grayscale-normalized", None): 20, AUTO_ESCALATIONS[0]: None, AUTO_ESCALATIONS[2]: 70})
+    data, info = run_auto(min_confidence=80, parallel=1)
+    assert (info["preprocessing_type"], info["psm"], info["passes"]) == (*AUTO_ESCALATIONS[2], 5)
+    assert len(ran) == 5
+
+
+def test_tiles_skip_the_orientation_estimate(passes):
+    ran = passes({("normalize,grayscale", None): 92})
+    data, info = run_auto(native=True)
+    assert info["preprocessing_type"] == "grayscale-normalized"
+    assert ran == [("normalize,grayscale", None, 0)] and passes.estimates == []
@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import create_engine, select, func
+
+from models import db, Conversion, UsageCounter, Visitor
+from ocr_app import tracking
+from ocr_app.analytics import AnalyticsWriter, CONVERSION, VISITOR, apply_counter_deltas, seed_counters
+
+
+def conversion(**values):
+    return {"ip_address": "127.0.0.1", "image_size": 10, "language": "eng", "preprocessing_type": "default",
+            "characters_extracted": 5, "conversion_date": datetime.utcnow(), **values}
+
+
+def visitor():
+    return {"ip_address": "127.0.0.1", "user_agent": "pytest", "visit_date": datetime.utcnow()}
+
+
+def test_rejected_batch_is_written_row_by_row(tmp_path):
+    writer = AnalyticsWriter(database_url=f"sqlite:///{tmp_path / 'analytics.db'}", batch_size=10)
+    writer.record(CONVERSION, conversion(id=1))
+    # Same primary key: the executemany fails as a whole
+    writer.record(CONVERSION, conversion(id=1))
+    writer.record(CONVERSION, conversion(id=2, language="deu"))
+    asyncio.run(writer.flush())
+
+    assert writer.stats()["written"] == 2 and writer.stats()["failed"] == 1
+    with writer.engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(Conversion.__table__)).scalar() == 2
+        counters = dict(conn.execute(select(UsageCounter.name, UsageCounter.value)).all())
+    # Counters match the stored rows
+    assert counters["conversions"] == 2
+    assert counters["language:eng"] == 1 and counters["language:deu"] == 1
+
+
+def test_full_buffer_drops_the_oldest_events(tmp_path):
+    writer = AnalyticsWriter(database_url=f"sqlite:///{tmp_path / 'analytics.db'}", buffer_size=3, batch_size=2)
+    for n in range(1, 6):
+        writer.record(CONVERSION, conversion(id=n))
+    assert writer.stats() == {"buffered": 3, "written": 0, "dropped": 2, "failed": 0}
+
+    asyncio.run(writer.flush())
+    assert writer.stats() == {"buffered": 0, "written": 3, "dropped": 2, "failed": 0}
+    with writer.engine.connect() as conn:
+        assert sorted(conn.execute(select(Conversion.id)).scalars()) == [3, 4, 5]
+
+
+def test_background_task_writes_full_batches_and_the_rest_on_stop(tmp_path):
+    writer = AnalyticsWriter(database_url=f"sqlite:///{tmp_path / 'analytics.db'}", batch_size=2, flush_ms=60_000)
+
+    async def run():
+        await writer.start()
+        writer.record(VISITOR, visitor())
+        writer.record(VISITOR, visitor())
+        # A full batch wakes the writer up long before the flush interval
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if writer.written:
+                break
+        written_before_stop = writer.written
+        writer.record(VISITOR, visitor())
+        await writer.stop()
+        return written_before_stop
+
+    assert asyncio.run(run()) == 2
+    assert writer.stats()["written"] == 3
+
+
+def counters_of(engine):
+    with engine.connect() as conn:
+        return dict(conn.execute(select(UsageCounter.name, UsageCounter.value)).all())
+
+
+def test_counter_upserts_add_to_existing_counters(tmp_path):
+    writer = AnalyticsWriter(database_url=f"sqlite:///{tmp_path / 'analytics.db'}")
+    with writer.engine.begin() as conn:
+        apply_counter_deltas(conn, {"conversions": 2, "language:eng": 2})
+    with writer.engine.begin() as conn:
+        apply_counter_deltas(conn, {"conversions": 1, "language:deu": 1})
+    # Seeded at zero from the empty history, then incremented in place
+    assert counters_of(writer.engine) == {"visitors": 0, "conversions": 3, "language:eng": 2, "language:deu": 1}
+
+
+def test_counters_are_seeded_from_history_once(tmp_path):
+    url = f"sqlite:///{tmp_path / 'analytics.db'}"
+    engine = create_engine(url)
+    db.metadata.create_all(engine, tables=[Conversion.__table__, Visitor.__table__])
+    with engine.begin() as conn:
+        conn.execute(Conversion.__table__.insert(), [conversion(id=1), conversion(id=2, preprocessing_type="auto")])
+        conn.execute(Visitor.__table__.insert(), [visitor()])
+
+    writer = AnalyticsWriter(database_url=url)
+    seeded = counters_of(writer.engine)
+    assert seeded == {"visitors": 1, "conversions": 2, "language:eng": 2,
+                      "preprocessing:default": 1, "preprocessing:auto": 1}
+    # Counters already exist: history is not counted again
+    seed_counters(writer.engine)
+    assert counters_of(writer.engine) == seeded
+
+
+def test_statistics_are_read_from_the_counters(tmp_path, monkeypatch):
+    writer = AnalyticsWriter(database_url=f"sqlite:///{tmp_path / 'analytics.db'}")
+    monkeypatch.setattr(tracking, "analytics", writer)
+    monkeypatch.setattr(tracking, "_stats_snapshot", None)
+    writer.record(VISITOR, visitor())
+    writer.record(VISITOR, visitor())
+    writer.record(CONVERSION, conversion(language="chi_sim"))
+    asyncio.run(writer.flush())
+
+    stats = tracking.get_statistics()
+    assert stats == {
+        "visitor_count": 2, "conversion_count": 1, "conversion_rate": 50.0,
+        "language_stats": {"chi_sim": 1}, "preprocessing_stats": {"default": 1},
+    }
+    # Reused within OCR_STATS_TTL
+    writer.record(VISITOR, visitor())
+    asyncio.run(writer.flush())
+    assert tracking.get_statistics() is stats
@@ -0,0 +1,129 @@
+import asyncio
+import time
+
+import cv2
+import httpx
+import numpy as np
+import pytest
+
+from ocr_app import api
+from ocr_app.workers import OCRWorkerPool
+
+
+def png(seed, size=(40, 60)):
+    """A small PNG with content that differs per ``seed``, so results are not cached."""
+    image = np.full(size, 255, np.uint8)
+    image[seed % size[0], :] = 0
+    image[:, seed % size[1]] = seed % 200
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+def call_api(body):
+    async def run():
+        await api.startup_event()
+        try:
+            transport = httpx.ASGITransport(app=api.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await body(client)
+        finally:
+            await api.shutdown_event()
+
+    return asyncio.run(run())
+
+
+def upload(client, data, name="page.png", **fields):
+    return client.post("/upload/", files={"file": (name, data, "image/png")}, data=fields)
+
+
+@pytest.fixture
+def slow_pool(monkeypatch):
+    """A one-worker pool without a queue whose OCR takes 0.5 seconds."""
+    def slow_ocr(image, pipeline, language, request_id=None):
+        time.sleep(0.5)
+        return "slow text"
+
+    def use(timeout=5):
+        pool = OCRWorkerPool(mode="thread", max_workers=1, queue_size=0, timeout=timeout)
+        monkeypatch.setattr(api, "ocr_pool", pool)
+        return pool
+
+    monkeypatch.setattr(api, "run_ocr_pipeline", slow_ocr)
+    return use
+
+
+def test_upload_is_rejected_with_503_when_the_pool_is_full(slow_pool):
+    slow_pool()
+
+    async def body(client):
+        return await asyncio.gather(*(upload(client, png(seed)) for seed in (1, 2)))
+
+    responses = call_api(body)
+    assert sorted(response.status_code for response in responses) == [200, 503]
+    rejected = next(response for response in responses if response.status_code == 503)
+    assert rejected.headers["Retry-After"] == "1"
+    assert "busy" in rejected.json()["detail"]
+
+
+def test_upload_times_out_with_504(slow_pool):
+    pool = slow_pool(timeout=0.1)
+
+    async def body(client):
+        return await upload(client, png(3))
+
+    response = call_api(body)
+    assert response.status_code == 504
+    assert response.json()["detail"] == "OCR did not finish within 0.1 seconds"
+    assert pool.stats()["timed_out"] == 1
+
+
+def test_upload_is_processed_without_temporary_files(monkeypatch):
+    monkeypatch.setattr(api, "run_ocr_pipeline", lambda image, pipeline, language, request_id=None: "text")
+
+    async def body(client):
+        before = set(api.TEMP_DIR.iterdir())
+        response = await upload(client, png(4))
+        # Checked before shutdown, which clears the directory
+        return response, set(api.TEMP_DIR.iterdir()) - before
+
+    response, written = call_api(body)
+    assert response.status_code == 200 and response.json()["text"] == "text"
+    assert written == set()
+
+
+def test_repeated_upload_is_served_from_the_cache(monkeypatch):
+    calls = []
+
+    def counting_ocr(image, pipeline, language, request_id=None):
+        calls.append(pipeline.name)
+        return "cached text"
+
+    monkeypatch.setattr(api, "run_ocr_pipeline", counting_ocr)
+    data = png(5)
+
+    async def body(client):
+        return [
+            (await upload(client, data, **fields)).json()
+            for fields in ({}, {}, {"preprocess_type": "grayscale"})
+        ]
+
+    first, again, other = call_api(body)
+    assert (first["cached"], again["cached"], other["cached"]) == (False, True, False)
+    assert again["text"] == first["text"] == "cached text"
+    assert calls == ["default", "grayscale"]
+
+
+def test_job_api_round_trip(monkeypatch):
+    monkeypatch.setattr(api, "run_ocr_pipeline", lambda image, pipeline, language, request_id=None: "job text")
+
+    async def body(client):
+        response = await client.post("/api/jobs", files={"file": ("page.png", png(6), "image/png")})
+        job_id = response.json()["job_id"]
+        done = await client.get(f"/api/jobs/{job_id}", params={"wait": 5})
+        missing = await client.get("/api/jobs/unknown")
+        return response, done.json(), missing.status_code
+
+    submitted, done, missing = call_api(body)
+    assert submitted.status_code == 202 and submitted.json()["status"] == "queued"
+    assert done["status"] == "done" and done["result"]["text"] == "job text"
+    assert done["filename"] == "page.png" and done["started_at"] <= done["finished_at"]
+    assert missing == 404
@@ -0,0 +1,101 @@
+import asyncio
+import io
+import json
+import zipfile
+
+import pytest
+
+from ocr_app import api
+from ocr_app.batch import format_ndjson, format_sse, iter_batch_items, stream_batch
+
+from test_api import call_api, png
+
+
+def collect(items, process, concurrency=2, **options):
+    async def run():
+        return [result async for result in stream_batch(items, process, concurrency, **options)]
+
+    return asyncio.run(run())
+
+
+def test_results_stream_in_completion_order_with_a_summary():
+    running = []
+    peak = []
+
+    async def process(name, delay):
+        running.append(name)
+        peak.append(len(running))
+        await asyncio.sleep(delay)
+        running.remove(name)
+        if delay == 0:
+            raise ValueError("empty")
+        return {"text": name}
+
+    results = collect([("slow", 0.2), ("fast", 0.05), ("bad", 0), ("last", 0.01)], process)
+    assert [result.get("filename") for result in results[:-1]] == ["fast", "bad", "last", "slow"]
+    assert results[1] == {"index": 2, "filename": "bad", "error": "empty"}
+    assert results[-1] == {"event": "done", "count": 4, "errors": 1}
+    assert max(peak) == 2
+
+
+def test_items_over_the_limit_are_refused():
+    async def process(name, payload):
+        return {"text": payload}
+
+    results = collect(((str(n), n) for n in range(5)), process, max_items=3)
+    assert sorted(result["index"] for result in results[:-1]) == [0, 1, 2, 3]
+    assert {"index": 3, "error": "Batch limit of 3 images reached"} in results
+    assert results[-1] == {"event": "done", "count": 4, "errors": 1}
+
+
+def test_zip_archives_expand_to_their_images_in_name_order():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("b.png", png(1))
+        archive.writestr("notes.txt", "skipped")
+        archive.writestr("a.png", png(2))
+        archive.writestr("scans/", "")
+
+    items = list(iter_batch_items("scans.zip", buffer.getvalue(), {".png"}))
+    assert items == [("scans.zip/a.png", png(2)), ("scans.zip/b.png", png(1))]
+
+    with pytest.raises(ValueError, match="Unsupported file format"):
+        list(iter_batch_items("notes.txt", b"text", {".png"}))
+
+
+def test_stream_framing():
+    result = {"index": 0, "text": "第一行\nline two"}
+    assert format_ndjson(result) == '{"index": 0, "text": "第一行\\nline two"}\n'
+    assert format_sse(result) == 'event: result\ndata: {"index": 0, "text": "第一行\\nline two"}\n\n'
+    assert format_sse({"event": "done", "count": 1}).startswith("event: done\ndata: ")
+
+
+def post_batch(fmt, monkeypatch):
+    monkeypatch.setattr(api, "run_ocr_pipeline", lambda image, pipeline, language, request_id=None: "batch text")
+
+    async def body(client):
+        files = [("files", (f"page{seed}.png", png(seed + 20), "image/png")) for seed in range(3)]
+        return await client.post("/api/extract-text/batch", files=files, data={"format": fmt})
+
+    return call_api(body)
+
+
+def test_batch_endpoint_streams_ndjson(monkeypatch):
+    response = post_batch("ndjson", monkeypatch)
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.text.split("\n")
+    assert lines[-1] == ""
+    results = [json.loads(line) for line in lines[:-1]]
+    assert sorted(result["filename"] for result in results[:-1]) == ["page0.png", "page1.png", "page2.png"]
+    assert all(result["text"] == "batch text" for result in results[:-1])
+    assert results[-1] == {"event": "done", "count": 3, "errors": 0}
+
+
+def test_batch_endpoint_streams_sse(monkeypatch):
+    response = post_batch("sse", monkeypatch)
+    assert response.headers["content-type"].startswith("text/event-stream")
+    frames = response.text.split("\n\n")
+    assert frames[-1] == ""
+    events = [frame.split("\n") for frame in frames[:-1]]
+    assert [event for event, _ in events] == ["event: result"] * 3 + ["event: done"]
+    assert json.loads(events[-1][1].removeprefix("data: "))["count"] == 3
@@ -0,0 +1,53 @@
+import numpy as np
+
+from ocr_app import benchmark
+
+
+def test_pages_are_deterministic():
+    first, text = benchmark.render_page("eng", 20, 8, 400, seed=3)
+    again, _ = benchmark.render_page("eng", 20, 8, 400, seed=3)
+    other, _ = benchmark.render_page("eng", 20, 8, 400, seed=4)
+    assert first.shape == (300, 400, 3)
+    assert np.array_equal(first, again) and not np.array_equal(first, other)
+    assert text.splitlines()[0] == benchmark.SAMPLE_TEXT["eng"][0]
+
+
+def test_corpus_covers_every_combination():
+    corpus = benchmark.build_corpus(("eng",), text_sizes=(12, 24), noise_levels=(0, 10), widths=(320,))
+    assert [page["name"] for page in corpus] == [
+        "eng-12px-noise0-320w", "eng-12px-noise10-320w", "eng-24px-noise0-320w", "eng-24px-noise10-320w",
+    ]
+    assert all(page["data"].startswith(b"\x89PNG") and page["text"] for page in corpus)
+
+
+def test_stages_without_ocr():
+    corpus = benchmark.build_corpus(("eng",), text_sizes=(16,), noise_levels=(0,), widths=(320,))
+    rows = benchmark.bench_stages(corpus, ["grayscale", "threshold"], repeat=2, ocr=False)
+    assert [row["stage"] for row in rows] == [
+        "decode", "orientation", "preprocess:grayscale", "preprocess:threshold", "clean"
+    ]
+    assert all(row["runs"] == 2 and 0 <= row["min_ms"] <= row["median_ms"] for row in rows)
+
+
+def test_compare_reports_relative_changes():
+    baseline = {
+        "stages": [{"page": "a", "stage": "decode", "median_ms": 2.0},
+                   {"page": "b", "stage": "decode", "median_ms": 2.0}],
+        "throughput": [{"workers": 2, "images_per_s": 10.0}],
+        "upload": {"p50_ms": 50.0, "requests_per_s": 20.0},
+        "peak_rss_mb": 100.0,
+    }
+    current = {
+        "stages": [{"page": "a", "stage": "decode", "median_ms": 1.0},
+                   {"page": "b", "stage": "decode", "median_ms": 1.0},
+                   {"page": "a", "stage": "ocr", "median_ms": 9.0}],
+        "throughput": [{"workers": 2, "images_per_s": 15.0}, {"workers": 4, "images_per_s": 25.0}],
+        "upload": {"p50_ms": 50.0},
+        "peak_rss_mb": 120.0,
+    }
+    assert benchmark.compare(baseline, current) == [
+        ("stage decode (total ms)", 4.0, 2.0, -0.5),
+        ("throughput 2 workers (images/s)", 10.0, 15.0, 0.5),
+        ("upload p50_ms", 50.0, 50.0, 0.0),
+        ("peak RSS (MB)", 100.0, 120.0, 0.2),
+    ]
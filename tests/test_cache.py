@@ -0,0 +1,73 @@
+import pytest
+
+from ocr_app import cache, preprocessing
+from ocr_app.cache import ResultCache, get_cache_key, make_key
+
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    result_cache = ResultCache(max_bytes=1024 * 1024, db_path=str(tmp_path / "cache.db"), db_max_bytes=1024 * 1024)
+    yield result_cache
+    result_cache.close()
+
+
+def test_memory_hits_and_misses():
+    result_cache = ResultCache(max_bytes=1024, db_path=None)
+    key = make_key("abc", "default", "eng")
+    assert result_cache.get(key) is None
+    result_cache.set(key, "text")
+    assert result_cache.get(key) == "text"
+    stats = result_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["memory"]["entries"]) == (1, 1, 1)
+
+
+def test_memory_tier_evicts_least_recently_used():
+    result_cache = ResultCache(max_bytes=20, db_path=None)
+    result_cache.set("a", "x" * 6)
+    result_cache.set("b", "x" * 6)
+    result_cache.get("a")
+    result_cache.set("c", "x" * 6)
+    assert result_cache.get("b") is None
+    assert result_cache.get("a") is not None and result_cache.get("c") is not None
+
+
+def test_disk_hits_are_promoted(disk_cache):
+    disk_cache.set("key", {"text": "hello"})
+    disk_cache.memory.clear()
+    assert disk_cache.get("key") == {"text": "hello"}
+    assert disk_cache.get("key") == {"text": "hello"}
+    assert (disk_cache.disk_hits, disk_cache.memory_hits) == (1, 1)
+
+
+def test_disk_access_times_are_written_in_batches(disk_cache, monkeypatch):
+    disk = disk_cache.disk
+    disk.set("old", '"a"')
+    disk.set("new", '"b"')
+    accessed = dict(disk._conn.execute("SELECT key, accessed FROM ocr_results").fetchall())
+
+    disk.get("old")
+    # The hit is only recorded in memory until the next flush
+    assert dict(disk._conn.execute("SELECT key, accessed FROM ocr_results").fetchall()) == accessed
+
+    monkeypatch.setattr(cache, "ACCESS_FLUSH_COUNT", 1)
+    disk.get("old")
+    rows = dict(disk._conn.execute("SELECT key, accessed FROM ocr_results").fetchall())
+    assert rows["old"] > accessed["old"] and rows["new"] == accessed["new"]
+
+
+def test_key_follows_the_preset_definition(monkeypatch):
+    before = get_cache_key("abc", "grayscale", "eng")
+    assert before == get_cache_key("abc", "grayscale", "eng")
+    assert before.startswith(f"v{cache.CACHE_VERSION}|abc|")
+    assert before != get_cache_key("abc", "threshold", "eng")
+    assert before != get_cache_key("abc", "grayscale", "deu")
+    assert before != get_cache_key("abc", "grayscale", "eng", tiled=True)
+
+    monkeypatch.setitem(preprocessing.PRESETS, "grayscale", "grayscale,blur:ksize=3")
+    assert get_cache_key("abc", "grayscale", "eng") != before
+
+
+def test_auto_key_follows_its_presets(monkeypatch):
+    before = get_cache_key("abc", "auto", "eng")
+    monkeypatch.setitem(preprocessing.PRESETS, "denoise-normalized", "grayscale")
+    assert get_cache_key("abc", "auto", "eng") != before
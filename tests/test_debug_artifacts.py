@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+import pytest
+
+from ocr_app import debug_artifacts
+from ocr_app.debug_artifacts import DebugArtifactWriter
+from ocr_app.image_processor import preprocess_image
+
+
+def test_artifacts_are_off_by_default(monkeypatch):
+    monkeypatch.setattr(debug_artifacts, "DEBUG_ENABLED", False)
+    assert debug_artifacts.start_session("abc123") is None
+
+
+def test_enabled_artifacts_are_sampled(monkeypatch, tmp_path):
+    monkeypatch.setattr(debug_artifacts, "DEBUG_ENABLED", True)
+    monkeypatch.setattr(debug_artifacts, "DEBUG_SAMPLE_RATE", 2)
+    monkeypatch.setattr(debug_artifacts, "_counter", iter(range(4)))
+    monkeypatch.setattr(debug_artifacts, "_writer", DebugArtifactWriter(str(tmp_path)))
+
+    sessions = [debug_artifacts.start_session(f"{n:x}") for n in range(4)]
+    assert [session and session.request_id for session in sessions] == ["0", None, "2", None]
+
+
+def test_preprocessing_stages_are_written_in_the_background(monkeypatch, tmp_path):
+    writer = DebugArtifactWriter(str(tmp_path))
+    monkeypatch.setattr(debug_artifacts, "DEBUG_ENABLED", True)
+    monkeypatch.setattr(debug_artifacts, "DEBUG_SAMPLE_RATE", 1)
+    monkeypatch.setattr(debug_artifacts, "_writer", writer)
+
+    preprocess_image(np.zeros((20, 20, 3), np.uint8), "grayscale,otsu", request_id="feed")
+    writer.flush()
+    names = sorted(os.listdir(tmp_path / "feed"))
+    assert names[-1] == "final_custom.png" and len(names) > 1
+
+
+def test_oldest_requests_are_removed_over_the_size_cap(tmp_path):
+    writer = DebugArtifactWriter(str(tmp_path), max_bytes=1)
+    noise = np.random.default_rng(0).integers(0, 255, (32, 32), np.uint8)
+    for request_id in ("a1", "b2", "c3"):
+        writer.submit(request_id, "stage", noise)
+    writer.flush()
+    assert os.listdir(tmp_path) == ["c3"]
+
+
+def test_full_queue_drops_images(monkeypatch, tmp_path):
+    writer = DebugArtifactWriter(str(tmp_path), queue_size=1)
+    # Without the background thread nothing is taken off the queue
+    monkeypatch.setattr(writer, "_ensure_started", lambda: None)
+    writer.submit("a1", "first", np.zeros((2, 2), np.uint8))
+    writer.submit("a1", "second", np.zeros((2, 2), np.uint8))
+    assert writer.dropped == 1
+
+
+@pytest.mark.parametrize("request_id", ["../etc", "/tmp/x", "ABC", "", "a" * 65, 12])
+def test_request_ids_must_be_hex(request_id):
+    with pytest.raises(ValueError, match="Invalid request id"):
+        debug_artifacts.start_session(request_id)
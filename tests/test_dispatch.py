@@ -0,0 +1,157 @@
+import asyncio
+import struct
+
+import pytest
+
+from ocr_app.dispatch import RemotePool, WorkerNode, encode, read_message
+from ocr_app.language import detect_language
+from ocr_app.worker_node import WorkerNodeServer
+from ocr_app.workers import PoolTimeoutError
+
+
+class FakePool:
+    """Stands in for a node's OCRWorkerPool, taking ``delay`` seconds per job."""
+
+    max_workers = 2
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.jobs = 0
+
+    def start(self):
+        pass
+
+    def shutdown(self, wait=True):
+        pass
+
+    def stats(self):
+        return {"max_workers": self.max_workers, "queue_size": 0, "in_flight": 0, "queued": 0}
+
+    async def submit(self, fn, *args, observations=None):
+        self.jobs += 1
+        await asyncio.sleep(self.delay)
+        return "done"
+
+
+async def start_nodes(*delays, secret=""):
+    servers = [WorkerNodeServer(FakePool(delay), host="127.0.0.1", port=0, secret=secret) for delay in delays]
+    for server in servers:
+        await server.start()
+    addresses = [f"127.0.0.1:{server._server.sockets[0].getsockname()[1]}" for server in servers]
+    return servers, addresses
+
+
+async def stop_nodes(pool, servers):
+    pool.shutdown()
+    for server in servers:
+        await server.stop()
+
+
+def test_slow_node_times_out_without_retry():
+    async def run():
+        servers, addresses = await start_nodes(3, 3)
+        pool = RemotePool(addresses, timeout=0.5, health_interval=60)
+        try:
+            with pytest.raises(PoolTimeoutError):
+                await pool.submit(detect_language, b"image")
+            stats = pool.stats()
+        finally:
+            await stop_nodes(pool, servers)
+        return servers, stats
+
+    servers, stats = asyncio.run(run())
+    assert stats["timed_out"] == 1
+    assert all(node["healthy"] and node["failures"] == 0 for node in stats["nodes"])
+    assert sorted(server.pool.jobs for server in servers) == [0, 1]
+
+
+def test_unreachable_node_is_retried():
+    async def run():
+        servers, addresses = await start_nodes(0)
+        # Nothing listens on the first address once its server is stopped
+        dead, (dead_address,) = await start_nodes(0)
+        await dead[0].stop()
+        pool = RemotePool([dead_address, *addresses], timeout=5, health_interval=60)
+        for node in pool.nodes:
+            node.dispatched = 0 if node.address == dead_address else 1
+        try:
+            result = await pool.submit(detect_language, b"image")
+            stats = pool.stats()
+        finally:
+            await stop_nodes(pool, servers)
+        return result, stats
+
+    result, stats = asyncio.run(run())
+    assert result == "done"
+    dead_node, live_node = stats["nodes"]
+    assert not dead_node["healthy"] and dead_node["failures"] == 1
+    assert live_node["healthy"]
+
+
+def run_task(node, fn_name, args):
+    blobs = []
+    header = {"op": "run", "fn": fn_name, "args": encode(args, blobs)}
+    return node.request(header, blobs, timeout=5)
+
+
+def test_node_requires_the_shared_secret():
+    async def run():
+        servers, (address,) = await start_nodes(0, secret="s3cret")
+        try:
+            rejected, _ = await run_task(WorkerNode(address), "detect_language", [b"image"])
+            wrong, _ = await run_task(WorkerNode(address, secret="guess"), "detect_language", [b"image"])
+            accepted, _ = await run_task(WorkerNode(address, secret="s3cret"), "detect_language", [b"image"])
+        finally:
+            await servers[0].stop()
+        return rejected, wrong, accepted, servers[0].pool.jobs
+
+    rejected, wrong, accepted, jobs = asyncio.run(run())
+    assert rejected == {"ok": False, "error_type": "error", "error": "Not authorized"}
+    assert wrong["ok"] is False
+    assert accepted["ok"] is True
+    assert jobs == 1
+
+
+def test_unauthorized_pool_marks_node_unavailable():
+    async def run():
+        servers, addresses = await start_nodes(0, secret="s3cret")
+        pool = RemotePool(addresses, health_interval=60)
+        try:
+            return await pool.check(pool.nodes[0])
+        finally:
+            await stop_nodes(pool, servers)
+
+    assert asyncio.run(run()) is False
+
+
+@pytest.mark.parametrize("fn_name, args", [
+    ("run_ocr_pipeline", ["/etc/passwd", "default", "eng"]),
+    ("estimate_orientation", ["/etc/passwd"]),
+    ("run_ocr_pipeline", [b"image", "default", "eng", "../../tmp/x"]),
+    ("run_ocr_data_pipeline", [b"image", "default", "eng", "/tmp/x"]),
+    ("detect_language", [b"image", ["eng"], "extra"]),
+])
+def test_node_rejects_unsafe_task_arguments(fn_name, args):
+    async def run():
+        servers, (address,) = await start_nodes(0)
+        try:
+            response, _ = await run_task(WorkerNode(address), fn_name, args)
+        finally:
+            await servers[0].stop()
+        return response, servers[0].pool.jobs
+
+    response, jobs = asyncio.run(run())
+    assert response["ok"] is False and response["error"].startswith("Invalid task")
+    assert jobs == 0
+
+
+def test_read_message_refuses_oversized_blobs():
+    async def run():
+        reader = asyncio.StreamReader()
+        header = b'{"op":"run","blobs":[600,600]}'
+        reader.feed_data(struct.pack(">I", len(header)) + header)
+        reader.feed_eof()
+        return await read_message(reader, max_blob_bytes=1000)
+
+    with pytest.raises(ValueError, match="over the 1000 byte limit"):
+        asyncio.run(run())
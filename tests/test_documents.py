@@ -0,0 +1,102 @@
+import io
+import stat
+import sys
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from ocr_app import api, documents
+from ocr_app.documents import is_multipage, iter_document_pages, iter_tiff_frames, page_dpi
+
+from test_api import call_api
+
+
+def tiff(*shades, size=(20, 30)):
+    frames = [Image.new("L", size, shade) for shade in shades]
+    buffer = io.BytesIO()
+    frames[0].save(buffer, format="TIFF", save_all=True, append_images=frames[1:])
+    return buffer.getvalue()
+
+
+def test_only_pdfs_and_multi_frame_tiffs_are_documents():
+    assert is_multipage("scan.pdf", b"")
+    assert is_multipage("scan.TIFF", tiff(0, 128))
+    assert not is_multipage("scan.tif", tiff(0))
+    assert not is_multipage("scan.tif", b"not a tiff")
+    assert not is_multipage("photo.png", tiff(0, 128))
+
+
+def test_tiff_pages_are_decoded_lazily_up_to_the_page_limit():
+    pages = list(iter_document_pages("scan.tif", tiff(0, 100, 200), max_pages=2))
+    assert [name for name, _ in pages] == ["scan.tif#page=1", "scan.tif#page=2"]
+    assert [int(image[0, 0, 0]) for _, image in pages] == [0, 100]
+    assert pages[0][1].shape == (30, 20, 3)
+
+
+def test_oversized_tiff_frames_are_refused():
+    with pytest.raises(ValueError, match="TIFF page 1 is 20x30 pixels"):
+        next(iter_tiff_frames(tiff(0), max_pixels=500))
+
+
+def test_large_pdf_pages_render_at_a_lower_resolution():
+    letter = (612, 792)
+    assert page_dpi(letter, 300, max_pixels=10 ** 8) == 300
+    lowered = page_dpi(letter, 300, max_pixels=10 ** 6)
+    assert lowered < 300 and (612 / 72 * lowered) * (792 / 72 * lowered) <= 10 ** 6
+
+
+def fake_tool(path, script):
+    path.write_text(f"#!{sys.executable}\nimport sys\n{script}")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+@pytest.fixture
+def fake_poppler(tmp_path, monkeypatch):
+    """pdfinfo reporting three letter pages and pdftoppm rendering each as a gray PPM."""
+    calls = tmp_path / "calls.txt"
+    monkeypatch.setattr(documents, "PDFINFO_CMD", fake_tool(tmp_path / "pdfinfo", (
+        "print('Pages:          3')\n"
+        "for page in range(1, int(sys.argv[4]) + 1):\n"
+        "    print(f'Page    {page} size: 612 x 792 pts (letter)')\n"
+    )))
+    monkeypatch.setattr(documents, "PDFTOPPM_CMD", fake_tool(tmp_path / "pdftoppm", (
+        f"open({str(calls)!r}, 'a').write(' '.join(sys.argv[1:-2]) + '\\n')\n"
+        "shade = int(sys.argv[2]) * 50\n"
+        "sys.stdout.buffer.write(b'P5\\n4 2\\n255\\n' + bytes([shade]) * 8)\n"
+    )))
+    spool = tmp_path / "spool"
+    spool.mkdir()
+    monkeypatch.setattr(documents.tempfile, "tempdir", str(spool))
+    return calls, spool
+
+
+def test_pdf_pages_are_rendered_one_at_a_time(fake_poppler):
+    calls, spool = fake_poppler
+    pages = iter_document_pages("report.pdf", b"%PDF-1.4", dpi=150, max_pages=2)
+    name, first = next(pages)
+    assert name == "report.pdf#page=1" and first.shape == (2, 4, 3) and first[0, 0, 0] == 50
+    assert calls.read_text() == "-f 1 -l 1 -r 150\n"
+
+    assert [name for name, _ in pages] == ["report.pdf#page=2"]
+    # The temporary copy for poppler is gone once iteration finishes
+    assert list(spool.iterdir()) == []
+
+
+def test_document_upload_returns_pages_in_order(fake_poppler, monkeypatch):
+    def page_ocr(image, pipeline, language, request_id=None):
+        return f"page shade {int(image[0, 0, 0])}"
+
+    monkeypatch.setattr(api, "run_ocr_pipeline", page_ocr)
+
+    async def body(client):
+        return await client.post("/upload/", files={"file": ("report.pdf", b"%PDF-1.4\n", "application/pdf")})
+
+    response = call_api(body)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["page_count"] == 3
+    assert [page["text"] for page in result["pages"]] == ["page shade 50", "page shade 100", "page shade 150"]
+    assert result["text"] == "page shade 50\n\npage shade 100\n\npage shade 150"
@@ -0,0 +1,67 @@
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from ocr_app import engine
+from ocr_app.engine import EngineError, SubprocessEngine, _to_array, _to_pnm
+
+
+def test_images_are_piped_as_uncompressed_pnm():
+    gray = np.arange(6, dtype=np.uint8).reshape(2, 3)
+    assert _to_pnm(gray) == b"P5\n3 2\n255\n" + gray.tobytes()
+
+    rgba = np.zeros((2, 3, 4), np.uint8)
+    rgba[..., 3] = 255
+    assert _to_pnm(rgba) == b"P6\n3 2\n255\n" + bytes(2 * 3 * 3)
+
+    # Palette images are converted; the result decodes back to the same pixels
+    palette = Image.fromarray(gray * 40).convert("P")
+    decoded = cv2.imdecode(np.frombuffer(_to_pnm(_to_array(palette)), np.uint8), cv2.IMREAD_UNCHANGED)
+    assert decoded.shape == (2, 3, 3)
+
+
+@pytest.fixture
+def fresh_engine(monkeypatch):
+    monkeypatch.setattr(engine, "_engine", None)
+
+    def unavailable(*args, **kwargs):
+        raise EngineError("libtesseract not found")
+
+    monkeypatch.setattr(engine, "CAPIEngine", unavailable)
+    return monkeypatch
+
+
+def test_missing_c_api_falls_back_to_the_subprocess_engine(fresh_engine):
+    fresh_engine.setattr(engine, "OCR_ENGINE", "auto")
+    assert engine.get_engine() is engine.get_fallback_engine()
+    # Created once and reused
+    assert engine.get_engine() is engine.get_engine()
+
+
+def test_required_c_api_raises(fresh_engine):
+    fresh_engine.setattr(engine, "OCR_ENGINE", "capi")
+    with pytest.raises(EngineError, match="libtesseract"):
+        engine.get_engine()
+
+
+def test_missing_binary_is_an_engine_error(monkeypatch):
+    monkeypatch.setattr(engine.pytesseract.pytesseract, "tesseract_cmd", "/nonexistent/tesseract")
+    with pytest.raises(EngineError, match="Could not run /nonexistent/tesseract"):
+        SubprocessEngine().image_to_string(np.zeros((4, 4), np.uint8))
+
+
+def test_osd_output_is_parsed(monkeypatch):
+    output = (
+        "Page number: 0\nOrientation in degrees: 90\nRotate: 270\n"
+        "Orientation confidence: 3.52\nScript: Latin\nScript confidence: 1.94\n"
+    )
+    osd = SubprocessEngine()
+    monkeypatch.setattr(osd, "_run", lambda *args: output)
+    assert osd.detect_orientation_script(None) == {
+        "orientation": 90, "orientation_confidence": 3.52, "script": "Latin", "script_confidence": 1.94
+    }
+
+    monkeypatch.setattr(osd, "_run", lambda *args: "Too few characters. Skipping this page\n")
+    with pytest.raises(EngineError, match="too little text"):
+        osd.detect_orientation_script(None)
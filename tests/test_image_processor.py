@@ -0,0 +1,52 @@
+import cv2
+import numpy as np
+import pytest
+
+from ocr_app.image_processor import ImageError, decode_image, load_image, preprocess_image
+
+
+def encoded(extension=".png"):
+    image = np.zeros((30, 40, 3), np.uint8)
+    image[5:25, 10:30] = (255, 128, 0)
+    return image, cv2.imencode(extension, image)[1].tobytes()
+
+
+@pytest.mark.parametrize("wrap", [bytes, bytearray, memoryview])
+def test_uploads_decode_from_memory(wrap):
+    image, data = encoded()
+    assert np.array_equal(load_image(wrap(data)), image)
+
+
+def test_arrays_are_used_as_they_are():
+    image, _ = encoded()
+    assert load_image(image) is image
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"", "empty"),
+    (b"\x89PNG\r\n\x1a\nnot really a png", "Failed to decode"),
+])
+def test_unreadable_uploads_are_image_errors(data, message):
+    with pytest.raises(ImageError, match=message):
+        decode_image(data)
+
+
+def test_preprocessing_writes_no_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _, data = encoded(".jpg")
+    processed = preprocess_image(data, "threshold")
+    assert processed.shape == (30, 40) and processed.dtype == np.uint8
+    assert set(np.unique(processed)) <= {0, 255}
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_color_output_is_rgb():
+    image, data = encoded()
+    processed = preprocess_image(data, "resize")
+    assert np.array_equal(processed, cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+
+def test_rejected_stage_arguments_are_image_errors():
+    _, data = encoded()
+    with pytest.raises(ImageError, match="Cannot preprocess image"):
+        preprocess_image(data, "blur:ksize=4")
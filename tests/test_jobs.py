@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from ocr_app.jobs import (
+    JobQueue, MemoryJobStore, SQLiteJobStore, QueueFullError, new_job, DONE, FAILED, QUEUED, RUNNING
+)
+
+
+async def echo(payload, params):
+    if params.get("fail"):
+        raise RuntimeError("boom")
+    return {"size": len(payload)}
+
+
+def run_queue(store, body, **options):
+    async def run():
+        queue = JobQueue(store, echo, concurrency=2, **options)
+        await queue.start()
+        try:
+            return await body(queue)
+        finally:
+            await queue.stop()
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_job_lifecycle(tmp_path, backend):
+    store = MemoryJobStore() if backend == "memory" else SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+    async def body(queue):
+        ok = await queue.submit(b"abc", {"filename": "a.png"})
+        failed = await queue.submit(b"", {"fail": True})
+        return await queue.wait(ok["id"], 5), await queue.wait(failed["id"], 5), queue._events
+
+    ok, failed, events = run_queue(store, body)
+    assert ok["status"] == DONE and ok["result"] == {"size": 3}
+    assert failed["status"] == FAILED and failed["error"] == "boom"
+    assert events == {}
+
+
+def test_queued_bytes_limit():
+    store = MemoryJobStore()
+
+    async def body(queue):
+        # No workers are started, so everything stays queued
+        await queue.submit(b"x" * 60, {})
+        with pytest.raises(QueueFullError, match="Too much data"):
+            await queue.submit(b"x" * 50, {})
+        await queue.submit(b"x" * 40, {})
+        return store.queued_bytes()
+
+    async def run():
+        return await body(JobQueue(store, echo, concurrency=1, max_queued_bytes=100))
+
+    assert asyncio.run(run()) == 100
+    store.claim()
+    assert store.queued_bytes() == 40
+
+
+def test_wait_drops_its_event_when_it_gives_up():
+    store = MemoryJobStore()
+
+    async def run():
+        queue = JobQueue(store, echo, concurrency=1)
+        job = await queue.submit(b"x", {})
+        # Nobody runs the job: the waiter times out and must not leave an entry
+        waited = await queue.wait(job["id"], 0.05)
+        return waited, queue._events
+
+    waited, events = asyncio.run(run())
+    assert waited["status"] == QUEUED
+    assert events == {}
+
+
+def test_sqlite_claims_each_job_once(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    stores = [SQLiteJobStore(path) for _ in range(3)]
+    for i in range(100):
+        stores[0].add(new_job({"i": i}), b"x")
+    claims = Counter()
+
+    def worker(store, owner):
+        while (claimed := store.claim(owner, time.time() + 60)) is not None or store.count_queued():
+            if claimed is not None:
+                claims[claimed[0]["id"]] += 1
+
+    threads = [threading.Thread(target=worker, args=(store, str(n))) for n, store in enumerate(stores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(claims) == 100 and set(claims.values()) == {1}
+
+
+def test_sqlite_recovers_only_expired_leases(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+    live, dead = new_job({}), new_job({})
+    store.add(live, b"x")
+    store.add(dead, b"x")
+    store.claim("live", time.time() + 60)
+    store.claim("dead", time.time() - 1)
+
+    assert store.recover(time.time()) == 1
+    assert store.renew("live", time.time() + 120) == 1
+    assert {store.get(live["id"])["status"], store.get(dead["id"])["status"]} == {RUNNING, QUEUED}
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from ocr_app import language
+from ocr_app.engine import EngineError, TSV_HEADER
+from ocr_app.language import SAMPLE_MAX_HEIGHT, SAMPLE_MAX_WIDTH, detect_language, sample_regions
+
+from test_tiling import page_with_blocks
+
+
+class FakeEngine:
+    """Reports ``script`` from OSD and reads every language with its confidence in ``scores``."""
+
+    name = "fake"
+
+    def __init__(self, script="Latin", script_confidence=2.0, scores=None):
+        self.script = script
+        self.script_confidence = script_confidence
+        self.scores = scores or {}
+        self.read = []
+
+    def detect_orientation_script(self, image):
+        if self.script is None:
+            raise EngineError("Orientation and script detection failed (too little text?)")
+        return {"orientation": 0, "orientation_confidence": 5.0,
+                "script": self.script, "script_confidence": self.script_confidence}
+
+    def image_to_tsv(self, image, language="eng", psm=6, oem=3):
+        self.read.append(language)
+        return TSV_HEADER + f"5\t1\t1\t1\t1\t1\t0\t0\t10\t10\t{self.scores.get(language, 0)}\tword\n"
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    def use(**options):
+        fake = FakeEngine(**options)
+        monkeypatch.setattr(language, "get_engine", lambda: fake)
+        monkeypatch.setattr(language, "get_fallback_engine", lambda: fake)
+        return fake
+
+    monkeypatch.setattr(language, "verify_language_pack", lambda lang: True)
+    return use
+
+
+def test_a_single_matching_pack_is_decided_by_script_detection(engine):
+    fake = engine(script="Han")
+    result = detect_language(page_with_blocks(), ["eng", "chi_sim"])
+    assert result == {"language": "chi_sim", "script": "Han", "confidence": 2.0, "method": "osd"}
+    assert fake.read == []
+
+
+def test_several_matching_packs_are_decided_by_sampled_ocr(engine):
+    fake = engine(script="Latin", scores={"eng": 60, "deu": 85})
+    result = detect_language(page_with_blocks(), ["eng", "deu", "chi_sim"])
+    assert result == {"language": "deu", "script": "Latin", "confidence": 0.85, "method": "sample"}
+    # Only packs of the detected script are tried
+    assert set(fake.read) == {"eng", "deu"}
+
+
+@pytest.mark.parametrize("options", [{"script": None}, {"script": "Latin", "script_confidence": 0.1}])
+def test_unsure_script_detection_samples_every_candidate(engine, options):
+    fake = engine(scores={"chi_sim": 70, "eng": 40}, **options)
+    result = detect_language(page_with_blocks(), ["eng", "chi_sim"])
+    assert result["language"] == "chi_sim" and result["method"] == "sample"
+    assert set(fake.read) == {"eng", "chi_sim"}
+
+
+def test_blank_image_falls_back_to_the_default(engine):
+    engine()
+    result = detect_language(np.full((100, 100), 255, np.uint8), ["deu", "eng"])
+    assert result == {"language": "eng", "script": None, "confidence": 0.0, "method": "default"}
+
+
+def test_sampled_regions_stay_small_on_large_pages():
+    page = np.kron(page_with_blocks(), np.ones((4, 4), np.uint8))
+    regions = sample_regions(page, count=2)
+    assert len(regions) == 2
+    assert all(h <= SAMPLE_MAX_HEIGHT and w <= SAMPLE_MAX_WIDTH for h, w in (region.shape[:2] for region in regions))
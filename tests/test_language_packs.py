@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+from ocr_app.language_packs import LanguageRegistry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    for code in ("eng", "deu", "fra", "chi_sim", "chi_tra", "chi_sim_vert", "osd"):
+        (tmp_path / f"{code}.traineddata").write_bytes(b"x")
+    return LanguageRegistry(str(tmp_path), "tesseract", offered=[])
+
+
+def test_languages_skip_helper_models(registry):
+    assert registry.languages() == ["chi_sim", "chi_sim_vert", "chi_tra", "deu", "eng", "fra"]
+
+
+@pytest.mark.parametrize("requested, resolved", [
+    ("deu", "deu"),
+    ("eng+chi_sim", "eng+chi_sim"),
+    ("eng+eng+deu", "eng+deu"),
+    ("eng+deu+fra", "eng+deu+fra"),
+    # Too many packs, too long for the stored column, unknown or helper packs
+    ("eng+deu+fra+chi_sim", "eng"),
+    ("chi_sim_vert+chi_tra", "chi_sim_vert+chi_tra"),
+    ("chi_sim_vert+chi_tra+eng", "eng"),
+    ("eng+xyz", "eng"),
+    ("osd", "eng"),
+    ("", "eng"),
+    (None, "eng"),
+])
+def test_resolve(registry, requested, resolved):
+    assert registry.resolve(requested) == resolved
+
+
+def test_is_installed(registry):
+    assert registry.is_installed("eng+osd")
+    assert not registry.is_installed("eng+xyz")
+
+
+def test_directory_is_only_listed_again_when_it_changes(tmp_path, monkeypatch):
+    registry = LanguageRegistry(str(tmp_path), "tesseract", refresh_interval=0, offered=[])
+    (tmp_path / "eng.traineddata").write_bytes(b"x")
+    scans = []
+    scan = registry._scan
+    monkeypatch.setattr(registry, "_scan", lambda: scans.append(1) or scan())
+
+    assert registry.languages() == ["eng"]
+    assert registry.is_installed("eng") and registry.languages() == ["eng"]
+    assert len(scans) == 1
+
+    (tmp_path / "deu.traineddata").write_bytes(b"x")
+    os.utime(tmp_path, ns=(0, os.stat(tmp_path).st_mtime_ns + 1))
+    assert registry.languages() == ["deu", "eng"]
+    assert len(scans) == 2
+
+
+def test_checks_wait_for_the_refresh_interval(tmp_path):
+    registry = LanguageRegistry(str(tmp_path), "tesseract", refresh_interval=3600, offered=[])
+    (tmp_path / "eng.traineddata").write_bytes(b"x")
+    assert registry.languages() == ["eng"]
+    (tmp_path / "deu.traineddata").write_bytes(b"x")
+    assert registry.languages() == ["eng"]
+    registry.refresh(force=True)
+    assert registry.languages() == ["deu", "eng"]
+
+
+def test_offered_packs_limit_the_languages(tmp_path):
+    for code in ("eng", "deu", "fra"):
+        (tmp_path / f"{code}.traineddata").write_bytes(b"x")
+    registry = LanguageRegistry(str(tmp_path), "tesseract", offered=["fra", "eng", "ita"])
+    assert registry.languages() == ["fra", "eng"]
+    assert registry.resolve("deu") == "eng"
+
+
+def test_version_is_read_once(tmp_path):
+    calls = tmp_path / "calls"
+    tesseract = tmp_path / "tesseract"
+    tesseract.write_text(f"#!/bin/sh\necho run >> {calls}\necho 'tesseract 5.3.4'\necho ' leptonica-1.84.1'\n")
+    tesseract.chmod(0o755)
+    registry = LanguageRegistry(str(tmp_path), str(tesseract), offered=[])
+
+    assert registry.version()["tesseract_version"] == "5.3.4"
+    assert registry.version()["version_details"] == "tesseract 5.3.4\n leptonica-1.84.1"
+    assert calls.read_text() == "run\n"
+    assert LanguageRegistry(str(tmp_path), str(tmp_path / "missing")).version()["tesseract_version"] == "Unknown"
@@ -0,0 +1,98 @@
+import io
+
+import numpy as np
+
+from ocr_app import api
+from ocr_app.engine import TSV_HEADER
+from ocr_app.layout import OCRData, WORD
+
+from test_api import call_api, png
+
+
+def tsv(*rows):
+    return TSV_HEADER + "".join("\t".join(str(value) for value in row) + "\n" for row in rows)
+
+
+# level, page, block, par, line, word, left, top, width, height, conf, text
+PAGE = tsv(
+    (1, 1, 0, 0, 0, 0, 0, 0, 200, 100, -1, ""),
+    (2, 1, 1, 0, 0, 0, 10, 10, 180, 40, -1, ""),
+    (5, 1, 1, 1, 1, 1, 10, 10, 40, 12, 90, "Hello"),
+    (5, 1, 1, 1, 1, 2, 60, 10, 50, 12, 60, "world"),
+    (5, 1, 1, 1, 2, 1, 10, 30, 20, 12, 95, "ok"),
+    (5, 1, 2, 1, 1, 1, 10, 70, 10, 12, 30, " "),
+    (5, 1, 2, 1, 1, 2, 30, 70, 40, 12, 50, "tab\tin"),
+)
+
+
+def test_tsv_is_parsed_into_columns():
+    data = OCRData.from_tsv(PAGE)
+    assert len(data) == 7
+    assert data.columns["level"].dtype == np.int32 and data.conf.dtype == np.float32
+    assert data.columns["left"].tolist() == [0, 10, 10, 60, 10, 10, 30]
+    assert data.words[2:] == ["Hello", "world", "ok", " ", "tab\tin"]
+    assert len(OCRData.from_tsv(TSV_HEADER)) == 0
+
+
+def test_text_follows_lines_and_blocks():
+    assert OCRData.from_tsv(PAGE).text == "Hello world\nok\n\ntab\tin"
+
+
+def test_mean_confidence_is_weighted_by_word_length():
+    data = OCRData.from_tsv(PAGE)
+    expected = (90 * 5 + 60 * 5 + 95 * 2 + 50 * 6) / (5 + 5 + 2 + 6)
+    assert abs(data.mean_confidence() - expected) < 1e-4
+    assert OCRData.from_tsv(TSV_HEADER).mean_confidence() == 0.0
+
+
+def test_merge_offsets_boxes_and_keeps_blocks_unique():
+    first = OCRData.from_tsv(PAGE)
+    second = OCRData.from_tsv(PAGE)
+    merged = OCRData.merge([(first, 0, 0, 1), (second, 100, 500, 2)])
+    assert len(merged) == 14
+    assert merged.columns["left"].tolist() == first.columns["left"].tolist() + (second.columns["left"] + 100).tolist()
+    assert merged.columns["top"][7:].tolist() == (second.columns["top"] + 500).tolist()
+    # The page row has no block and stays 0; the second page's blocks follow the first's
+    assert merged.columns["block_num"].tolist() == [0, 1, 1, 1, 1, 2, 2, 0, 3, 3, 3, 3, 4, 4]
+    assert merged.columns["page_num"].tolist() == [1] * 7 + [2] * 7
+    assert merged.text == "Hello world\nok\n\ntab\tin\n\nHello world\nok\n\ntab\tin"
+    assert len(OCRData.merge([])) == 0
+
+
+def test_scale_rounds_boxes_back_to_the_original_size():
+    data = OCRData.from_tsv(PAGE)
+    data.scale(2.5, 0.5)
+    assert data.columns["left"][2:5].tolist() == [25, 150, 25]
+    assert data.columns["width"][2:5].tolist() == [100, 125, 50]
+    assert data.columns["top"][2:5].tolist() == [5, 5, 15]
+    assert data.columns["height"][2].dtype == np.int32
+
+
+def test_dict_and_npz_round_trips():
+    data = OCRData.from_tsv(PAGE)
+    again = OCRData.from_dict(data.to_dict())
+    assert again.words == data.words and again.text == data.text
+    assert all(np.array_equal(again.columns[name], column) for name, column in data.columns.items())
+
+    archive = np.load(io.BytesIO(data.to_npz(full_text=data.text)))
+    assert archive["text"].tolist() == data.words
+    assert archive["level"].tolist() == data.columns["level"].tolist()
+    assert str(archive["full_text"]) == data.text
+
+
+def test_upload_returns_boxes_from_the_same_pass(monkeypatch):
+    calls = []
+
+    def fake_data(image, pipeline, language, request_id=None, psm=None):
+        calls.append(pipeline.name)
+        return OCRData.from_tsv(PAGE)
+
+    monkeypatch.setattr(api, "run_ocr_data_pipeline", fake_data)
+
+    async def body(client):
+        return await client.post("/upload/", files={"file": ("a.png", png(8), "image/png")}, data={"output": "json"})
+
+    result = call_api(body).json()
+    assert calls == ["default"]
+    assert result["text"] == "Hello world\nok\n\ntab\tin"
+    assert result["data"]["text"][2] == "Hello" and result["data"]["level"].count(WORD) == 5
@@ -0,0 +1,47 @@
+import asyncio
+
+import httpx
+import pytest
+
+from ocr_app import api, metrics
+
+parser = pytest.importorskip("prometheus_client.parser")
+
+
+def scrape():
+    async def run():
+        await api.startup_event()
+        try:
+            transport = httpx.ASGITransport(app=api.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.get("/metrics")
+        finally:
+            await api.shutdown_event()
+        return response
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    return {family.name: family for family in parser.text_string_to_metric_families(response.text)}
+
+
+def test_metrics_endpoint_parses_as_prometheus_text():
+    families = scrape()
+    registered = {metric.name: metric for metric in metrics.registry.metrics.values()}
+    assert set(families) == set(registered)
+    for name, metric in registered.items():
+        assert families[name].type == metric.kind
+        assert families[name].documentation == metric.documentation
+
+
+def test_counter_samples_belong_to_their_family():
+    registry = metrics.Registry()
+    counter = registry.counter("test_requests", "Requests handled", ("route",))
+    counter.labels("upload").inc(2)
+    text = registry.render()
+    assert "# TYPE test_requests_total counter" in text
+
+    (family,) = parser.text_string_to_metric_families(text)
+    assert family.name == "test_requests" and family.type == "counter"
+    assert [(sample.name, sample.labels, sample.value) for sample in family.samples] == [
+        ("test_requests_total", {"route": "upload"}, 2.0)
+    ]
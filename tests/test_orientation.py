@@ -0,0 +1,105 @@
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+from ocr_app import api, orientation
+from ocr_app.cache import ResultCache
+from ocr_app.preprocessing import parse_pipeline
+
+from test_api import call_api, png
+
+
+def level_page():
+    image = np.full((800, 800), 255, np.uint8)
+    for line in range(12):
+        cv2.putText(image, "The quick brown fox jumps over", (60, 80 + line * 50),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, 0, 2)
+    return image
+
+
+def rotated(image, angle):
+    height, width = image.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(image, matrix, (width, height), borderValue=255)
+
+
+@pytest.mark.parametrize("angle", [0, 4, -6])
+def test_skew_is_the_correction_back_to_level(angle):
+    assert orientation.estimate_skew(rotated(level_page(), angle)) == pytest.approx(-angle, abs=0.5)
+
+
+def test_analysis_image_is_bounded_for_bytes_and_arrays():
+    page = np.full((3000, 2000), 255, np.uint8)
+    encoded = cv2.imencode(".png", page)[1].tobytes()
+    assert orientation.analysis_image(page).shape == (1024, 682)
+    assert orientation.analysis_image(encoded).shape == (1024, 682)
+
+
+class FakeOSD:
+    def __init__(self, turned, confidence):
+        self.osd = {"orientation": turned, "orientation_confidence": confidence}
+
+    def detect_orientation_script(self, image):
+        return self.osd
+
+
+@pytest.mark.parametrize("turned, confidence, expected", [
+    (90, 5.0, (270, 5.0)),
+    (270, 5.0, (90, 5.0)),
+    (180, 0.5, (0, 0.5)),
+])
+def test_rotation_undoes_the_reported_turn(monkeypatch, turned, confidence, expected):
+    monkeypatch.setattr(orientation.language_registry, "is_installed", lambda language: True)
+    monkeypatch.setattr(orientation, "get_engine", lambda: FakeOSD(turned, confidence))
+    assert orientation.detect_rotation(level_page()) == expected
+
+
+def test_orient_stage_applies_the_pinned_estimate():
+    pipeline = parse_pipeline("orient,grayscale")
+    assert pipeline.needs_orientation and pipeline.rotation == 0
+
+    pinned = pipeline.oriented({"rotation": 90, "skew": 0.0, "rotation_confidence": 4.0})
+    assert not pinned.needs_orientation and pinned.rotation == 90
+    assert parse_pipeline("grayscale,otsu").oriented({"rotation": 90, "skew": 0.0}).spec == "grayscale,otsu"
+
+    image = np.zeros((30, 50, 3), np.uint8)
+    image[0, 0] = 255
+    turned = pinned.run(image)
+    assert turned.shape == (50, 30) and turned[0, -1] == 255
+
+
+@pytest.mark.parametrize("preprocess_type, estimates, expected", [
+    ("auto", 1, {"rotation": 0, "skew": 1.5}),
+    # Orient chains never submit an estimate of their own, only reuse the cache
+    ("orient,grayscale", 0, None),
+    ("grayscale", 0, None),
+])
+def test_orientation_is_estimated_once_per_image(monkeypatch, preprocess_type, estimates, expected):
+    calls = []
+
+    def fake_estimate(payload):
+        calls.append(payload)
+        return {"rotation": 0, "skew": 1.5}
+
+    monkeypatch.setattr(api, "estimate_orientation", fake_estimate)
+    monkeypatch.setattr(api, "result_cache", ResultCache(max_bytes=1024 * 1024, db_path=None))
+    payload = png(7)
+
+    async def body(client):
+        return [await api.resolve_orientation("digest", payload, preprocess_type) for _ in range(2)]
+
+    assert call_api(body) == [expected, expected]
+    assert len(calls) == estimates
+
+
+def test_orient_chain_reuses_the_estimate_of_auto(monkeypatch):
+    monkeypatch.setattr(api, "estimate_orientation", lambda payload: {"rotation": 180, "skew": 0.0})
+    monkeypatch.setattr(api, "result_cache", ResultCache(max_bytes=1024 * 1024, db_path=None))
+
+    async def body(client):
+        await api.resolve_orientation("digest", b"", "auto")
+        return await api.resolve_orientation("digest", b"", "orient,otsu")
+
+    assert call_api(body) == {"rotation": 180, "skew": 0.0}
@@ -0,0 +1,114 @@
+import cv2
+import numpy as np
+import pytest
+
+from ocr_app.preprocessing import (
+    PRESETS, STAGES, TEXT_HEIGHT_TOLERANCE, Pipeline, measure_text_height, normalize, parse_pipeline
+)
+
+from test_api import call_api, png
+
+
+def test_presets_and_chains_parse_to_stages():
+    default = parse_pipeline(None)
+    assert default.name == "default" and default.is_preset
+    assert default.spec == PRESETS["default"]
+
+    chain = parse_pipeline(" grayscale, blur:ksize=3 ,adaptive:block_size=15:c=-4.5 ")
+    assert chain.stages == [("grayscale", {}), ("blur", {"ksize": 3}), ("adaptive", {"block_size": 15, "c": -4.5})]
+    assert chain.name == chain.spec == "grayscale,blur:ksize=3,adaptive:block_size=15:c=-4.5"
+    assert not chain.is_preset
+    # A parsed pipeline is passed through
+    assert parse_pipeline(chain) is chain
+
+
+def test_without_drops_stages():
+    assert parse_pipeline("resize,grayscale,otsu").without("resize", "orient").spec == "grayscale,otsu"
+
+
+@pytest.mark.parametrize("spec, message", [
+    ("grayscale,sepia", "Unknown preprocessing stage 'sepia'"),
+    ("grayscale,,otsu", "Unknown preprocessing stage ''"),
+    ("blur:size=3", "Invalid parameter 'size=3' for stage 'blur'"),
+    ("blur:ksize", "Invalid parameter 'ksize' for stage 'blur'"),
+    ("blur:ksize=4", "must be an odd integer from 1 to 31"),
+    ("blur:ksize=3.0", "must be an odd integer from 1 to 31"),
+    ("resize:max_dimension=100000", "must be an integer from 64 to 10000"),
+    ("contrast:factor=nan", "must be a number from 0 to 5"),
+    ("orient:rotation=45", "must be one of 0, 90, 180, 270"),
+])
+def test_invalid_chains_are_rejected(spec, message):
+    with pytest.raises(ValueError, match=message):
+        parse_pipeline(spec)
+
+
+def test_every_stage_runs_on_color_and_gray_images():
+    rng = np.random.default_rng(0)
+    color = rng.integers(0, 255, (60, 80, 3), np.uint8)
+    for stage in STAGES:
+        pipeline = parse_pipeline("orient:rotation=90:skew=2" if stage == "orient" else stage)
+        for image in (color, color[:, :, 0].copy()):
+            before = image.copy()
+            result = pipeline.run(image)
+            assert result.dtype == np.uint8 and result.ndim in (2, 3)
+            # Not handed over, so the input is left as it was
+            assert np.array_equal(image, before)
+
+
+def test_owned_images_are_written_over():
+    image = np.full((40, 40), 200, np.uint8)
+    image[10:30, 10:30] = 20
+    result = Pipeline([("blur", {"ksize": 3}), ("otsu", {})]).run(image, owned=True)
+    assert result is image
+    assert set(np.unique(result)) == {0, 255}
+
+
+def test_invalid_chain_is_a_bad_request():
+    async def body(client):
+        response = await client.post("/upload/", files={"file": ("a.png", png(7), "image/png")},
+                                     data={"preprocess_type": "blur:ksize=4"})
+        types = await client.get("/api/preprocessing-types/")
+        return response, types.json()
+
+    response, types = call_api(body)
+    assert response.status_code == 400 and "parameter 'ksize' of stage 'blur'" in response.json()["detail"]
+    assert types["stage_parameters"]["blur"] == {"ksize": "an odd integer from 1 to 31"}
+    assert set(types["presets"]) == set(PRESETS)
+
+
+def text_page(size, scale, thickness=2, spacing=3.0):
+    """A white page filled with lines of text drawn at ``scale``; returns it and its character height."""
+    height, width = size
+    page = np.full(size, 255, np.uint8)
+    (_, glyph), _ = cv2.getTextSize("x", cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+    step = int(glyph * spacing)
+    for y in range(step, height - step, step):
+        for x in range(step, width - step, step * 20):
+            cv2.putText(page, "text lines here", (x, y), cv2.FONT_HERSHEY_SIMPLEX, scale, 0, thickness)
+    return page, measure_text_height(page)
+
+
+@pytest.mark.parametrize("size, scale", [((1500, 2000), 3.0), ((600, 800), 0.6)])
+def test_normalize_rescales_text_to_the_target_height(size, scale):
+    page, measured = text_page(size, scale)
+    result = normalize(page, False, text_height=20)
+    assert result.shape[0] == int(size[0] * 20 / measured)
+    assert abs(measure_text_height(result) - 20) <= 20 * (TEXT_HEIGHT_TOLERANCE - 1)
+
+
+def test_normalize_limits_upscaling_and_leaves_close_sizes_alone():
+    page, measured = text_page((200, 300), 0.3, thickness=1)
+    assert normalize(page, False, text_height=measured * 10, max_upscale=2).shape == (400, 600)
+    assert normalize(page, False, text_height=measured * 1.1) is page
+
+
+def test_small_text_on_huge_pages_is_measured_at_native_resolution():
+    page, _ = text_page((4000, 6000), 0.6, thickness=1)
+    # The thumbnail is too coarse for text this small, so a native crop decides
+    native = measure_text_height(page[:1000, :1000])
+    assert abs(measure_text_height(page) - native) <= 1
+
+
+def test_normalize_without_text_falls_back_to_resize():
+    blank = np.full((3000, 1500), 255, np.uint8)
+    assert normalize(blank, False, max_dimension=2000).shape == (2000, 1000)
@@ -0,0 +1,107 @@
+import json
+
+import cv2
+import pytest
+
+from ocr_app import api, tiling
+from ocr_app.cache import ResultCache
+from ocr_app.engine import TSV_HEADER
+from ocr_app.image_processor import ImageError
+from ocr_app.layout import OCRData
+
+from test_api import call_api, png
+from test_tiling import page_with_blocks
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(api, "result_cache", ResultCache(max_bytes=1024 * 1024, db_path=None))
+
+
+def stream(data, name="page.png", repeat=1, **fields):
+    """POST to the stream endpoint ``repeat`` times, returning the parsed events of each response."""
+    async def body(client):
+        responses = []
+        for _ in range(repeat):
+            responses.append(await client.post(
+                "/api/extract-text/stream", files={"file": (name, data, "image/png")}, data=fields
+            ))
+        return responses
+
+    parsed = []
+    for response in call_api(body):
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        frames = response.text.split("\n\n")
+        assert frames[-1] == ""
+        events = []
+        for frame in frames[:-1]:
+            event, data = frame.split("\n")
+            payload = json.loads(data.removeprefix("data: "))
+            assert event == f"event: {payload['event']}"
+            events.append(payload)
+        parsed.append(events)
+    return parsed
+
+
+def test_image_stream_events(monkeypatch):
+    monkeypatch.setattr(api, "run_ocr_pipeline", lambda image, pipeline, language, request_id=None: "streamed")
+    first, second = stream(png(31), repeat=2, preprocess_type="grayscale")
+
+    assert first[0] == {"event": "start", "filename": "page.png", "size": len(png(31)), "mode": "image",
+                        "preprocessing_type": "grayscale", "language": "eng"}
+    assert [(event["event"], event.get("completed")) for event in first[1:-1]] == [("progress", 0), ("progress", 1)]
+    assert first[-1]["event"] == "done" and first[-1]["text"] == "streamed"
+    assert first[-1]["cached"] is False
+    # The repeated upload is answered from the cache without progress
+    assert [event["event"] for event in second] == ["start", "done"]
+    assert second[-1]["cached"] is True and second[-1]["text"] == "streamed"
+
+
+def test_tiled_stream_sends_each_block(monkeypatch):
+    monkeypatch.setattr(tiling, "run_ocr_pipeline", lambda tile, pipeline, language: f"{tile.shape[0]} rows")
+    (events,) = stream(cv2.imencode(".png", page_with_blocks())[1].tobytes(), tiled="true")
+
+    assert events[0]["mode"] == "tiled"
+    layout = [event for event in events if event.get("stage") == "layout"]
+    assert [event["completed"] for event in layout] == [0, 1]
+    blocks = [event for event in events if event["event"] == "block"]
+    assert blocks and sorted(event["index"] for event in blocks) == list(range(len(blocks)))
+    assert all(event["text"] == f"{event['box'][3]} rows" for event in blocks)
+    progress = [event for event in events if event.get("stage") == "ocr"]
+    assert progress[-1] == {"event": "progress", "stage": "ocr", "completed": len(blocks), "total": len(blocks)}
+    assert events[-1]["block_count"] == len(blocks)
+
+
+def test_auto_stream_reports_the_orientation_stage(monkeypatch):
+    async def fake_auto(pool, payload, language, wait=False, orientation=None):
+        return OCRData.from_tsv(TSV_HEADER), {"preset": "grayscale-normalized"}
+
+    monkeypatch.setattr(api, "estimate_orientation", lambda payload: {"rotation": 0, "skew": 0.0})
+    monkeypatch.setattr(api, "ocr_auto", fake_auto)
+    (events,) = stream(png(32), preprocess_type="auto")
+
+    stages = [(event["stage"], event["completed"]) for event in events if event["event"] == "progress"]
+    assert stages == [("orientation", 0), ("orientation", 1), ("ocr", 0), ("ocr", 1)]
+    assert events[-1]["auto"] == {"preset": "grayscale-normalized"}
+    assert "orientation" not in events[-1]
+
+
+def test_failure_after_the_start_becomes_an_error_event(monkeypatch):
+    def unreadable(image, pipeline, language, request_id=None):
+        raise ImageError("Failed to decode image")
+
+    monkeypatch.setattr(api, "run_ocr_pipeline", unreadable)
+    (events,) = stream(png(33))
+
+    assert [event["event"] for event in events] == ["start", "progress", "error"]
+    assert events[-1] == {"event": "error", "status": 400, "detail": "Failed to decode image"}
+
+
+def test_bad_upload_is_refused_before_the_stream():
+    async def body(client):
+        return await client.post("/api/extract-text/stream", files={"file": ("page.png", b"not an image", "image/png")})
+
+    response = call_api(body)
+    assert response.status_code == 415
+    assert response.headers["content-type"] == "application/json"
@@ -0,0 +1,70 @@
+import random
+import re
+
+import pytest
+
+from ocr_app import text_cleaning
+from ocr_app.text_cleaning import TextRules, get_cleaner, register_rules
+
+
+def reference_clean(text):
+    """The original replace-per-rule cleaning, which the single-pass cleaner must match."""
+    text = re.sub(r"(\s)1(\s)", r"\1.\2", text)
+    for mark in ",.:;!?":
+        text = text.replace(" " + mark, mark)
+    new_lines = []
+    current_line = ""
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line:
+            if current_line:
+                new_lines.append(current_line)
+                current_line = ""
+            new_lines.append("")
+            continue
+        if current_line and current_line.endswith((".", "!", "?", "。")):
+            new_lines.append(current_line)
+            current_line = line
+        elif not current_line:
+            current_line = line
+        else:
+            current_line += " " + line
+    if current_line:
+        new_lines.append(current_line)
+    return "\n".join(new_lines)
+
+
+def ocr_like_texts(count=300, seed=0):
+    tokens = ["word", "1", "11", ",", ".", "?", ";", " ", " ", "  ", "\n", "\n\n", "\t", "end."]
+    rng = random.Random(seed)
+    return ["".join(rng.choice(tokens) for _ in range(rng.randint(0, 40))) for _ in range(count)]
+
+
+def test_single_pass_matches_the_original_rules():
+    cleaner = get_cleaner("eng")
+    for text in ocr_like_texts():
+        assert cleaner.clean(text) == reference_clean(text), repr(text)
+
+
+@pytest.mark.parametrize("language", ["eng", "chi_sim"])
+def test_streamed_lines_match_the_whole_text(language):
+    cleaner = get_cleaner(language)
+    for text in ocr_like_texts(seed=1):
+        for fix_layout in (True, False):
+            streamed = "\n".join(cleaner.clean_lines(text.split("\n"), fix_layout=fix_layout))
+            assert streamed == cleaner.clean(text, fix_layout=fix_layout), repr(text)
+
+
+def test_chinese_rules_drop_spaces_and_use_full_width_punctuation():
+    cleaner = get_cleaner("chi_sim+eng")
+    assert cleaner.clean("你 好 世界 , 再见 1 \n我们\n走吧") == "你好世界，再见。\n我们走吧"
+    # Latin text in the same document keeps its spaces
+    assert cleaner.clean("hello world , ok") == "hello world, ok"
+
+
+def test_registered_rules_replace_the_cached_cleaner(monkeypatch):
+    monkeypatch.setattr(text_cleaning, "LANGUAGE_RULES", dict(text_cleaning.LANGUAGE_RULES))
+    assert get_cleaner("tha") is get_cleaner("tha")
+    register_rules("tha", TextRules(pattern=r"(?<=\S) (?=\S)", sentence_endings="."))
+    assert get_cleaner("tha").clean("ab cd\nef") == "abcd ef"
+    get_cleaner.cache_clear()
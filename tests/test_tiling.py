@@ -0,0 +1,135 @@
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+from ocr_app import tiling
+from ocr_app.layout import OCRData
+from ocr_app.engine import TSV_HEADER
+from ocr_app.workers import OCRWorkerPool
+
+
+def page_with_blocks():
+    """A white page with three paragraphs far apart."""
+    image = np.full((1200, 900), 255, np.uint8)
+    for top in (100, 500, 900):
+        for line in range(4):
+            cv2.putText(image, "The quick brown fox jumps over", (100, top + line * 30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, 0, 2)
+    return image
+
+
+@pytest.mark.parametrize("pixel_budget", [10_000_000, 500_000])
+def test_tiled_request_holds_the_image_pixels_until_done(monkeypatch, pixel_budget):
+    image = page_with_blocks()
+    pool = OCRWorkerPool(mode="thread", max_workers=2, queue_size=8, timeout=10, pixel_budget=pixel_budget)
+    seen = []
+
+    def fake_ocr(tile, pipeline, language):
+        seen.append(pool.budget.in_use)
+        return "text"
+
+    monkeypatch.setattr(tiling, "run_ocr_pipeline", fake_ocr)
+
+    async def run():
+        try:
+            return [result async for result in tiling.iter_tiled(pool, image)]
+        finally:
+            pool.shutdown()
+
+    # A budget smaller than the image still runs it, alone
+    results = asyncio.run(asyncio.wait_for(run(), 10))
+    boxes = results[0]["boxes"]
+    assert results[0]["event"] == "layout" and boxes
+    assert sum(1 for result in results if result.get("result") == "text") == len(boxes)
+    # Every block ran under the image's reservation, adding nothing to it
+    assert seen == [image.size] * len(boxes)
+    assert pool.budget.in_use == 0
+
+
+@pytest.mark.parametrize("preprocess_type, estimates", [("grayscale", 0), ("orient,grayscale", 1)])
+def test_orient_chain_estimates_in_the_split_job(monkeypatch, preprocess_type, estimates):
+    calls = []
+
+    def fake_estimate(image):
+        calls.append(image.shape)
+        return {"rotation": 0, "rotation_confidence": 0.0, "skew": 0.0}
+
+    monkeypatch.setattr(tiling, "estimate_orientation", fake_estimate)
+    monkeypatch.setattr(tiling, "run_ocr_pipeline", lambda tile, pipeline, language: "text")
+    pool = OCRWorkerPool(mode="thread", max_workers=2, queue_size=8, timeout=10)
+
+    async def run():
+        try:
+            return [result async for result in tiling.iter_tiled(pool, page_with_blocks(), preprocess_type)]
+        finally:
+            pool.shutdown()
+
+    asyncio.run(asyncio.wait_for(run(), 10))
+    assert len(calls) == estimates
+
+
+def test_reading_order_groups_rows():
+    boxes = [(300, 10, 100, 40), (10, 200, 50, 30), (10, 20, 100, 40), (200, 205, 50, 20)]
+    assert tiling.reading_order(boxes) == [
+        (10, 20, 100, 40), (300, 10, 100, 40), (10, 200, 50, 30), (200, 205, 50, 20)
+    ]
+
+
+def test_tall_blocks_are_cut_between_lines():
+    ink = np.zeros((100, 10), bool)
+    for top in range(0, 100, 20):
+        ink[top + 2:top + 15] = True
+    strips = tiling._split_tall_block(ink, 0, 0, 10, 100, 45)
+    assert all(h <= 45 for _, _, _, h in strips)
+    # Contiguous, and every cut falls on an empty row
+    assert [y for _, y, _, _ in strips[1:]] == [y + h for _, y, _, h in strips[:-1]]
+    assert sum(h for _, _, _, h in strips) == 100
+    assert not any(ink[y].any() for _, y, _, _ in strips[1:])
+
+
+@pytest.mark.parametrize("analysis_size", [1600, 300])
+def test_blocks_are_found_at_native_resolution(analysis_size):
+    image = page_with_blocks()
+    boxes = tiling.find_text_blocks(image, analysis_size=analysis_size)
+    ink = image < 128
+    covered = np.zeros_like(ink)
+    for x, y, w, h in boxes:
+        assert 0 <= x and 0 <= y and x + w <= image.shape[1] and y + h <= image.shape[0]
+        covered[y:y + h, x:x + w] = True
+    # Every character is inside a block, whatever the analysis scale
+    assert not (ink & ~covered).any()
+    assert boxes == tiling.reading_order(boxes)
+
+
+def test_tiles_are_the_image_at_their_boxes():
+    image = page_with_blocks()
+    for (x, y, w, h), tile in tiling.split_into_tiles(image):
+        assert np.shares_memory(tile, image)
+        assert np.array_equal(tile, image[y:y + h, x:x + w])
+
+
+def one_word(text, left, top):
+    """OCRData for a tile with a single word at (left, top) of the tile."""
+    return OCRData.from_tsv(TSV_HEADER + f"5\t1\t1\t1\t1\t1\t{left}\t{top}\t30\t12\t90\t{text}\n")
+
+
+def test_structured_tiles_are_merged_at_their_offsets(monkeypatch):
+    image = page_with_blocks()
+
+    def fake_data(tile, pipeline, language, request_id=None, psm=None):
+        return one_word(f"w{tile.shape[0]}x{tile.shape[1]}", 5, 7)
+
+    monkeypatch.setattr(tiling, "run_ocr_data_pipeline", fake_data)
+    pool = OCRWorkerPool(mode="thread", max_workers=2, queue_size=8, timeout=10)
+    try:
+        data = asyncio.run(tiling.ocr_tiled(pool, image, structured=True))
+    finally:
+        pool.shutdown()
+
+    boxes = tiling.find_text_blocks(image)
+    assert data.words == [f"w{h}x{w}" for _, _, w, h in boxes]
+    assert data.columns["left"].tolist() == [x + 5 for x, _, _, _ in boxes]
+    assert data.columns["top"].tolist() == [y + 7 for _, y, _, _ in boxes]
+    assert data.columns["block_num"].tolist() == list(range(1, len(boxes) + 1))
@@ -0,0 +1,112 @@
+import asyncio
+
+import cv2
+import httpx
+import numpy as np
+import pytest
+from fastapi import FastAPI, Request
+
+from ocr_app.uploads import (
+    BodySizeLimitMiddleware, UploadRejectedError, check_format, read_upload, sniff_format
+)
+
+from test_api import call_api, png, upload
+
+IMAGES = {".png", ".jpg", ".tif", ".pdf"}
+
+
+class ChunkedFile:
+    """Stands in for an UploadFile, counting how much of it was read."""
+
+    def __init__(self, data, filename="page.png", size=None):
+        self.data = data
+        self.filename = filename
+        self.size = size
+        self.read_bytes = 0
+
+    async def read(self, size):
+        chunk = self.data[self.read_bytes:self.read_bytes + size]
+        self.read_bytes += len(chunk)
+        return chunk
+
+
+@pytest.mark.parametrize("head, expected", [
+    (b"\x89PNG\r\n\x1a\n....", "png"),
+    (b"\xff\xd8\xff\xe0", "jpeg"),
+    (b"%PDF-1.7", "pdf"),
+    (b"II*\x00", "tiff"),
+    (b"<html>", None),
+])
+def test_sniff_format(head, expected):
+    assert sniff_format(head) == expected
+
+
+def test_single_images_may_be_mislabeled_but_routed_formats_may_not():
+    assert check_format("photo.jpg", png(1), IMAGES) == "png"
+    with pytest.raises(UploadRejectedError) as error:
+        check_format("scan.pdf", png(1), IMAGES)
+    assert error.value.status_code == 415
+    with pytest.raises(UploadRejectedError) as error:
+        check_format("page.png", b"<html></html>", IMAGES)
+    assert error.value.status_code == 415
+    with pytest.raises(UploadRejectedError) as error:
+        check_format("notes.txt", b"text", IMAGES)
+    assert error.value.status_code == 400
+
+
+def test_oversized_image_is_rejected_from_its_header():
+    data = cv2.imencode(".png", np.zeros((2000, 3000), np.uint8))[1].tobytes()
+    file = ChunkedFile(data + b"\x00" * 1024 * 1024)
+    with pytest.raises(UploadRejectedError, match="3000x2000 pixels") as error:
+        asyncio.run(read_upload(file, IMAGES, max_pixels=1_000_000))
+    assert error.value.status_code == 413
+    # Reading stopped at the first chunk
+    assert file.read_bytes < len(file.data)
+
+
+@pytest.mark.parametrize("size", [None, 200_000])
+def test_oversized_file_stops_reading(size):
+    file = ChunkedFile(png(1) + b"\x00" * 200_000, size=size)
+    with pytest.raises(UploadRejectedError, match="larger than 100000 bytes") as error:
+        asyncio.run(read_upload(file, IMAGES, max_bytes=100_000))
+    assert error.value.status_code == 413
+    assert file.read_bytes <= 100_000 + 64 * 1024
+
+
+def test_upload_with_unrecognized_content_is_answered_with_415():
+    async def body(client):
+        return await upload(client, b"GIF but not really", name="page.png")
+
+    response = call_api(body)
+    assert response.status_code == 415
+    assert "unrecognized content" in response.json()["detail"]
+
+
+def test_body_limit_middleware():
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        return {"size": len(await request.body())}
+
+    limited = BodySizeLimitMiddleware(app, max_bytes=100)
+
+    async def chunks(count):
+        for _ in range(count):
+            yield b"x" * 60
+
+    async def run():
+        transport = httpx.ASGITransport(app=limited)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return (
+                await client.post("/echo", content=b"x" * 80),
+                await client.post("/echo", content=b"x" * 200),
+                # No Content-Length: cut off while the body arrives
+                await client.post("/echo", content=chunks(3)),
+            )
+
+    small, announced, streamed = asyncio.run(run())
+    assert small.json() == {"size": 80}
+    assert announced.status_code == 413
+    assert streamed.status_code == 413
+    assert announced.json()["detail"] == "Request body is larger than 100 bytes"
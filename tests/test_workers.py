@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+import pytest
+
+from ocr_app.workers import OCRWorkerPool, PoolSaturatedError, PoolTimeoutError
+
+
+def nap(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def run_pool(body, **options):
+    pool = OCRWorkerPool(mode="thread", **options)
+
+    async def run():
+        try:
+            return await body(pool)
+        finally:
+            pool.shutdown()
+
+    return asyncio.run(run()), pool
+
+
+def test_full_pool_rejects_right_away():
+    async def body(pool):
+        running = [asyncio.create_task(pool.submit(nap, 0.3)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        with pytest.raises(PoolSaturatedError, match="2 jobs pending"):
+            await pool.submit(nap, 0)
+        rejected_after = time.perf_counter() - started
+        return await asyncio.gather(*running), rejected_after
+
+    (results, rejected_after), pool = run_pool(body, max_workers=1, queue_size=1, timeout=5)
+    assert results == [0.3, 0.3]
+    assert rejected_after < 0.1
+    assert pool.stats()["rejected"] == 1 and pool.stats()["in_flight"] == 0
+
+
+def test_slow_job_times_out_and_frees_its_slot_when_it_ends():
+    async def body(pool):
+        with pytest.raises(PoolTimeoutError, match="within 0.1 seconds"):
+            await pool.submit(nap, 0.3, timeout=0.1)
+        # The worker is still busy, so the slot is still taken
+        busy = pool.stats()["in_flight"]
+        await asyncio.sleep(0.4)
+        return busy, pool.stats()["in_flight"], await pool.submit(nap, 0)
+
+    (busy, idle, result), pool = run_pool(body, max_workers=1, queue_size=0, timeout=5)
+    assert (busy, idle, result) == (1, 0, 0)
+    assert pool.stats()["timed_out"] == 1